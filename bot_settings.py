@@ -1,54 +1,153 @@
 import logging
 import time
+from typing import List
 
 import requests
 import telebot
 from telebot import types
 from telebot import TeleBot
+from telebot import apihelper
 from telebot.types import Message
 
 import configs
+import outbox
+import scheduler
+import webhook
 
 
-def run_bot(bot):
+def update_user_id(update: types.Update) -> int:
+    """Пользователь, от которого пришло обновление (или update_id, если его нет)."""
+    for kind in ('message', 'edited_message', 'callback_query', 'inline_query',
+                 'chosen_inline_result', 'shipping_query', 'pre_checkout_query',
+                 'my_chat_member', 'chat_member', 'chat_join_request'):
+        event = getattr(update, kind, None)
+        if event is not None:
+            user = getattr(event, 'from_user', None)
+            if user is not None:
+                return user.id
+            chat = getattr(event, 'chat', None)
+            if chat is not None:
+                return chat.id
+    return update.update_id
+
+
+class ShardedTeleBot(TeleBot):
+    """
+    TeleBot, который выполняет обработчики в планировщике `scheduler.UpdateScheduler`.
+
+    Обновления одного пользователя обрабатываются строго по порядку, разных
+    пользователей — параллельно. Собственный пул потоков TeleBot не используется
+    (threaded=False): обработчики запускаются в потоках планировщика.
+    Все сообщения пользователям отправляются через очередь `outbox` с учетом
+    лимитов Telegram; потоки планировщика и очереди запускает `start_bot`.
+    """
+
+    def __init__(self, token: str, update_scheduler: scheduler.UpdateScheduler, **kwargs) -> None:
+        kwargs['threaded'] = False
+        super().__init__(token, **kwargs)
+        self.update_scheduler = update_scheduler
+        self.outbox = outbox.Outbox(self)
+
+    def submit_update(self, update: types.Update, block: bool = True) -> bool:
+        """Ставит обновление в очередь его пользователя; False — очередь заполнена."""
+        return self.update_scheduler.submit(
+            update_user_id(update),
+            lambda: TeleBot.process_new_updates(self, [update]),
+            block=block
+        )
+
+    def process_new_updates(self, updates: List[types.Update]) -> None:
+        # Polling вызывает этот метод из своего потока: раскладываем обновления по очередям пользователей
+        for update in updates:
+            self.submit_update(update)
+
+
+def _run_with_backoff(target, *args):
+    """
+    Запускает `target` и перезапускает его после сбоев с экспоненциальной задержкой.
+
+    Задержка сбрасывается, если бот до сбоя проработал дольше `max_delay` секунд:
+    разовый обрыв связи не должен стоить минуты простоя.
+    """
     retry_delay = 1
     max_delay = 60
 
     while True:
+        started = time.monotonic()
         try:
             logging.info('Бот запущен')
-            bot.polling(none_stop=True)
+            target(*args)
+            return
 
         except requests.exceptions.ReadTimeout as e:
-            error_msg = "⚠️ Сервер не отвечает. Ждем 15 секунд и пробуем снова."
             logging.error(f"ReadTimeout: {e}")
-            #supports.send_simple_message(bot, error_msg)
-            time.sleep(15)
 
         except requests.exceptions.ConnectionError as e:
-            error_msg = "🔌 Проблемы с подключением к интернету. Ждем 15 секунд и пробуем снова."
             logging.error(f"ConnectionError: {e}")
-            #supports.send_simple_message(bot, error_msg)
-            time.sleep(15)
 
         except Exception as short_error:
-            error_msg = "❌ Неизвестная ошибка в работе бота. Ждем 10 секунд и пробуем перезапустить."
             logging.error(f"Other error: {short_error}")
-            #supports.send_simple_message(bot, error_msg)
-            time.sleep(10)
 
         # Exponential Backoff
+        if time.monotonic() - started > max_delay:
+            retry_delay = 1
+        logging.info(f"Перезапуск через {retry_delay} с")
         time.sleep(retry_delay)
         retry_delay = min(retry_delay * 2, max_delay)
 
 
-def create_bot() -> telebot.TeleBot:
-    """Создает экземпляр бота с обработкой ошибок."""
+def run_bot(bot):
+    """
+    Запускает получение обновлений: через webhook, если он включен в конфиге,
+    иначе (и при недоступности webhook) — через polling.
+    """
+    if configs.webhook['enabled']:
+        try:
+            webhook.serve(bot)
+            return
+        except Exception as e:
+            logging.error(f"Webhook недоступен, переходим на polling: {e}")
+
+        def remove_webhook_and_poll() -> None:
+            # Bot API не отдает обновления через getUpdates, пока установлен webhook.
+            # Снимаем его внутри перезапусков: если сеть недоступна, снятие повторится
+            # вместе с polling, а не уронит run_bot
+            bot.remove_webhook()
+            bot.polling(none_stop=True)
+
+        _run_with_backoff(remove_webhook_and_poll)
+        return
+
+    _run_with_backoff(lambda: bot.polling(none_stop=True))
+
+
+def create_bot() -> ShardedTeleBot:
+    """
+    Создает экземпляр бота с обработкой ошибок.
+
+    Потоки бота здесь не запускаются (см. `start_bot`): main.py импортируют и процессы
+    пула рендера, им планировщик и очередь отправки не нужны.
+    """
     try:
-        return telebot.TeleBot(configs.telegram['token'])
+        # Локальный (или тестовый) сервер Bot API вместо api.telegram.org
+        if configs.telegram['api_url']:
+            apihelper.API_URL = configs.telegram['api_url']
+
+        update_scheduler = scheduler.UpdateScheduler(
+            configs.scheduler['workers'], configs.scheduler['queue_size']
+        )
+        return ShardedTeleBot(configs.telegram['token'], update_scheduler)
     except KeyError:
         logging.critical("Токен бота не найден в конфиге!")
         raise
     except Exception as e:
         logging.critical(f"Ошибка создания бота: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def start_bot(bot: ShardedTeleBot) -> None:
+    """Запускает потоки планировщика обновлений и очереди исходящих сообщений."""
+    bot.update_scheduler.start()
+    bot.update_scheduler.start_stats_logging(configs.scheduler['stats_interval'])
+    # Исходящие сообщения с учетом лимитов Telegram
+    bot.outbox.start()
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram принимает callback_data не длиннее 64 байт
+MAX_DATA_BYTES = 64
+SEPARATOR = ':'
+# Сколько байт может занимать id купона: он передается в кнопках ('coupon:<id>',
+# 'sell:<id>', курсор страницы инвентаря), остальное место — под действие и курсор
+COUPON_ID_MAX_BYTES = 40
+
+
+def pack(action: str, *args: Any) -> str:
+    """
+    Собирает callback_data вида `action:arg1:arg2`.
+
+    :raises ValueError: Если аргумент содержит разделитель или данные длиннее 64 байт.
+    """
+    parts = [action, *(str(arg) for arg in args)]
+    for part in parts:
+        if SEPARATOR in part:
+            raise ValueError(f"Разделитель '{SEPARATOR}' в callback_data: {part!r}")
+
+    data = SEPARATOR.join(parts)
+    if len(data.encode('utf-8')) > MAX_DATA_BYTES:
+        raise ValueError(f"callback_data длиннее {MAX_DATA_BYTES} байт: {data!r}")
+    return data
+
+
+def parse(data: str) -> Tuple[str, List[str]]:
+    """
+    Разбирает callback_data на действие и строковые аргументы.
+
+    Кнопки из старых сообщений ('sell <код>', 'activate <код>') разделены
+    пробелом — их тоже понимаем, чтобы они продолжали работать.
+    """
+    separator = SEPARATOR if SEPARATOR in data else None
+    action, *args = data.split(separator) if data else ['']
+    return action, args
+
+
+class _Route:
+    def __init__(self, action: str, handler: Callable, arg_types: tuple, admin: bool) -> None:
+        self.action = action
+        self.handler = handler
+        self.arg_types = arg_types
+        self.admin = admin
+        self.calls = 0
+        self.errors = 0
+        self.time_total = 0.0
+        self.time_max = 0.0
+
+    def convert(self, args: List[str]) -> Optional[list]:
+        # Приводит аргументы к типам маршрута; None — данные не подходят
+        if len(args) != len(self.arg_types):
+            return None
+        try:
+            return [arg_type(arg) for arg_type, arg in zip(self.arg_types, args)]
+        except (TypeError, ValueError):
+            return None
+
+
+class CallbackRouter:
+    """
+    Маршрутизатор нажатий inline-кнопок.
+
+    Обработчик регистрируется на действие (первую часть callback_data) вместе
+    с типами аргументов и вызывается как `handler(call, *args)`. Поиск маршрута —
+    одно обращение к словарю. Для каждого маршрута ведутся счетчики вызовов,
+    ошибок и времени обработки.
+    """
+
+    def __init__(self, is_admin: Optional[Callable[[int], bool]] = None) -> None:
+        self._routes: Dict[str, _Route] = {}
+        self._is_admin = is_admin
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._unknown = 0
+        self._rejected = 0
+
+    def route(self, action: str, *arg_types: type, admin: bool = False,
+              aliases: Tuple[str, ...] = ()) -> Callable:
+        """
+        Декоратор регистрации обработчика.
+
+        :param arg_types: Типы аргументов по порядку (str, int, ...).
+        :param admin: Только для администраторов.
+        :param aliases: Другие имена действия (например, из старых кнопок).
+        """
+        def decorator(handler: Callable) -> Callable:
+            route = _Route(action, handler, arg_types, admin)
+            for name in (action, *aliases):
+                if name in self._routes:
+                    raise ValueError(f"Действие '{name}' уже зарегистрировано")
+                self._routes[name] = route
+            return handler
+        return decorator
+
+    def dispatch(self, call) -> bool:
+        """
+        Находит маршрут по callback_data и вызывает обработчик.
+
+        :return: False, если маршрут не найден или аргументы не подошли.
+        """
+        action, raw_args = parse(call.data or '')
+        route = self._routes.get(action)
+        args = route.convert(raw_args) if route is not None else None
+
+        if route is None or args is None:
+            with self._lock:
+                self._unknown += route is None
+                self._rejected += route is not None
+            logger.warning(f"Неизвестная или некорректная кнопка от пользователя {call.from_user.id}: {call.data!r}")
+            return False
+        if route.admin and not (self._is_admin and self._is_admin(call.from_user.id)):
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"Кнопка '{action}' без прав администратора от {call.from_user.id}")
+            return False
+
+        started = time.perf_counter()
+        failed = False
+        try:
+            route.handler(call, *args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                route.calls += 1
+                route.errors += failed
+                route.time_total += elapsed
+                route.time_max = max(route.time_max, elapsed)
+                self._calls += 1
+                log_stats = self._calls % 1000 == 0
+            if log_stats:
+                logger.info(f"Маршруты inline-кнопок: {self.stats()}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики по маршрутам: вызовы, ошибки, среднее и максимальное время (мс)."""
+        with self._lock:
+            routes = {
+                route.action: {
+                    'calls': route.calls,
+                    'errors': route.errors,
+                    'avg_ms': round(route.time_total / route.calls * 1000, 2)
+                    if route.calls else 0.0,
+                    'max_ms': round(route.time_max * 1000, 2),
+                }
+                for route in self._routes.values()
+            }
+            return {'routes': routes, 'unknown': self._unknown, 'rejected': self._rejected}
@@ -0,0 +1,127 @@
+import logging
+import random
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import database
+
+
+class CouponRow(NamedTuple):
+    """Строка таблицы coupons (порядок полей совпадает с SELECT *)."""
+    id: str
+    number: int
+    name: str
+    color: str
+    effect: str
+    description: str
+    collection: str
+
+
+class _CatalogIndex(NamedTuple):
+    by_id: Dict[str, CouponRow]
+    by_key: Dict[Tuple[str, str, int], CouponRow]  # (collection, color, number)
+    by_group: Dict[Tuple[str, str], List[CouponRow]]  # (collection, color)
+    by_color: Dict[str, List[CouponRow]]
+    loaded: bool
+
+
+def _build_index(rows: List[CouponRow], loaded: bool = True) -> _CatalogIndex:
+    by_id: Dict[str, CouponRow] = {}
+    by_key: Dict[Tuple[str, str, int], CouponRow] = {}
+    by_group: Dict[Tuple[str, str], List[CouponRow]] = {}
+    by_color: Dict[str, List[CouponRow]] = {}
+
+    for row in rows:
+        by_id[row.id] = row
+        by_key[(row.collection, row.color, row.number)] = row
+        by_group.setdefault((row.collection, row.color), []).append(row)
+        by_color.setdefault(row.color, []).append(row)
+
+    return _CatalogIndex(by_id, by_key, by_group, by_color, loaded)
+
+
+# Текущий снимок каталога. Читатели берут ссылку без блокировки,
+# перезагрузка подменяет снимок целиком одной операцией присваивания.
+_index: _CatalogIndex = _build_index([], loaded=False)
+_reload_lock = threading.Lock()
+
+
+def load() -> Set[str]:
+    """
+    Загружает каталог купонов из БД в память и атомарно подменяет текущий снимок.
+
+    Вызывается при старте бота и после каждой загрузки Excel-файла с картами.
+    :return: id купонов, которые появились, изменились или исчезли по сравнению
+        с предыдущим снимком (при первой загрузке — все купоны).
+    """
+    global _index
+
+    with _reload_lock:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute(
+                'SELECT id, number, name, color, effect, description, collection FROM coupons'
+            )
+            rows = [CouponRow(*row) for row in cursor.fetchall()]
+
+        previous = _index.by_id
+        _index = _build_index(rows)
+
+    current = _index.by_id
+    changed = {coupon_id for coupon_id, row in current.items() if previous.get(coupon_id) != row}
+    changed.update(coupon_id for coupon_id in previous if coupon_id not in current)
+
+    logging.info(f"Каталог купонов загружен: {len(rows)} шт., изменилось {len(changed)}")
+    return changed
+
+
+def _current() -> _CatalogIndex:
+    index = _index
+    if not index.loaded:
+        load()
+        index = _index
+    return index
+
+
+def get_by_id(coupon_id: str) -> Optional[CouponRow]:
+    """Возвращает купон по его id или None."""
+    return _current().by_id.get(coupon_id)
+
+
+def get(collection: str, color: str, number: int) -> Optional[CouponRow]:
+    """Возвращает купон по коллекции, цвету и номеру или None."""
+    return _current().by_key.get((collection, color, int(number)))
+
+
+def resolve(collection: str, color: str, number: int) -> Optional[CouponRow]:
+    """
+    Подбирает реально существующий купон для сгенерированной тройки.
+
+    Если точного совпадения нет (например, в коллекции меньше карт, чем в `configs.qty`),
+    берется случайный купон того же цвета из той же коллекции, а если и таких нет —
+    из любой коллекции. None возвращается, только если карт такого цвета нет вовсе.
+    """
+    index = _current()
+
+    row = index.by_key.get((collection, color, int(number)))
+    if row:
+        return row
+
+    candidates = index.by_group.get((collection, color)) or index.by_color.get(color)
+    if not candidates:
+        return None
+
+    row = random.choice(candidates)
+    logging.warning(
+        f"Купон {collection}_{color}_{number} отсутствует в каталоге, выдан {row.id}"
+    )
+    return row
+
+
+def rows() -> List[CouponRow]:
+    """Все купоны каталога."""
+    return list(_current().by_id.values())
+
+
+def size() -> int:
+    """Количество купонов в каталоге."""
+    return len(_current().by_id)
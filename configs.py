@@ -23,9 +23,46 @@ try:
         'port': config_file['sql']['port'],
     }
 
+    # Параметры пула соединений с PostgreSQL (необязательные, есть значения по умолчанию)
+    sql_pool: Dict[str, Any] = {
+        'min_size': config_file.getint('sql', 'pool_min_size', fallback=2),
+        'max_size': config_file.getint('sql', 'pool_max_size', fallback=10),
+        # Сколько секунд ждать свободное соединение, прежде чем вернуть ошибку
+        'timeout': config_file.getfloat('sql', 'pool_timeout', fallback=10.0),
+        # Простаивающие соединения сверх min_size закрываются через max_idle секунд
+        'max_idle': config_file.getfloat('sql', 'pool_max_idle', fallback=600.0),
+        # Соединения пересоздаются не реже, чем раз в max_lifetime секунд
+        'max_lifetime': config_file.getfloat('sql', 'pool_max_lifetime', fallback=3600.0),
+        # Период (в секундах) записи статистики пула в лог, 0 — не писать
+        'stats_interval': config_file.getfloat('sql', 'pool_stats_interval', fallback=300.0),
+    }
+
     telegram = {
         'token': config_file['telegram']['token'],
         'admin_chat': -1002546605831,
+        # Адрес Bot API в формате apihelper.API_URL (для локального или тестового сервера)
+        'api_url': config_file.get('telegram', 'api_url', fallback=None),
+    }
+
+    # Получение обновлений через webhook (необязательно, по умолчанию — polling)
+    webhook: Dict[str, Any] = {
+        'enabled': config_file.getboolean('webhook', 'enabled', fallback=False),
+        # Публичный HTTPS-адрес, на который Telegram шлет обновления (без пути)
+        'url': config_file.get('webhook', 'url', fallback=''),
+        'host': config_file.get('webhook', 'host', fallback='127.0.0.1'),
+        'port': config_file.getint('webhook', 'port', fallback=8443),
+        'path': config_file.get('webhook', 'path', fallback='/telegram'),
+        # Telegram передает его в заголовке каждого запроса; пустой — не проверять
+        'secret_token': config_file.get('webhook', 'secret_token', fallback=''),
+    }
+
+    # Обработка обновлений: общий пул потоков, обновления одного пользователя — по порядку
+    scheduler: Dict[str, Any] = {
+        'workers': config_file.getint('scheduler', 'workers', fallback=8),
+        # Сколько обновлений может ждать в очереди в расчете на поток (в webhook сверх — ответ 503)
+        'queue_size': config_file.getint('scheduler', 'queue_size', fallback=200),
+        # Период (в секундах) записи метрик очередей в лог, 0 — не писать
+        'stats_interval': config_file.getfloat('scheduler', 'stats_interval', fallback=300.0),
     }
 except KeyError as e:
     raise ValueError(f"В конфиге отсутствует ключ: {e}")
@@ -48,6 +85,16 @@ BROADCAST_CANCEL_CMD = '/cancel_broadcast'
 price_pack_coupons = 10
 start_gift_coin = 20
 
+# Максимум промокодов в одной пачке, генерируемой администратором
+promo_bulk_max_count = 100_000
+
+# Фильтр Блума использованных промокодов: повторные коды отклоняются без запроса к БД.
+# error_rate — доля новых кодов, ошибочно принятых за использованные
+promo_filter = {
+    'capacity': 1_000_000,
+    'error_rate': 1e-6,
+}
+
 collection_type_list = [
     'Inquisition',
     'Master',
@@ -77,6 +124,73 @@ qty = {
     "legendary": 1
 }
 
+# Очередь исходящих сообщений (лимиты Telegram: ~30 сообщений в секунду на бота,
+# ~1 в секунду в один чат)
+outbox = {
+    'global_rate': 25,  # Отправок в секунду на бота
+    'global_burst': 30,
+    'chat_rate': 1,  # Отправок в секунду в один чат
+    'chat_burst': 4,
+    'max_retries': 3,  # Повторов после ответа 429
+    'workers': 8,  # Потоков, выполняющих отправку
+}
+
+# Кэш профилей пользователей (баланс, титул, открытые кейсы) для экранов только для чтения
+user_cache = {
+    'ttl': 300,  # Секунд, после которых профиль перечитывается из БД
+    'max_size': 10000,  # Профилей в памяти (LRU)
+}
+
+# Кэш готовых картинок купонов (LRU в памяти и на диске)
+render_cache = {
+    'dir': 'downloads_coupons',
+    'memory_limit_mb': 64,
+    'disk_limit_mb': 1024,
+    # Сохранять ли картинки на диск (в фоновом потоке, не задерживая отправку)
+    'persist': True,
+}
+
+# Постраничный инвентарь «Мои купоны» (keyset-пагинация и кэш готовых страниц)
+inventory = {
+    'page_size': 20,  # Купонов на странице «Мои купоны»
+    'cache_users': 1000,  # Пользователей, чьи страницы держим в памяти (LRU)
+}
+
+# Пул процессов для параллельного рендера купонов пака
+render_pool = {
+    'enabled': True,
+    'workers': 0,  # 0 — по числу ядер
+    'queue_per_worker': 4,  # Сколько заданий может ждать в очереди на один процесс
+    'timeout': 10,  # Секунд на один купон, после чего он рендерится в текущем процессе
+}
+
+# Профили кодирования готовых картинок купонов.
+# format — формат Pillow; max_size — максимальная сторона в пикселях (None — без уменьшения);
+# colors — число цветов палитры (только для PNG); остальные ключи передаются в Image.save
+output_profiles = {
+    'png': {'format': 'PNG', 'max_size': None},
+    'png_optimized': {'format': 'PNG', 'max_size': None, 'optimize': True},
+    'png_palette': {'format': 'PNG', 'max_size': None, 'colors': 256, 'optimize': True},
+    'webp': {'format': 'WEBP', 'max_size': None, 'quality': 85, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'max_size': None, 'quality': 88, 'optimize': True,
+             'progressive': True},
+    'preview': {'format': 'JPEG', 'max_size': 800, 'quality': 80, 'optimize': True},
+}
+# Профиль для карточек пака (PNG без потерь, как раньше; 'jpeg' — легче, но с потерями)
+# и профиль для просмотра купонов в инвентаре
+upload_profile = 'png'
+preview_profile = 'preview'
+
+# Как отправлять пак: 'media_group' — сообщение с описанием и медиагруппа из карточек,
+# 'collage' — одна картинка-коллаж из всех карточек с описанием в подписи
+pack_delivery = {
+    'mode': 'media_group',
+    'columns': 1,  # Карточек в ряду коллажа
+    'card_width': 800,  # Ширина карточки в коллаже, пикселей
+    'gap': 10,  # Отступ между карточками, пикселей
+    'profile': 'jpeg',  # Профиль кодирования коллажа из output_profiles
+}
+
 template_paths = {
     "common": r"templates\template_common.png",
     "uncommon": r"templates\template_uncommon.png",
@@ -3,167 +3,192 @@ import random
 import traceback
 
 import telebot
-from telebot.types import InputMediaPhoto
 
+import catalog
 import configs
 import generators
-import database
 import images
+import inventory
+import database
+import file_ids
+import render_cache
 import dict_convert
 import keyboards
+import promo_filter
+import user_cache
 from dict_convert import smile_convert
 
 
 logger = logging.getLogger(__name__)  # Лучше использовать именованный логгер
 
-def coin_check(us_id, price_pack_coupons):
-    conn, cursor = database.postgres_init()
+# Максимальная длина подписи к фото в Telegram
+CAPTION_LIMIT = 1024
+
+def coin_check(us_id, price_pack_coupons, cursor=None):
+    """
+    Списывает стоимость пака, если у пользователя хватает монет.
+
+    Если передан `cursor`, списание выполняется в транзакции вызывающего кода
+    (фиксирует ее сам вызывающий), иначе — в отдельном соединении из пула.
+
+    :return: Новый баланс или None, если монет не хватает.
+    """
+    if cursor is not None:
+        return _withdraw_coins(cursor, us_id, price_pack_coupons)
+
     try:
-        cursor.execute(
-            f'SELECT qty_coins FROM money WHERE user_id=%s', (us_id,)
-        )
-        qty_coins = cursor.fetchone()
-        coins = int(qty_coins[0])
-        if coins < configs.price_pack_coupons:
-            return False
-        else:
-            # Обновляем количество монет
-            cursor.execute(
-                'UPDATE money SET qty_coins = qty_coins - %s WHERE user_id = %s',
-                (price_pack_coupons, us_id,)
-            )
-            conn.commit()
-            return True
+        with database.postgres_init() as (conn, cursor):
+            balance = _withdraw_coins(cursor, us_id, price_pack_coupons)
     except (Exception, BaseException):
-        return False
-    finally:
-        conn.close()
-        cursor.close()
+        return None
+
+    if balance is not None:
+        user_cache.update(us_id, balance=balance)
+    return balance
+
+
+def _withdraw_coins(cursor, us_id, price):
+    # Проверка и списание одним UPDATE: строка блокируется на время запроса, и два
+    # одновременных списания не уведут баланс в минус
+    cursor.execute(
+        'UPDATE money SET qty_coins = qty_coins - %s '
+        'WHERE user_id = %s AND qty_coins >= %s RETURNING qty_coins',
+        (price, us_id, price)
+    )
+    balance = cursor.fetchone()
+    return int(balance[0]) if balance else None
 
 
 def qty_coin(us_id):
-    conn, cursor = database.postgres_init()
+    """Баланс пользователя (из кэша профилей, при промахе — из БД)."""
     try:
-        cursor.execute(
-            f'SELECT qty_coins FROM money WHERE user_id=%s', (us_id,)
-        )
-        qty_coins = cursor.fetchone()
-        coins = int(qty_coins[0])
-        return coins
+        return user_cache.get_balance(us_id)
     except (Exception, BaseException):
         return None
-    finally:
-        conn.close()
-        cursor.close()
 
 
 def add_coins_to_user(user_id: int, amount: int, promo_code: str) -> bool:
-    """Добавляет монеты и записывает промокод в used"""
-    conn, cursor = database.postgres_init()
-    try:
-        # Проверяем, не использовал ли пользователь этот промокод ранее
-        cursor.execute(
-            'SELECT 1 FROM promocode_used WHERE promocode = %s',
-            (promo_code, )
-        )
-        if cursor.fetchone():
-            return False  # Промокод уже использован
-
-        # Начисляем монеты
-        cursor.execute(
-            'UPDATE money SET qty_coins = qty_coins + %s WHERE user_id = %s',
-            (amount, user_id)
-        )
+    """
+    Погашает промокод и начисляет монеты одним запросом.
 
-        # Записываем промокод как использованный
-        cursor.execute(
-            'INSERT INTO promocode_used (user_id, promocode) VALUES (%s, %s)',
-            (user_id, promo_code))
+    Запись в promocode_used и начисление связаны в одном выражении: монеты
+    начисляются, только если INSERT действительно добавил строку, а повтор
+    отсекает уникальный индекс по promocode (ON CONFLICT DO NOTHING). Уже
+    погашенные коды отклоняются фильтром Блума без обращения к БД.
 
-        conn.commit()
-        return True
+    :return: True, если промокод погашен и монеты начислены.
+    """
+    if promo_filter.maybe_used(promo_code):
+        logger.debug(f"Промокод {promo_code} отклонен фильтром использованных")
+        return False
 
+    try:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute(
+                """
+                WITH redeemed AS (
+                    INSERT INTO promocode_used (user_id, promocode)
+                    VALUES (%s, %s)
+                    ON CONFLICT DO NOTHING
+                    RETURNING user_id
+                )
+                INSERT INTO money (user_id, qty_coins)
+                SELECT user_id, %s FROM redeemed
+                ON CONFLICT (user_id) DO UPDATE SET qty_coins = money.qty_coins + EXCLUDED.qty_coins
+                RETURNING qty_coins
+                """,
+                (user_id, promo_code, amount)
+            )
+            redeemed = cursor.fetchone()
     except Exception as e:
-        print(f"Ошибка: {e}")
-        conn.rollback()
+        logger.error(f"Ошибка погашения промокода {promo_code}: {e}")
+        return False
+
+    # И погашенный сейчас, и уже использованный раньше код повторно не пройдет
+    promo_filter.add(promo_code)
+    if redeemed is None:
         return False
-    finally:
-        conn.close()
-        cursor.close()
+
+    user_cache.update(user_id, balance=int(redeemed[0]))
+    return True
 
 
 def check_user_exists(user_id: int) -> bool:
     """Проверяет, существует ли пользователь в БД"""
-    conn, cursor = database.postgres_init()
-    try:
+    with database.postgres_init() as (conn, cursor):
         cursor.execute('SELECT 1 FROM user_data WHERE user_id = %s LIMIT 1', (user_id,))
         return cursor.fetchone() is not None
-    finally:
-        conn.close()
 
 
 def add_start_coins(user_id: int, amount: int) -> bool:
     """Начисляет стартовые монеты, создавая запись если её нет"""
-    conn, cursor = database.postgres_init()
     try:
-        # Используем INSERT ON CONFLICT для атомарной проверки и вставки
-        cursor.execute('''
-            INSERT INTO money (user_id, qty_coins) 
-            VALUES (%s, %s)
-            ON CONFLICT (user_id) DO NOTHING
-            RETURNING 1
-        ''', (user_id, amount))
-
-        # Если запись была добавлена (RETURNING 1 вернул результат)
-        if cursor.fetchone():
-            conn.commit()
-            return True
-
-        # Если запись уже существовала (ON CONFLICT DO NOTHING)
-        conn.rollback()
-        return False
+        with database.postgres_init() as (conn, cursor):
+            # Используем INSERT ON CONFLICT для атомарной проверки и вставки
+            cursor.execute('''
+                INSERT INTO money (user_id, qty_coins) 
+                VALUES (%s, %s)
+                ON CONFLICT (user_id) DO NOTHING
+                RETURNING 1
+            ''', (user_id, amount))
+
+            # Если запись была добавлена (RETURNING 1 вернул результат)
+            if cursor.fetchone():
+                conn.commit()
+                user_cache.update(user_id, balance=amount)
+                return True
+
+            # Если запись уже существовала (ON CONFLICT DO NOTHING)
+            conn.rollback()
+            return False
     except Exception as e:
         logging.error(f"Ошибка при начислении стартовых монет: {e}")
-        conn.rollback()
         return False
-    finally:
-        conn.close()
-
-
-def update_user_title(bot, user_id, chat_id):
-    """Проверяет и обновляет титул пользователя, отправляет закрепленное сообщение"""
-    conn, cursor = database.postgres_init()
-    try:
-        # Получаем текущие данные пользователя
-        cursor.execute(
-            'SELECT opened_cases, title FROM user_data WHERE user_id = %s',
-            (user_id,)
-        )
-        user_data = cursor.fetchone()
 
-        if not user_data:
-            logging.error(f"User {user_id} not found in database")
-            return
 
-        opened_cases, current_title = user_data
+def update_user_title(bot, user_id, chat_id, user_data=None):
+    """
+    Проверяет и обновляет титул пользователя, отправляет закрепленное сообщение.
 
-        # Ищем подходящий титул (сортировка от большего к меньшему)
-        new_title = None
-        for threshold in sorted(dict_convert.CASE_TITLES.keys(), reverse=True):
-            if opened_cases >= threshold:
-                if dict_convert.CASE_TITLES[threshold]["title"] != current_title:
-                    new_title = dict_convert.CASE_TITLES[threshold]
-                break
+    `user_data` — уже известная пара (opened_cases, title); если передана,
+    повторный запрос к БД не выполняется.
+    """
+    try:
+        with database.postgres_init() as (conn, cursor):
+            # Получаем текущие данные пользователя
+            if user_data is None:
+                cursor.execute(
+                    'SELECT opened_cases, title FROM user_data WHERE user_id = %s',
+                    (user_id,)
+                )
+                user_data = cursor.fetchone()
+
+            if not user_data:
+                logging.error(f"User {user_id} not found in database")
+                return
+
+            opened_cases, current_title = user_data
+
+            # Ищем подходящий титул (сортировка от большего к меньшему)
+            new_title = None
+            for threshold in sorted(dict_convert.CASE_TITLES.keys(), reverse=True):
+                if opened_cases >= threshold:
+                    if dict_convert.CASE_TITLES[threshold]["title"] != current_title:
+                        new_title = dict_convert.CASE_TITLES[threshold]
+                    break
+
+            # Если нашли новый титул - обновляем
+            if new_title:
+                # Обновляем титул в БД
+                cursor.execute(
+                    'UPDATE user_data SET title = %s WHERE user_id = %s',
+                    (new_title["title"], user_id)
+                )
+                conn.commit()
+                user_cache.update(user_id, title=new_title["title"])
 
-        # Если нашли новый титул - обновляем
+        # Соединение уже вернулось в пул — отправляем сообщение без удержания его
         if new_title:
-            # Обновляем титул в БД
-            cursor.execute(
-                'UPDATE user_data SET title = %s WHERE user_id = %s',
-                (new_title["title"], user_id)
-            )
-            conn.commit()
-
             # Формируем сообщение с описанием титула
             congrat_msg = (
                 f"🎉 <b>Новый титул получен!</b>\n\n"
@@ -173,8 +198,8 @@ def update_user_title(bot, user_id, chat_id):
                 f"🔮 Следующий титул через: <code>{next_threshold(opened_cases)}</code>"
             )
 
-            # Отправляем и закрепляем сообщение
-            sent_msg = bot.send_message(
+            # Отправляем через очередь: поздравление склеится с описанием пака
+            bot.outbox.send_message(
                 chat_id,
                 congrat_msg,
                 parse_mode='HTML'
@@ -182,10 +207,6 @@ def update_user_title(bot, user_id, chat_id):
 
     except Exception as e:
         logging.error(f"Error updating user title: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def next_threshold(current_count):
@@ -201,8 +222,11 @@ def open_buster(bot, message, user_id):
     """
     Открывает бурстер с купонами для пользователя.
 
-    Генерирует купоны, сохраняет их в БД, создает графические представления купонов,
-    отправляет пользователю информацию о полученных купонах и их изображения.
+    Купоны заранее сверяются с каталогом в памяти (`catalog.resolve`); если хоть один
+    не нашелся, пак не продается и монеты не списываются. Вся покупка выполняется одной транзакцией:
+    списание монет, счетчик открытых кейсов и сохранение купонов за пользователем одним
+    INSERT ... ON CONFLICT. Если что-то падает посередине, пользователь не теряет монеты
+    и не получает "половину" пака. Картинки создаются и отправляются уже после фиксации.
 
     Args:
         bot: Объект бота для отправки сообщений
@@ -210,87 +234,95 @@ def open_buster(bot, message, user_id):
         user_id: ID пользователя, открывающего бурстер
 
     Returns:
-        None
+        int | None: Баланс после покупки или None, если пак не куплен
     """
     # Генерируем купоны
     coupons = generators.generate_coupons(qty_coupons=5)
     logger.debug(f"Сгенерированы купоны: {coupons}")
 
-    # Инициализируем подключение к БД
-    conn, cursor = database.postgres_init()
-    coupons_list = []  # Пути к изображениям купонов
+    coupons_list = []  # Картинки купонов: (хэш картинки, PNG)
     coupon_details = []  # Информация о купонах для сообщения
+    pack = []  # Найденные купоны: (редкость, строка из coupons, коллекция)
+    unresolved = []  # Купоны, которых нет в каталоге: (коллекция, цвет, номер)
+
+    # Для каждого купона выбираем коллекцию и сверяемся с каталогом
+    for coupon in coupons:
+        color = dict_convert.color_convert[coupon['rarity']]
+        collection_type = random.choice(configs.collection_type_list)
+
+        coupon_data = catalog.resolve(collection_type, color, coupon['number'])
+        if not coupon_data:
+            unresolved.append((collection_type, color, coupon['number']))
+            continue
+        pack.append((coupon['rarity'], coupon_data, coupon_data.collection))
+
+    # Неполный пак не продаем: монеты не списываем, пока каталог не исправят
+    if len(pack) < len(coupons):
+        logger.error(f"Купоны пака не найдены в каталоге (коллекция, цвет, номер): {unresolved}")
+        bot.outbox.send_message(message.chat.id, '⚠️ Не удалось собрать пак, монеты не списаны. Попробуйте позже.')
+        return None
 
     try:
-        # Увеличиваем счетчик открытых кейсов
-        logger.debug(f"Обновляем счетчик открытых кейсов для user_id={user_id}")
-        cursor.execute(
-            'UPDATE user_data SET opened_cases = opened_cases + 1 WHERE user_id = %s RETURNING opened_cases',
-            (user_id,)
-        )
-        new_case_count = cursor.fetchone()[0]
-        conn.commit()
-        logger.debug(f"Новое количество открытых кейсов: {new_case_count}")
-
-        # Проверяем и обновляем титул пользователя
-        logger.debug("Проверяем обновление титула пользователя")
-        update_user_title(bot, user_id, message.chat.id)
+        with database.postgres_init() as (conn, cursor):
+            # Списываем монеты
+            balance = coin_check(user_id, configs.price_pack_coupons, cursor=cursor)
+            if balance is not None:
+                # Увеличиваем счетчик открытых кейсов
+                logger.debug(f"Обновляем счетчик открытых кейсов для user_id={user_id}")
+                cursor.execute(
+                    'UPDATE user_data SET opened_cases = opened_cases + 1 '
+                    'WHERE user_id = %s RETURNING opened_cases, title',
+                    (user_id,)
+                )
+                title_data = cursor.fetchone()
+                logger.debug(f"Новое количество открытых кейсов: {title_data}")
 
-        # Обрабатываем каждый сгенерированный купон
-        for coupon in coupons:
-            color = dict_convert.color_convert[coupon['rarity']]
-            collection_type = random.choice(configs.collection_type_list)
-            id_for_search = f'{collection_type}_{color}_{coupon["number"]}'
+                # Сохраняем купоны за пользователем
+                database.save_info_coupons(cursor, user_id, [row for _, row, _ in pack])
+    except Exception as e:
+        logger.error(f"Критическая ошибка в open_buster: {e}")
+        logger.debug(f"Трассировка ошибки: {traceback.format_exc()}")
+        bot.outbox.send_message(message.chat.id, '⚠️ Не удалось открыть пак, монеты не списаны. Попробуйте позже.')
+        return None
 
-            logger.debug(f"Ищем купон в БД: id={id_for_search}")
+    if balance is None:
+        bot.outbox.send_message(message.chat.id, 'Ошибка! Не хватает Имперских трон для покупки!!')
+        return None
 
-            cursor.execute('SELECT * FROM coupons WHERE id=%s', (id_for_search,))
-            coupon_data = cursor.fetchone()
+    # Транзакция зафиксирована — обновляем кэш профиля и сбрасываем страницы инвентаря
+    user_cache.update(user_id, balance=balance)
+    inventory.invalidate(user_id)
+    if title_data:
+        opened_cases, title = title_data
+        user_cache.update(user_id, opened_cases=opened_cases, title=title)
 
-            if not coupon_data:
-                logging.warning(f"Купон не найден в БД: {id_for_search}")
-                continue  # Пропускаем, если купон не найден
+    # Проверяем и обновляем титул пользователя
+    logger.debug("Проверяем обновление титула пользователя")
+    update_user_title(bot, user_id, message.chat.id, user_data=title_data)
 
+    try:
+        # Обрабатываем каждый купон пака
+        for rarity, coupon_data, collection_type in pack:
             id_coupons, number, name, color, effect, description, collection = coupon_data
-            coupons_list.append(fr"downloads_coupons\{id_coupons}.png")
             logger.debug(f"Добавлен купон {id_coupons} в список для обработки")
 
             # Формируем строку с информацией о купоне
-            rarity_emoji = dict_convert.smile_convert.get(coupon['rarity'], '❓')
+            rarity_emoji = dict_convert.smile_convert.get(rarity, '❓')
             coupon_details.append(
                 f"{rarity_emoji} <b>{name}</b> (№{number}, {collection_type})\n"
             )
 
-            # Генерируем картинку купона
-            try:
-                logger.debug(f"Генерируем изображение для купона {id_coupons}")
-                images.create_coupon(
-                    rarity=coupon['rarity'],
-                    title=name,
-                    description=description,
-                    effect=effect,
-                    coupon_number=number,
-                    coupon_code=id_coupons,
-                    collection_type=collection_type,
-                    output_path=fr"downloads_coupons\{id_coupons}.png",
-                )
-                logger.debug(f"Изображение купона {id_coupons} успешно создано")
-            except Exception as e:
-                logger.error(f'Ошибка генерации карточки купона {id_coupons}: {e}')
-                logger.debug(f"Трассировка ошибки: {traceback.format_exc()}")
-
-            # Сохраняем купон в БД за пользователем
-            try:
-                logger.debug(f"Сохраняем купон {id_coupons} для пользователя {user_id}")
-                database.save_info_coupon(user_id, id_coupons, name, color)
-            except Exception as e:
-                logger.error(
-                    f"Ошибка сохранения купона {id_coupons} для пользователя {user_id}: {e}")
+        # Берем картинки купонов из кэша, недостающие рендерим параллельно
+        try:
+            logger.debug("Получаем изображения купонов пака")
+            coupons_list = render_cache.get_or_render_many(pack)
+        except Exception as e:
+            logger.error(f'Ошибка генерации карточек купонов: {e}')
+            logger.debug(f"Трассировка ошибки: {traceback.format_exc()}")
 
         # Формируем общее сообщение с информацией о купонах
         rarity_emojis = " ".join(
-            [dict_convert.smile_convert.get(coupon['rarity'], '❓')
-             for coupon in coupons]
+            [dict_convert.smile_convert.get(rarity, '❓') for rarity, _, _ in pack]
         )
         logger.debug(f"Сформированы эмодзи редкостей: {rarity_emojis}")
 
@@ -301,65 +333,97 @@ def open_buster(bot, message, user_id):
         )
         logger.debug(f"Текст сообщения для пользователя: {message_text}")
 
-        # Отправляем сообщение с описанием купонов
-        try:
-            logger.debug("Отправляем текстовое сообщение с описанием купонов")
-            bot.send_message(
-                message.chat.id,
-                message_text,
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            logger.error(f"Ошибка отправки текстового сообщения: {e}")
+        # В режиме коллажа весь пак уходит одной картинкой с описанием в подписи
+        if configs.pack_delivery['mode'] == 'collage' and coupons_list:
+            if send_pack_collage(bot, message.chat.id, coupons_list, message_text):
+                return balance
+
+        # Отправляем сообщение с описанием купонов (очередь сама соблюдает лимиты
+        # Telegram и пишет в лог ошибки отправки)
+        logger.debug("Отправляем текстовое сообщение с описанием купонов")
+        bot.outbox.send_message(
+            message.chat.id,
+            message_text,
+            parse_mode='HTML'
+        )
 
-        # Отправляем картинки медиагруппой
+        # Отправляем картинки медиагруппой (уже загруженные ранее — по file_id)
         if coupons_list:
-            media_group = []
-            logger.debug(f"Подготавливаем медиагруппу из {len(coupons_list)} изображений")
-
-            for path in coupons_list:
-                try:
-                    logger.debug(f"Читаем файл изображения: {path}")
-                    with open(path, 'rb') as photo:
-                        photo_data = photo.read()
-                    media_group.append(InputMediaPhoto(photo_data))
-                except Exception as e:
-                    logger.error(f"Ошибка загрузки картинки {path}: {e}")
-                    logger.debug(f"Трассировка ошибки: {traceback.format_exc()}")
-
-            if media_group:
-                try:
-                    logger.debug("Отправляем медиагруппу с изображениями купонов")
-                    bot.send_media_group(message.chat.id, media_group)
-                except Exception as e:
-                    logger.error(f"Ошибка отправки медиагруппы: {e}")
+            logger.debug(f"Отправляем медиагруппу из {len(coupons_list)} изображений")
+            bot.outbox.call(message.chat.id, file_ids.send_media_group, bot, message.chat.id,
+                            coupons_list)
 
     except Exception as e:
         logger.error(f"Критическая ошибка в open_buster: {e}")
         logger.debug(f"Трассировка ошибки: {traceback.format_exc()}")
-        conn.rollback()
-    finally:
-        logger.debug("Закрываем соединение с БД")
-        cursor.close()
-        conn.close()
+
+    return balance
+
+
+def send_pack_collage(bot, chat_id, coupons_list, caption):
+    """
+    Отправляет пак одной картинкой-коллажем из закэшированных карточек.
+
+    Описание пака идет подписью к фото; если оно длиннее лимита подписи Telegram,
+    оно ставится в очередь отдельным сообщением перед коллажем. Отправки не ждем:
+    если коллаж не дойдет, пак досылается медиагруппой (и описанием, если оно было
+    в подписи), так что оплаченные карты пользователь получит в любом случае.
+
+    :return: True, если коллаж поставлен в очередь; False — нужно отправить пак обычным способом.
+    """
+    settings = configs.pack_delivery
+    try:
+        collage = images.build_collage(
+            [photo_data for _, photo_data in coupons_list],
+            columns=settings['columns'],
+            card_width=settings['card_width'],
+            gap=settings['gap'],
+            profile=settings['profile'],
+        )
+    except Exception as e:
+        logger.error(f"Ошибка сборки коллажа пака: {e}")
+        return False
+
+    text_sent = len(caption) > CAPTION_LIMIT
+    if text_sent:
+        bot.outbox.send_message(chat_id, caption, parse_mode='HTML')
+    sent = bot.outbox.call(
+        chat_id, bot.send_photo, chat_id, collage,
+        caption=None if text_sent else caption, parse_mode='HTML'
+    )
+
+    def fallback(future):
+        if future.exception() is None:
+            return
+        logger.error(f"Коллаж пака не отправлен, отправляем медиагруппой: {future.exception()}")
+        if not text_sent:
+            bot.outbox.send_message(chat_id, caption, parse_mode='HTML')
+        bot.outbox.call(chat_id, file_ids.send_media_group, bot, chat_id, coupons_list)
+
+    sent.add_done_callback(fallback)
+    return True
 
 
 def get_coupon_info(coupon_code, bot, message, user_id):
-    conn, cursor = database.postgres_init()
     try:
-        cursor.execute('SELECT * FROM coupons WHERE id = %s', (coupon_code,))
-        coupon_data = cursor.fetchone()
+        coupon_data = catalog.get_by_id(coupon_code)
         coupon_code, number, name, color, effect, description, collection = coupon_data
         smile = dict_convert.color_to_smile_convert[color]
 
-        cursor.execute(
-            'SELECT quantity FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
-            (coupon_code, user_id)
-        )
-        quantity = int(cursor.fetchone()[0])
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute(
+                'SELECT quantity FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
+                (coupon_code, user_id)
+            )
+            quantity = int(cursor.fetchone()[0])
 
-        bot.send_photo(message.chat.id, open(rf'downloads_coupons\{coupon_code}.png', 'rb'))
-        bot.send_message(
+        rarity = dict_convert.color_to_rarity_convert[color]
+        # В инвентаре показываем облегченное превью, а не полноразмерную карточку
+        image_hash, photo_data = render_cache.get_or_render(
+            rarity, coupon_data, collection, profile=configs.preview_profile
+        )
+        bot.outbox.call(message.chat.id, file_ids.send_photo, bot, message.chat.id, image_hash, photo_data)
+        bot.outbox.send_message(
             message.chat.id,
             f'{smile} Купон № {number}\n'
             f'Коллекция: {collection}\n'
@@ -373,54 +437,53 @@ def get_coupon_info(coupon_code, bot, message, user_id):
 
     except Exception as e:
         logging.error(f"Ошибка при получении информации о купоне: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def activate_coupon(coupon_code, bot, message, user_id, user_data):
-    conn, cursor = database.postgres_init()
     try:
-        # Получаем данные о купоне
-        cursor.execute(
-            'SELECT quantity, name, color FROM user_coupons '
-            'WHERE coupon_code = %s AND user_id = %s',
-            (coupon_code, user_id)
-        )
-        result = cursor.fetchone()
-
-        if not result:
-            bot.send_message(message.chat.id, "❌ Купон не найден или уже использован")
-            return
-
-        quantity, name, color = result
-        quantity = int(quantity)
-
-        # Обновляем количество купонов или удаляем запись
-        if quantity > 1:
-            cursor.execute(
-                'UPDATE user_coupons SET quantity = quantity - 1 WHERE coupon_code = %s AND user_id = %s',
-                (coupon_code, user_id)
-            )
-        else:
+        with database.postgres_init() as (conn, cursor):
+            # Получаем данные о купоне
             cursor.execute(
-                'DELETE FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
+                'SELECT quantity, name, color FROM user_coupons '
+                'WHERE coupon_code = %s AND user_id = %s',
                 (coupon_code, user_id)
             )
+            result = cursor.fetchone()
+
+            if result:
+                quantity, name, color = result
+                quantity = int(quantity)
+
+                # Обновляем количество купонов или удаляем запись
+                if quantity > 1:
+                    cursor.execute(
+                        'UPDATE user_coupons SET quantity = quantity - 1 WHERE coupon_code = %s AND user_id = %s',
+                        (coupon_code, user_id)
+                    )
+                else:
+                    cursor.execute(
+                        'DELETE FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
+                        (coupon_code, user_id)
+                    )
+
+                # Фиксируем изменения в БД
+                conn.commit()
+
+        if not result:
+            bot.outbox.send_message(message.chat.id, "❌ Купон не найден или уже использован")
+            return
 
-        # Фиксируем изменения в БД
-        conn.commit()
+        inventory.invalidate(user_id)
 
         # Сообщение пользователю
-        bot.send_message(
+        bot.outbox.send_message(
             message.chat.id,
             f"✅ Купон активирован! Мастер игры уведомлен. Вы можете использовать бонус"
         )
         smile = dict_convert.color_to_smile_convert[color]
 
         # Уведомление мастера
-        bot.send_message(
+        bot.outbox.send_message(
             configs.master_id,
             f"🎫 Активирован купон:\n"
             f"• Название: {smile} {name}\n"
@@ -430,83 +493,70 @@ def activate_coupon(coupon_code, bot, message, user_id, user_data):
         )
 
     except Exception as e:
-        conn.rollback()
-        bot.send_message(message.chat.id, "⚠️ Произошла ошибка при активации купона")
+        bot.outbox.send_message(message.chat.id, "⚠️ Произошла ошибка при активации купона")
         print(f"Error activating coupon: {e}")
 
 
 def sell_coupon(coupon_code, bot, message, user_id, user_data):
-    conn, cursor = database.postgres_init()
     try:
-        # Получаем данные о купоне
-        cursor.execute(
-            'SELECT quantity, name, color FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
-            (coupon_code, user_id)
-        )
-        result = cursor.fetchone()
+        with database.postgres_init() as (conn, cursor):
+            # Получаем данные о купоне
+            cursor.execute(
+                'SELECT quantity, name, color FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
+                (coupon_code, user_id)
+            )
+            result = cursor.fetchone()
 
-        if not result:
-            bot.send_message(message.chat.id, "❌ Купон не найден или уже использован")
-            return
+            if not result:
+                bot.outbox.send_message(message.chat.id, "❌ Купон не найден или уже использован")
+                return
 
-        quantity, name, color = result
-        quantity = int(quantity)
+            quantity, name, color = result
+            quantity = int(quantity)
 
-        # Приводим цвет к нижнему регистру для сравнения
-        color_lower = color.lower()
+            # Приводим цвет к нижнему регистру для сравнения
+            color_lower = color.lower()
 
-        if color_lower not in configs.color_prices:
-            bot.send_message(message.chat.id, f"❌ Неизвестный цвет купона: {color}")
-            return
+            if color_lower not in configs.color_prices:
+                bot.outbox.send_message(message.chat.id, f"❌ Неизвестный цвет купона: {color}")
+                return
 
-        price = configs.color_prices[color_lower]
+            price = configs.color_prices[color_lower]
 
-        # Обновляем количество купонов или удаляем запись
-        if quantity > 1:
-            cursor.execute(
-                'UPDATE user_coupons SET quantity = quantity - 1 WHERE coupon_code = %s AND user_id = %s',
-                (coupon_code, user_id)
-            )
-        else:
-            cursor.execute(
-                'DELETE FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
-                (coupon_code, user_id)
-            )
-
-        # Начисляем деньги пользователю
-        # Сначала проверяем, есть ли запись о деньгах пользователя
-        cursor.execute(
-            'SELECT qty_coins FROM money WHERE user_id = %s',
-            (user_id,)
-        )
-        money_result = cursor.fetchone()
+            # Обновляем количество купонов или удаляем запись
+            if quantity > 1:
+                cursor.execute(
+                    'UPDATE user_coupons SET quantity = quantity - 1 WHERE coupon_code = %s AND user_id = %s',
+                    (coupon_code, user_id)
+                )
+            else:
+                cursor.execute(
+                    'DELETE FROM user_coupons WHERE coupon_code = %s AND user_id = %s',
+                    (coupon_code, user_id)
+                )
 
-        if money_result:
-            # Обновляем существующую запись
-            cursor.execute(
-                'UPDATE money SET qty_coins = qty_coins + %s WHERE user_id = %s',
-                (price, user_id)
-            )
-            new_balance = money_result[0] + price
-        else:
-            # Создаем новую запись
+            # Начисляем деньги пользователю (создаем запись о деньгах, если ее нет)
             cursor.execute(
-                'INSERT INTO money (user_id, qty_coins) VALUES (%s, %s)',
+                'INSERT INTO money (user_id, qty_coins) VALUES (%s, %s) '
+                'ON CONFLICT (user_id) DO UPDATE SET qty_coins = money.qty_coins + EXCLUDED.qty_coins '
+                'RETURNING qty_coins',
                 (user_id, price)
             )
-            new_balance = price
+            new_balance = int(cursor.fetchone()[0])
+
+            # Фиксируем изменения в БД
+            conn.commit()
+
+        user_cache.update(user_id, balance=new_balance)
+        inventory.invalidate(user_id)
 
         # Сообщение пользователю
-        bot.send_message(
+        bot.outbox.send_message(
             message.chat.id,
             f"✅ Купон '{name}' ({color}) продан за {price} монет.\n"
             f"💰 Твой баланс: {new_balance} монет"
         )
 
-        # Фиксируем изменения в БД
-        conn.commit()
-
     except Exception as e:
-        conn.rollback()
-        bot.send_message(message.chat.id, "⚠️ Произошла ошибка при продаже купона")
+        bot.outbox.send_message(message.chat.id, "⚠️ Произошла ошибка при продаже купона")
         print(f"Error selling coupon: {e}")
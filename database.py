@@ -1,41 +1,205 @@
+import csv
 import logging
-from typing import Optional, Dict, List, Tuple, Any
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple, Any, Iterator
 
 import psycopg
 from psycopg.types.json import Jsonb
+from psycopg_pool import ConnectionPool, PoolTimeout
 import openpyxl
 
+import callbacks
 import configs
 
 
-def postgres_init():
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+# Собственная статистика ожидания соединений (дополняет статистику psycopg_pool)
+_acquire_stats: Dict[str, float] = {
+    'acquired': 0,
+    'timeouts': 0,
+    'wait_total_ms': 0.0,
+    'wait_max_ms': 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def _conninfo() -> str:
+    return (
+        f"dbname={configs.sql_database['database']} "
+        f"user={configs.sql_database['user']} "
+        f"password={configs.sql_database['password']} "
+        f"host={configs.sql_database['host']} "
+        f"port={configs.sql_database['port']}"
+    )
+
+
+def init_pool() -> ConnectionPool:
     """
-    Инициализирует соединение с PostgreSQL базой данных.
+    Создает общий для всего процесса пул соединений с PostgreSQL.
 
-    Функция пытается подключиться к базе данных, используя конфигурационные данные из `configs.sql_database`.
-    :return: Кортеж из курсора и соединения, если подключение успешно.
-    None: Если возникла ошибка подключения, выводится сообщение об ошибке и возвращается None.
+    Параметры пула берутся из `configs.sql_pool`. Повторный вызов возвращает уже созданный пул.
+    Перед выдачей соединения пул проверяет его (`check_connection`), поэтому "мертвые"
+    соединения после рестарта базы не попадают в обработчики.
+    :return: Объект пула соединений.
     """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                _conninfo(),
+                min_size=configs.sql_pool['min_size'],
+                max_size=configs.sql_pool['max_size'],
+                timeout=configs.sql_pool['timeout'],
+                max_idle=configs.sql_pool['max_idle'],
+                max_lifetime=configs.sql_pool['max_lifetime'],
+                check=ConnectionPool.check_connection,
+                name='imperial_lottery',
+                open=True,
+            )
+            logging.info(
+                f"Пул соединений PostgreSQL создан "
+                f"(min={configs.sql_pool['min_size']}, max={configs.sql_pool['max_size']})"
+            )
+        return _pool
+
+
+def close_pool() -> None:
+    """Закрывает пул соединений (при остановке бота)."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+            logging.info("Пул соединений PostgreSQL закрыт")
+
 
+@contextmanager
+def postgres_init() -> Iterator[Tuple[psycopg.Connection, psycopg.Cursor]]:
+    """
+    Выдает соединение с PostgreSQL из общего пула.
+
+    Используется как контекстный менеджер:
+
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute(...)
+
+    При выходе из блока открытая транзакция фиксируется (или откатывается, если блок
+    завершился исключением), курсор закрывается, а соединение возвращается в пул.
+    Если свободное соединение не удалось получить за `configs.sql_pool['timeout']` секунд,
+    выбрасывается `psycopg_pool.PoolTimeout`.
+    :return: Кортеж из соединения и курсора.
+    """
+    pool = _pool if _pool is not None else init_pool()
+
+    started = time.perf_counter()
     try:
-        # Подключение к существующей базе данных
-        conn = psycopg.connect(
-            f"dbname={configs.sql_database['database']} "
-            f"user={configs.sql_database['user']} "
-            f"password={configs.sql_database['password']} "
-            f"host={configs.sql_database['host']} "
-            f"port={configs.sql_database['port']}"
-        )
-        cursor = conn.cursor()
-        return conn, cursor
+        conn = pool.getconn()
+    except PoolTimeout as error:
+        with _stats_lock:
+            _acquire_stats['timeouts'] += 1
+        logging.error(f"Нет свободных соединений с PostgreSQL: {error}")
+        raise
     except psycopg.Error as error:  # Ловим только ошибки PostgreSQL
         logging.error(f"Ошибка подключения к PostgreSQL: {error}")
-        return None
+        raise
 
+    wait_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _acquire_stats['acquired'] += 1
+        _acquire_stats['wait_total_ms'] += wait_ms
+        _acquire_stats['wait_max_ms'] = max(_acquire_stats['wait_max_ms'], wait_ms)
 
-def insert_user_data_in_bd(user_id: int, user_data: Dict[str, Any]) -> None:
-    conn, cursor = postgres_init()
     try:
+        with conn.cursor() as cursor:
+            yield conn, cursor
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    else:
+        if not conn.closed:
+            conn.commit()
+    finally:
+        # Сломанные соединения пул закроет и заменит новыми сам
+        pool.putconn(conn)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Возвращает статистику пула: насыщенность и время ожидания соединений.
+
+    Ключи:
+        size / available / in_use — текущее состояние пула;
+        saturation — доля занятых соединений от max_size (1.0 — пул исчерпан);
+        waiting — сколько запросов сейчас ждут соединение;
+        acquired / timeouts — сколько раз соединение выдано и сколько раз не дождались;
+        wait_avg_ms / wait_max_ms — среднее и максимальное время получения соединения.
+    """
+    pool = init_pool()
+    raw = pool.get_stats()
+
+    size = raw.get('pool_size', 0)
+    available = raw.get('pool_available', 0)
+    in_use = size - available
+    max_size = configs.sql_pool['max_size']
+
+    with _stats_lock:
+        acquired = int(_acquire_stats['acquired'])
+        timeouts = int(_acquire_stats['timeouts'])
+        wait_total_ms = _acquire_stats['wait_total_ms']
+        wait_max_ms = _acquire_stats['wait_max_ms']
+
+    return {
+        'size': size,
+        'available': available,
+        'in_use': in_use,
+        'max_size': max_size,
+        'saturation': round(in_use / max_size, 3) if max_size else 0.0,
+        'waiting': raw.get('requests_waiting', 0),
+        'acquired': acquired,
+        'timeouts': timeouts,
+        'wait_avg_ms': round(wait_total_ms / acquired, 2) if acquired else 0.0,
+        'wait_max_ms': round(wait_max_ms, 2),
+    }
+
+
+def log_pool_stats() -> None:
+    """Пишет статистику пула соединений в лог."""
+    stats = pool_stats()
+    level = logging.WARNING if stats['saturation'] >= 1 or stats['waiting'] else logging.INFO
+    logging.log(level, f"Статистика пула PostgreSQL: {stats}")
+
+
+def start_pool_stats_logging(interval: Optional[float] = None) -> None:
+    """
+    Запускает фоновый поток, который раз в `interval` секунд пишет статистику пула в лог.
+
+    По этим записям удобно подбирать `pool_min_size`/`pool_max_size` под пиковую нагрузку.
+    """
+    interval = configs.sql_pool['stats_interval'] if interval is None else interval
+    if not interval or interval <= 0:
+        return
+
+    def worker() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                log_pool_stats()
+            except Exception as error:
+                logging.error(f"Ошибка получения статистики пула: {error}")
+
+    threading.Thread(target=worker, name='pool-stats', daemon=True).start()
+
+
+def insert_user_data_in_bd(user_id: int, user_data: Dict[str, Any]) -> None:
+    with postgres_init() as (conn, cursor):
         cursor.execute('''
             INSERT INTO user_data 
             (user_id, user_data, is_admin, opened_cases, title) 
@@ -44,121 +208,239 @@ def insert_user_data_in_bd(user_id: int, user_data: Dict[str, Any]) -> None:
             DO UPDATE SET user_data = EXCLUDED.user_data;
         ''', (user_id, Jsonb(user_data), False, 0, 'Новичок'))
         conn.commit()
-    finally:
-        conn.close()
 
 
-def parse_and_save_to_db(file_path: str, message, bot) -> None:
+COUPON_COLUMNS = ('id', 'number', 'name', 'color', 'effect', 'description', 'collection')
+
+# Сколько строк Excel проверяется и отправляется в COPY за один раз
+IMPORT_BATCH_SIZE = 500
+
+
+def _validate_coupon_rows(rows: List[Tuple[int, tuple]], seen_ids: set,
+                          errors: List[Tuple[int, str]]) -> List[tuple]:
+    """
+    Проверяет пачку строк Excel и возвращает готовые к загрузке записи.
+
+    Ошибочные строки не загружаются, а попадают в `errors` как (номер строки, причина).
+    """
+    records = []
+    for row_num, row in rows:
+        # Берем только первые 6 значений и проверяем, что они не None
+        filtered_row = [str(cell).strip() if cell is not None else "" for cell in row[:6]]
+
+        if not any(filtered_row):
+            continue  # Пустые строки просто пропускаем
+
+        if len(filtered_row) < 6:
+            errors.append((row_num, f"Недостаточно данных, получено только {len(filtered_row)} значений"))
+            continue
+
+        number, name, color, effect, description, collection = filtered_row
+
+        if not number.isdigit():
+            errors.append((row_num, f"Номер должен быть числом, получено: {number}"))
+            continue
+
+        if not color or not collection:
+            errors.append((row_num, "Не указан цвет или коллекция"))
+            continue
+
+        id = f'{collection}_{color}_{number}'
+        if callbacks.SEPARATOR in id or len(id.encode('utf-8')) > callbacks.COUPON_ID_MAX_BYTES:
+            errors.append((row_num, f"Код купона {id} содержит '{callbacks.SEPARATOR}' или длиннее "
+                                    f"{callbacks.COUPON_ID_MAX_BYTES} байт и не поместится в кнопку"))
+            continue
+        if id in seen_ids:
+            errors.append((row_num, f"Повтор купона {id}"))
+            continue
+        seen_ids.add(id)
+
+        records.append((id, int(number), name, color, effect, description, collection))
+
+    return records
+
+
+def _send_import_report(file_path: str, errors: List[Tuple[int, str]], message, bot) -> None:
+    """Сохраняет построчный отчет об ошибках импорта рядом с файлом и отправляет его."""
+    for row_num, error in errors:
+        logging.warning(f"Пропуск строки {row_num}: {error}")
+
+    report_path = f"{os.path.splitext(file_path)[0]}_errors.csv"
+    with open(report_path, 'w', newline='', encoding='utf-8-sig') as report_file:
+        writer = csv.writer(report_file, delimiter=';')
+        writer.writerow(['row', 'error'])
+        writer.writerows(errors)
+
+    def send_report():
+        with open(report_path, 'rb') as report_file:
+            return bot.send_document(message.chat.id, report_file,
+                                     caption="Строки, которые не удалось загрузить")
+
+    bot.outbox.call(message.chat.id, send_report)
+
+
+def parse_and_save_to_db(file_path: str, message, bot) -> bool:
     """
     Парсит данные из Excel файла и сохраняет их в базу данных PostgreSQL.
 
     Ожидаемые колонки: number, name, color, effect, description, collection
 
+    Файл читается потоково (openpyxl в режиме read_only), строки проверяются пачками
+    и через COPY загружаются во временную таблицу. Затем живая таблица coupons
+    обновляется из нее в той же транзакции: новые и измененные купоны записываются
+    через INSERT ... ON CONFLICT, отсутствующие в файле — удаляются, кроме тех, что
+    уже есть у пользователей: они остаются в каталоге и попадают в отчет. До COMMIT бот
+    видит старый каталог, после — сразу новый; пустой таблица не бывает никогда.
+    Если в файле нет ни одной корректной строки, каталог не меняется.
+    По строкам с ошибками администратору отправляется CSV-отчет.
+
     Args:
         file_path: Путь к Excel файлу
         message: Объект сообщения Telegram
         bot: Объект бота Telegram
+
+    Returns:
+        bool: True, если импорт завершился
     """
+    errors: List[Tuple[int, str]] = []
+
     try:
         logging.debug(f"Начало обработки файла: {file_path}")
+        started = time.perf_counter()
 
-        workbook = openpyxl.load_workbook(file_path)
-        sheet = workbook.active
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
 
-        conn, cursor = postgres_init()
-        logging.debug("Подключение к БД установлено")
+            with postgres_init() as (conn, cursor):
+                logging.debug("Подключение к БД установлено")
 
-        cursor.execute("DELETE FROM coupons")
-        conn.commit()
-        logging.debug("Старые данные удалены")
+                cursor.execute(
+                    "CREATE TEMP TABLE coupons_staging (LIKE coupons INCLUDING DEFAULTS) "
+                    "ON COMMIT DROP"
+                )
 
-        for row_num, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-            try:
-                # Берем только первые 6 значений и проверяем, что они не None
-                filtered_row = [str(cell).strip() if cell is not None else "" for cell in row[:6]]
+                columns = ', '.join(COUPON_COLUMNS)
+                loaded = 0
+                seen_ids: set = set()
+                batch: List[Tuple[int, tuple]] = []
+
+                with cursor.copy(f"COPY coupons_staging ({columns}) FROM STDIN") as copy:
+                    rows = sheet.iter_rows(min_row=2, values_only=True)
+                    for row_num, row in enumerate(rows, start=2):
+                        batch.append((row_num, row))
+                        if len(batch) < IMPORT_BATCH_SIZE:
+                            continue
 
-                if len(filtered_row) < 6:
-                    raise ValueError(
-                        f"Недостаточно данных, получено только {len(filtered_row)} значений")
+                        for record in _validate_coupon_rows(batch, seen_ids, errors):
+                            copy.write_row(record)
+                            loaded += 1
+                        batch = []
 
-                number, name, color, effect, description, collection = filtered_row
-                logging.debug(f"Обработка строки {row_num}: {filtered_row}")
+                    for record in _validate_coupon_rows(batch, seen_ids, errors):
+                        copy.write_row(record)
+                        loaded += 1
 
-                if not number.isdigit():
-                    raise ValueError(f"Номер должен быть числом, получено: {number}")
+                logging.debug(f"Во временную таблицу загружено {loaded} строк")
 
-                id = f'{collection}_{color}_{number}'
+                if not loaded:
+                    raise ValueError("В файле нет ни одной корректной строки, каталог не изменен")
 
+                # Подменяем содержимое живой таблицы в той же транзакции
+                updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in COUPON_COLUMNS[1:])
                 cursor.execute(
-                    "INSERT INTO coupons (id, number, name, color, effect, description, collection) "
-                    "VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                    (id, int(number), name, color, effect, description, collection)
+                    f"INSERT INTO coupons ({columns}) SELECT {columns} FROM coupons_staging "
+                    f"ON CONFLICT (id) DO UPDATE SET {updates}"
                 )
-                conn.commit()
+                # Купоны, которые уже есть у пользователей, не удаляем (на них ссылается
+                # user_coupons) — оставляем в каталоге и перечисляем в отчете
+                cursor.execute(
+                    "DELETE FROM coupons c "
+                    "WHERE NOT EXISTS (SELECT 1 FROM coupons_staging s WHERE s.id = c.id) "
+                    "AND NOT EXISTS (SELECT 1 FROM user_coupons uc WHERE uc.coupon_code = c.id)"
+                )
+                removed = cursor.rowcount
+                cursor.execute(
+                    "SELECT c.id FROM coupons c "
+                    "WHERE NOT EXISTS (SELECT 1 FROM coupons_staging s WHERE s.id = c.id) "
+                    "ORDER BY c.id"
+                )
+                kept = [coupon_id for coupon_id, in cursor.fetchall()]
+                for coupon_id in kept:
+                    # 0 — строки в файле нет
+                    errors.append((0, f"Купона {coupon_id} нет в файле, но он есть у пользователей — "
+                                      f"оставлен в каталоге"))
+        finally:
+            workbook.close()
+
+        elapsed = time.perf_counter() - started
+        logging.info(
+            f"Импорт каталога: загружено {loaded}, удалено {removed}, оставлено {len(kept)}, "
+            f"ошибок {len(errors)}, время {elapsed:.2f} с"
+        )
+        bot.outbox.call(
+            message.chat.id, bot.reply_to, message,
+            f"Данные успешно загружены в базу данных!\n"
+            f"Купонов: {loaded}, удалено старых: {removed}, "
+            f"оставлено (есть у пользователей): {len(kept)}, строк с ошибками: {len(errors) - len(kept)}"
+        )
 
-            except ValueError as ve:
-                logging.warning(f"Пропуск строки {row_num}: {ve}")
-                continue
-            except Exception as e:
-                logging.error(f"Ошибка в строке {row_num}: {e}", exc_info=True)
-                continue
+        if errors:
+            _send_import_report(file_path, errors, message, bot)
 
-        conn.close()
-        logging.info(f"Успешно обработано {sheet.max_row - 1} строк")
-        bot.reply_to(message, "Данные успешно загружены в базу данных!")
+        return True
 
     except Exception as e:
         logging.critical(f"Ошибка обработки файла: {e}", exc_info=True)
-        bot.reply_to(message, f"Ошибка: {str(e)}")
+        bot.outbox.call(message.chat.id, bot.reply_to, message, f"Ошибка: {str(e)}")
+        if errors:
+            _send_import_report(file_path, errors, message, bot)
+        return False
 
 
-def save_info_coupon(user_id: int, coupon_code: str, name: str, color: str) -> None:
+def save_info_coupons(cursor, user_id: int, coupons: List[Tuple]) -> None:
     """
-    Сохраняет информацию о купоне пользователя.
+    Сохраняет купоны пака за пользователем одним запросом.
 
-    Если у пользователя нет такого купона - создает новую запись с количеством 1.
-    Если купон уже есть - увеличивает количество на 1.
+    Если у пользователя нет такого купона - создает новую запись,
+    если купон уже есть - увеличивает количество. Повторы внутри пака
+    схлопываются заранее, т.к. ON CONFLICT не может обновить одну строку дважды.
+    Выполняется в транзакции вызывающего кода (без commit).
 
     Args:
+        cursor: Курсор открытой транзакции
         user_id: ID пользователя
-        coupon_code: Код купона
+        coupons: Строки из таблицы coupons (id, number, name, color, ...)
 
     Returns:
         None
     """
-    logging.info(f"Начало обработки купона для user_id={user_id}, coupon_code={coupon_code}")
-
-    conn, cursor = postgres_init()
-    try:
-        # Проверяем существование записи
-        logging.debug("Проверяем наличие купона у пользователя...")
-        cursor.execute(
-            "SELECT quantity FROM user_coupons WHERE user_id = %s AND coupon_code = %s",
-            (user_id, coupon_code)
+    if not coupons:
+        return
+
+    quantities: Dict[str, int] = {}
+    details: Dict[str, Tuple[str, str]] = {}
+    for coupon in coupons:
+        coupon_code, _, name, color = coupon[:4]
+        quantities[coupon_code] = quantities.get(coupon_code, 0) + 1
+        details[coupon_code] = (name, color)
+
+    codes = list(quantities)
+    logging.debug(f"Сохраняем купоны {quantities} для user_id={user_id}")
+    cursor.execute(
+        """
+        INSERT INTO user_coupons (user_id, coupon_code, quantity, name, color)
+        SELECT %s, t.coupon_code, t.quantity, t.name, t.color
+        FROM unnest(%s::varchar[], %s::int[], %s::varchar[], %s::varchar[])
+            AS t(coupon_code, quantity, name, color)
+        ON CONFLICT (user_id, coupon_code)
+        DO UPDATE SET quantity = user_coupons.quantity + EXCLUDED.quantity
+        """,
+        (
+            user_id,
+            codes,
+            [quantities[code] for code in codes],
+            [details[code][0] for code in codes],
+            [details[code][1] for code in codes],
         )
-        result = cursor.fetchone()
-
-        if result:
-            # Обновляем существующую запись
-            new_quantity = result[0] + 1
-            logging.debug(f"Купон найден, обновляем количество на {new_quantity}")
-            cursor.execute(
-                "UPDATE user_coupons SET quantity = %s WHERE user_id = %s AND coupon_code = %s",
-                (new_quantity, user_id, coupon_code)
-            )
-        else:
-            # Создаем новую запись
-            logging.debug("Купон не найден, создаем новую запись")
-            cursor.execute(
-                "INSERT INTO user_coupons (user_id, coupon_code, quantity, name, color) VALUES (%s, %s, 1, %s, %s)",
-                (user_id, coupon_code, name, color)
-            )
-
-        conn.commit()
-        logging.info(f"Успешно обработан купон для user_id={user_id}, coupon_code={coupon_code}")
-    except Exception as e:
-        logging.error(f"Ошибка при обработке купона: {str(e)}")
-        raise
-    finally:
-        conn.close()
-        logging.debug("Соединение с базой данных закрыто")
+    )
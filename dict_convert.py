@@ -14,6 +14,14 @@ smile_convert = {
     "legendary": '🟠'
 }
 
+color_to_rarity_convert = {
+    "white": 'common',
+    "blue": 'uncommon',
+    "puple": 'rare',
+    "red": 'epic',
+    "gold": 'legendary'
+}
+
 color_to_smile_convert = {
     "white": '⚪️',
     "blue": '🔵',
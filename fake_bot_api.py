@@ -0,0 +1,178 @@
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.error import HTTPError
+from urllib.parse import parse_qs
+
+
+logger = logging.getLogger(__name__)
+
+# Счетчики вызовов методов Bot API
+calls: Counter = Counter()
+_message_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+def _parse_params(content_type: str, body: bytes) -> Dict[str, Any]:
+    # telebot шлет параметры формой, а файлы — multipart
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            params[name] = part.get_content() if part.get_filename() is None else b'<file>'
+        return params
+    if content_type.startswith('application/json'):
+        return json.loads(body or b'{}')
+    return {key: values[-1] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+
+def _message(params: Dict[str, Any], **extra) -> Dict[str, Any]:
+    chat_id = int(params.get('chat_id', 0) or 0)
+    result = {
+        'message_id': next(_message_ids),
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+    }
+    result.update(extra)
+    return result
+
+
+def _photo() -> Dict[str, Any]:
+    file_id = f"fake-photo-{next(_message_ids)}"
+    return {'photo': [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1, 'height': 1}]}
+
+
+def handle_method(method: str, params: Dict[str, Any]) -> Any:
+    """Возвращает правдоподобный `result` для метода Bot API."""
+    if method == 'getMe':
+        return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+    if method in ('sendMessage', 'editMessageText'):
+        return _message(params, text=params.get('text', ''))
+    if method == 'sendPhoto':
+        return _message(params, caption=params.get('caption'), **_photo())
+    if method == 'sendMediaGroup':
+        media = json.loads(params.get('media', '[]'))
+        return [_message(params, **_photo()) for _ in media]
+    if method == 'sendDocument':
+        return _message(params, document={'file_id': 'fake-document', 'file_unique_id': 'fake'})
+    if method == 'getUpdates':
+        return []
+    return True
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:
+        # Путь: /bot<token>/<method>
+        method = self.path.rstrip('/').rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length', 0))
+        params = _parse_params(self.headers.get('Content-Type', ''), self.rfile.read(length))
+
+        with _lock:
+            calls[method] += 1
+        body = json.dumps({'ok': True, 'result': handle_method(method, params)}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"fake api: {format % args}")
+
+
+def start(host: str = '127.0.0.1', port: int = 8081) -> ThreadingHTTPServer:
+    """Запускает заглушку в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), FakeBotApiHandler)
+    threading.Thread(target=server.serve_forever, name='fake-bot-api', daemon=True).start()
+    logger.info(f"Заглушка Bot API запущена на {host}:{port}")
+    return server
+
+
+def fake_update(update_id: int, user_id: int, data: str = 'info') -> Dict[str, Any]:
+    """Синтетическое обновление: нажатие inline-кнопки пользователем."""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': True, 'first_name': 'FakeBot'},
+                'text': 'menu',
+            },
+        },
+    }
+
+
+def push_updates(webhook_url: str, count: int, users: int, data: str,
+                 secret_token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Отправляет `count` обновлений на webhook бота от `users` разных пользователей.
+
+    :return: Статусы ответов webhook и общее время.
+    """
+    statuses: Counter = Counter()
+    started = time.perf_counter()
+    for update_id in range(1, count + 1):
+        request = urllib.request.Request(
+            webhook_url,
+            data=json.dumps(fake_update(update_id, 1000 + update_id % users, data)).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        if secret_token:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', secret_token)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                statuses[response.status] += 1
+        except HTTPError as e:
+            statuses[e.code] += 1
+    return {'statuses': dict(statuses), 'seconds': round(time.perf_counter() - started, 2)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Заглушка Telegram Bot API для локальных проверок")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--webhook', default=None, help="Адрес webhook бота для отправки обновлений")
+    parser.add_argument('--secret', default=None, help="secret_token webhook")
+    parser.add_argument('--updates', type=int, default=100, help="Сколько обновлений отправить")
+    parser.add_argument('--users', type=int, default=10, help="От скольких пользователей")
+    parser.add_argument('--data', default='info', help="callback_data нажатой кнопки")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    api_server = start(args.host, args.port)
+
+    try:
+        if args.webhook:
+            print(push_updates(args.webhook, args.updates, args.users, args.data, args.secret))
+            time.sleep(2)  # Даем боту отправить ответы
+            print(f"Вызовы Bot API: {dict(calls)}")
+        else:
+            while True:
+                time.sleep(60)
+                logger.info(f"Вызовы Bot API: {dict(calls)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api_server.shutdown()
@@ -0,0 +1,152 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InputMediaPhoto
+
+import database
+
+
+logger = logging.getLogger(__name__)
+
+# Хэш картинки (ключ кэша рендера) -> file_id, который Telegram выдал после первой загрузки
+_file_ids: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def load() -> int:
+    """
+    Загружает сохраненные file_id из таблицы coupon_file_ids в память.
+
+    :return: Количество загруженных file_id.
+    """
+    try:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute('SELECT image_hash, file_id FROM coupon_file_ids')
+            rows = cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Не удалось загрузить file_id картинок, работаем без них: {e}")
+        return 0
+
+    with _lock:
+        _file_ids.update(rows)
+    logger.info(f"Загружено file_id картинок: {len(rows)}")
+    return len(rows)
+
+
+def get(image_hash: str) -> Optional[str]:
+    """Возвращает file_id картинки или None, если она еще не загружалась в Telegram."""
+    return _file_ids.get(image_hash)
+
+
+def save(image_hash: str, file_id: str) -> None:
+    """Запоминает file_id картинки в памяти и в БД."""
+    with _lock:
+        if _file_ids.get(image_hash) == file_id:
+            return
+        _file_ids[image_hash] = file_id
+
+    try:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute(
+                'INSERT INTO coupon_file_ids (image_hash, file_id) VALUES (%s, %s) '
+                'ON CONFLICT (image_hash) DO UPDATE SET file_id = EXCLUDED.file_id',
+                (image_hash, file_id)
+            )
+    except Exception as e:
+        logger.error(f"Не удалось сохранить file_id картинки {image_hash}: {e}")
+
+
+def forget(image_hash: str) -> None:
+    """Удаляет file_id, который Telegram перестал принимать."""
+    with _lock:
+        _file_ids.pop(image_hash, None)
+
+    try:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute('DELETE FROM coupon_file_ids WHERE image_hash = %s', (image_hash,))
+    except Exception as e:
+        logger.error(f"Не удалось удалить file_id картинки {image_hash}: {e}")
+
+
+# Фрагменты описания ошибки 400, с которыми Telegram отклоняет неверный или устаревший file_id.
+# Остальные ошибки 400 (чат не найден, неверная подпись или разметка) к file_id отношения не имеют
+_REJECTED_FILE_ID_ERRORS = (
+    'wrong file identifier',
+    'wrong remote file identifier',
+    'file_reference_',
+    'invalid file_id',
+    'invalid remote file identifier',
+)
+
+
+def _is_rejected_file_id(error: ApiTelegramException) -> bool:
+    if error.error_code != 400:
+        return False
+    description = (error.description or '').lower()
+    return any(fragment in description for fragment in _REJECTED_FILE_ID_ERRORS)
+
+
+def send_photo(bot, chat_id, image_hash: str, photo_data: bytes, **kwargs):
+    """
+    Отправляет картинку, по возможности по file_id, без повторной загрузки.
+
+    Если file_id еще нет или Telegram его отклонил, картинка загружается байтами,
+    а полученный file_id сохраняется для следующих отправок.
+    """
+    file_id = get(image_hash)
+    if file_id:
+        try:
+            return bot.send_photo(chat_id, file_id, **kwargs)
+        except ApiTelegramException as e:
+            if not _is_rejected_file_id(e):
+                raise
+            logger.warning(f"Telegram отклонил file_id картинки {image_hash}: {e}")
+            forget(image_hash)
+
+    sent = bot.send_photo(chat_id, photo_data, **kwargs)
+    if sent and sent.photo:
+        save(image_hash, sent.photo[-1].file_id)
+    return sent
+
+
+def send_media_group(bot, chat_id, photos: List[Tuple[str, bytes]], **kwargs):
+    """
+    Отправляет медиагруппу картинок, подставляя известные file_id вместо байтов.
+
+    Args:
+        bot: Объект бота
+        chat_id: Чат получателя
+        photos: Список (хэш картинки, байты PNG)
+
+    Returns:
+        Список отправленных сообщений
+    """
+    known = {image_hash: get(image_hash) for image_hash, _ in photos}
+
+    def build_media(use_file_ids: bool) -> List[InputMediaPhoto]:
+        return [
+            InputMediaPhoto(known[image_hash] if use_file_ids and known[image_hash] else photo_data)
+            for image_hash, photo_data in photos
+        ]
+
+    use_file_ids = any(known.values())
+    try:
+        sent = bot.send_media_group(chat_id, build_media(use_file_ids), **kwargs)
+    except ApiTelegramException as e:
+        if not use_file_ids or not _is_rejected_file_id(e):
+            raise
+        # Не знаем, какой именно file_id отклонен, поэтому сбрасываем все и грузим заново
+        logger.warning(f"Telegram отклонил file_id в медиагруппе: {e}")
+        for image_hash, file_id in known.items():
+            if file_id:
+                forget(image_hash)
+                known[image_hash] = None
+        use_file_ids = False
+        sent = bot.send_media_group(chat_id, build_media(use_file_ids), **kwargs)
+
+    for (image_hash, _), message in zip(photos, sent or []):
+        if message.photo and not (use_file_ids and known[image_hash]):
+            save(image_hash, message.photo[-1].file_id)
+    return sent
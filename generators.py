@@ -1,63 +1,222 @@
 import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 import configs
 
+
+def _build_alias_table(probabilities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Строит таблицы alias-метода (Vose) для выборки за O(1) на элемент.
+
+    :return: (вероятности корзин, индексы-заместители).
+    """
+    n = len(probabilities)
+    scaled = probabilities * n / probabilities.sum()
+    prob = np.ones(n)
+    alias = np.arange(n)
+
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] = scaled[more] + scaled[less] - 1.0
+        (small if scaled[more] < 1.0 else large).append(more)
+
+    # Оставшиеся корзины (из-за погрешности округления) заполнены целиком
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+class PackSampler:
+    """
+    Генератор паков купонов по весам редкостей из `configs.weights`.
+
+    Таблицы alias-метода строятся один раз при создании, поэтому выбор редкости —
+    одно случайное число и одно сравнение, и сразу для тысяч паков массивами NumPy.
+    Правила пака:
+    - последний купон пака не бывает common, если до него выпали только common;
+    - купонов одной редкости в паке не больше, чем их есть в `configs.qty`,
+      вместо "лишнего" купона выбирается другая редкость, пак всегда полный;
+    - номер купона равномерно выбирается от 1 до `configs.qty[редкость]`.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 qty: Optional[Dict[str, int]] = None, seed: Optional[int] = None) -> None:
+        weights = weights or configs.weights
+        qty = qty or configs.qty
+
+        self.rarities: List[str] = list(weights)
+        self.common = self.rarities.index('common')
+        self.weights = np.array([weights[rarity] for rarity in self.rarities], dtype=float)
+        self.qty = np.array([qty[rarity] for rarity in self.rarities], dtype=np.int64)
+
+        # Обычная таблица и таблица "гарантии" (все редкости, кроме common)
+        self._table = _build_alias_table(self.weights)
+        self._forced = np.array([i for i in range(len(self.rarities)) if i != self.common])
+        self._forced_table = _build_alias_table(self.weights[self._forced])
+
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self, table: Tuple[np.ndarray, np.ndarray], size) -> np.ndarray:
+        prob, alias = table
+        column = self._rng.integers(0, len(prob), size=size)
+        return np.where(self._rng.random(size=size) < prob[column], column, alias[column])
+
+    def _fix_pack(self, pack: np.ndarray, pity: bool) -> None:
+        # Пересобирает пак, в котором какой-то редкости больше, чем ее есть в qty
+        remaining = self.qty.copy()
+        for i, rarity in enumerate(pack):
+            if remaining[rarity] <= 0:
+                allowed = remaining > 0
+                if pity and i == len(pack) - 1 and not (pack[:i] != self.common).any():
+                    allowed[self.common] = False
+                choices = np.flatnonzero(allowed)
+                if choices.size == 0:
+                    raise ValueError("Недостаточно купонов в configs.qty для полного пака")
+                weights = self.weights[choices]
+                rarity = choices[self._rng.choice(choices.size, p=weights / weights.sum())]
+                pack[i] = rarity
+            remaining[rarity] -= 1
+
+    def sample(self, packs: int, qty_coupons: int = 5,
+               pity: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Генерирует сразу несколько паков.
+
+        Args:
+            packs: Количество паков
+            qty_coupons: Купонов в паке
+            pity: Применять ли гарантию не-common купона в конце пака
+
+        Returns:
+            Два массива формы (packs, qty_coupons): индексы редкостей в `self.rarities`
+            и номера купонов (от 1 до qty редкости)
+        """
+        if qty_coupons > self.qty.sum():
+            raise ValueError("Недостаточно купонов в configs.qty для полного пака")
+
+        with self._lock:
+            rarities = self._draw(self._table, (packs, qty_coupons))
+
+            if pity and qty_coupons > 0:
+                # Паки, где все купоны кроме последнего — common: последний из "гарантии"
+                all_common = (rarities[:, :-1] == self.common).all(axis=1)
+                if all_common.any():
+                    rarities[all_common, -1] = self._forced[
+                        self._draw(self._forced_table, int(all_common.sum()))
+                    ]
+
+            # Паки, в которых редкостей больше, чем купонов этой редкости
+            counts = np.zeros((packs, len(self.rarities)), dtype=np.int64)
+            np.add.at(counts, (np.arange(packs)[:, None], rarities), 1)
+            for row in np.flatnonzero((counts > self.qty).any(axis=1)):
+                self._fix_pack(rarities[row], pity)
+
+            numbers = (self._rng.random(size=rarities.shape) * self.qty[rarities]).astype(np.int64) + 1
+
+        return rarities, numbers
+
+    def sample_pack(self, qty_coupons: int = 5) -> List[Dict]:
+        """Один пак в формате `generate_coupons`: [{'rarity': ..., 'number': ...}, ...]."""
+        rarities, numbers = self.sample(1, qty_coupons)
+        return [
+            {"rarity": self.rarities[rarity], "number": int(number)}
+            for rarity, number in zip(rarities[0], numbers[0])
+        ]
+
+
+_sampler: Optional[PackSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> PackSampler:
+    """Возвращает общий генератор паков, построенный по текущим настройкам configs."""
+    global _sampler
+
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = PackSampler()
+    return _sampler
+
+
 def generate_coupons(qty_coupons):
+    """
+    Генерирует один пак купонов.
 
-    # Создаем копии словарей для работы
-    available = configs.qty.copy()
-    weights_list = list(configs.weights.items())
-
-    coupons = []
-
-    # Генерируем 5 купонов
-    for _ in range(qty_coupons):
-        # Если это последний купон и еще нет uncommon или выше, форсируем выбор
-        if len(coupons) == qty_coupons-1 and not any(c['rarity'] != 'common' for c in coupons):
-            # Выбираем только из uncommon или выше
-            forced_weights = {k: v for k, v in configs.weights.items() if k != 'common'}
-            # Нормализуем веса
-            total = sum(forced_weights.values())
-            normalized_weights = {k: v / total for k, v in forced_weights.items()}
-
-            # Выбираем редкость
-            rarity = random.choices(
-                list(normalized_weights.keys()),
-                weights=list(normalized_weights.values()),
-                k=1
-            )[0]
-        else:
-            # Обычный выбор редкости
-            rarity = random.choices(
-                list(configs.weights.keys()),
-                weights=list(configs.weights.values()),
-                k=1
-            )[0]
-
-        # Проверяем, есть ли еще купоны такой редкости
-        if available[rarity] <= 0:
-            # Если нет, пробуем снова (можно оптимизировать)
-            continue
-
-        # Генерируем номер купона
-        coupon_number = random.randint(1, configs.qty[rarity]+1)
-
-        # Добавляем купон в результат
-        coupons.append({
-            "rarity": rarity,
-            "number": coupon_number
-        })
-
-        # Уменьшаем количество доступных купонов этой редкости
-        available[rarity] -= 1
-
-    return coupons
+    :return: Список из ровно `qty_coupons` словарей {'rarity': ..., 'number': ...}.
+    """
+    return get_sampler().sample_pack(qty_coupons)
 
 
 import random
 import string
 
 
+# Символы промокода и их "значения": цифры — 0..9, буквы — A=1 ... Z=26
+PROMO_ALPHABET = string.digits + string.ascii_uppercase
+_PROMO_VALUES = np.array(
+    [int(c) if c.isdigit() else (ord(c) - ord('A') + 1) for c in PROMO_ALPHABET], dtype=np.int32
+)
+
+# Все допустимые 4-символьные блоки: индексы в системе счисления по PROMO_ALPHABET
+_promo_blocks: Optional[Tuple[np.ndarray, np.ndarray]] = None
+_promo_blocks_lock = threading.Lock()
+
+
+def _promo_block_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Перебирает все 36^4 блока один раз и оставляет допустимые.
+
+    :return: (блоки первой части — сумма значений 25,
+              блоки второй части — произведение кратно 10 и есть значение 2 или 5).
+    """
+    global _promo_blocks
+
+    if _promo_blocks is None:
+        with _promo_blocks_lock:
+            if _promo_blocks is None:
+                base = len(PROMO_ALPHABET)
+                indices = np.arange(base ** 4, dtype=np.uint32)
+                values = np.stack(
+                    [_PROMO_VALUES[indices // base ** (3 - i) % base] for i in range(4)]
+                )
+
+                part1 = indices[values.sum(axis=0) == 25]
+                has_two_or_five = ((values == 2) | (values == 5)).any(axis=0)
+                part2 = indices[(values.prod(axis=0) % 10 == 0) & has_two_or_five]
+                _promo_blocks = (part1, part2)
+    return _promo_blocks
+
+
+def _decode_block(index: int) -> str:
+    base = len(PROMO_ALPHABET)
+    chars = []
+    for _ in range(4):
+        index, digit = divmod(int(index), base)
+        chars.append(PROMO_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def _amount_suffix(coin_amount: int) -> str:
+    # Y — десятки суммы (A=10, B=20, ...), Z — единицы (A=1, B=2, ...)
+    if not 1 <= coin_amount <= 286:
+        raise ValueError("Сумма должна быть от 1 до 286")
+
+    tens = (coin_amount // 10) - 1  # A=10, B=20, ...
+    units = (coin_amount % 10) - 1  # A=1, B=2, ...
+    if tens < 0:
+        tens = 25  # Если сумма <10, десятки = Z (0), но лучше избегать этого случая
+    return chr(ord('A') + tens) + chr(ord('A') + units)
+
+
 def generate_promo_code(coin_amount: int) -> str:
     """
     Генерирует промокод с заданной суммой вознаграждения.
@@ -69,50 +228,56 @@ def generate_promo_code(coin_amount: int) -> str:
       - Y — буква, кодирующая десятки суммы (A=10, B=20, ..., Z=260).
       - Z — буква, кодирующая единицы суммы (A=1, B=2, ..., Z=26).
 
+    Первые две части берутся из заранее перебранных таблиц допустимых блоков,
+    поэтому генерация не зависит от удачи и выполняется за постоянное время.
+
     Args:
         coin_amount (int): Сумма валюты для начисления (должна быть в диапазоне 1-286).
 
     Returns:
         str: Промокод в формате "XXXX-XXXX-XXYZ".
     """
-    if not 1 <= coin_amount <= 286:
-        raise ValueError("Сумма должна быть от 1 до 286")
+    suffix = _amount_suffix(coin_amount)
+    part1_blocks, part2_blocks = _promo_block_tables()
 
-    # Генерация первой части (сумма = 25)
-    part1 = ""
-    while True:
-        part1 = ''.join(random.choices(string.digits + string.ascii_uppercase, k=4))
-        total = sum(int(c) if c.isdigit() else (ord(c) - ord('A') + 1) for c in part1)
-        if total == 25:
-            break
-
-    # Генерация второй части (произведение кратно 10)
-    part2 = ""
-    while True:
-        part2 = ''.join(random.choices(string.digits + string.ascii_uppercase, k=4))
-        product = 1
-        has_two_or_five = False
-        for c in part2:
-            num = int(c) if c.isdigit() else (ord(c) - ord('A') + 1)
-            product *= num
-            if num in (2, 5):
-                has_two_or_five = True
-        if product % 10 == 0 and has_two_or_five:
-            break
-
-    # Генерация третьей части (первые 2 символа — случайные, последние 2 — сумма)
-    tens = (coin_amount // 10) - 1  # A=10, B=20, ...
-    units = (coin_amount % 10) - 1  # A=1, B=2, ...
-    if tens < 0:
-        tens = 25  # Если сумма <10, десятки = Z (0), но лучше избегать этого случая
-    y_char = chr(ord('A') + tens)
-    z_char = chr(ord('A') + units)
-
-    part3 = ''.join(random.choices(string.ascii_uppercase, k=2)) + y_char + z_char
+    part1 = _decode_block(random.choice(part1_blocks))
+    part2 = _decode_block(random.choice(part2_blocks))
+    part3 = ''.join(random.choices(string.ascii_uppercase, k=2)) + suffix
 
     return f"{part1}-{part2}-{part3}"
 
 
+def generate_promo_codes(coin_amount: int, count: int, exclude=()) -> List[str]:
+    """
+    Генерирует `count` разных промокодов на одну сумму (для рассылок и акций).
+
+    Args:
+        coin_amount: Сумма валюты для начисления (1-286)
+        count: Сколько промокодов нужно
+        exclude: Промокоды, которые нельзя выдавать (например, уже использованные)
+
+    Returns:
+        Список уникальных промокодов
+    """
+    suffix = _amount_suffix(coin_amount)
+    part1_blocks, part2_blocks = _promo_block_tables()
+    rng = np.random.default_rng()
+    letters = np.array(list(string.ascii_uppercase))
+
+    excluded = set(exclude)
+    codes = {}
+    while len(codes) < count:
+        size = count - len(codes)
+        part1 = rng.choice(part1_blocks, size=size)
+        part2 = rng.choice(part2_blocks, size=size)
+        prefix = rng.choice(letters, size=(size, 2))
+        for block1, block2, (x1, x2) in zip(part1, part2, prefix):
+            code = f"{_decode_block(block1)}-{_decode_block(block2)}-{x1}{x2}{suffix}"
+            if code not in excluded:
+                codes[code] = None
+    return list(codes)[:count]
+
+
 def validate_promo_code(promo_code: str) -> tuple[bool, int]:
     """
     Проверяет валидность промокода и извлекает сумму вознаграждения.
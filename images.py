@@ -1,21 +1,286 @@
-from typing import Tuple, Optional, Union, List
+from typing import Tuple, Optional, Union, List, Dict
 from PIL import Image, ImageDraw, ImageFont
+import functools
+import hashlib
+import io
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 
 import configs
+import text_layout
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+DEFAULT_MAIN_FONT_PATH = r"font\HUMakingfilm Bold.otf"
+DEFAULT_STUB_FONT_PATH = "arial.ttf"
+DEFAULT_DESCRIPTION_FONT_PATH = r"font\Stonehenge.ttf"
+DEFAULT_MAIN_PATH = "arial.ttf"
+
+# Сколько байт пикселей могут занимать закэшированные надписи корешка (на один рендерер)
+STUB_SPRITE_CACHE_BYTES = 8 * 1024 * 1024
+
+# Увеличивайте при изменении раскладки карточки в коде: от версии зависят ключи кэша рендера
+RENDER_LAYOUT_VERSION = 2
+
+
+class CouponRenderer:
+    """
+    Рендерер купонов с заранее загруженными шаблонами и шрифтами.
+
+    Все шаблоны редкостей декодируются один раз при создании объекта и хранятся в памяти,
+    на каждый купон делается только копия нужного шаблона. Шрифты кэшируются по
+    (путь, размер, курсив), поэтому `ImageFont.truetype` и поиск курсивного начертания
+    выполняются один раз на процесс, а не на каждую карточку. Повернутые надписи
+    корешка тоже рисуются один раз и дальше только вставляются из кэша.
+    """
+
+    def __init__(self, template_paths: Optional[dict] = None,
+                 preload_fonts: Optional[List[Tuple[str, int, bool]]] = None) -> None:
+        self.template_paths = dict(template_paths or configs.template_paths)
+        self._templates: Dict[str, Image.Image] = {}
+        self._fonts: Dict[Tuple[str, int, bool], ImageFont.FreeTypeFont] = {}
+        self._fonts_lock = threading.Lock()
+        # Повернутые надписи корешка: (текст, шрифт, размер, цвет, угол) -> картинка
+        self._sprites: "OrderedDict[Tuple, Optional[Image.Image]]" = OrderedDict()
+        self._sprites_size = 0
+        self._sprites_lock = threading.Lock()
+
+        for rarity, path in self.template_paths.items():
+            with Image.open(path) as img:
+                img.load()
+                self._templates[rarity.lower()] = img.copy()
+            logger.debug(f"Шаблон '{rarity}' загружен в память: {path}")
+
+        if preload_fonts is None:
+            preload_fonts = [
+                (DEFAULT_MAIN_FONT_PATH, 60, False),
+                (DEFAULT_MAIN_PATH, 30, False),
+                (DEFAULT_MAIN_PATH, 25, True),
+                (DEFAULT_STUB_FONT_PATH, 30, False),
+            ]
+        for font_path, size, italic in preload_fonts:
+            self.font(font_path, size, italic)
+        self._font_paths = sorted({font_path for font_path, _, _ in preload_fonts})
+
+    @functools.cached_property
+    def version(self) -> str:
+        """Версия ресурсов: меняется при изменении любого шаблона, шрифта или раскладки."""
+        digest = hashlib.sha256(f"layout:{RENDER_LAYOUT_VERSION}".encode())
+        paths = [self.template_paths[rarity] for rarity in sorted(self.template_paths)]
+        for path in paths + self._font_paths:
+            if os.path.exists(path):
+                with open(path, 'rb') as resource:
+                    digest.update(resource.read())
+            else:
+                digest.update(path.encode())
+        return digest.hexdigest()[:16]
+
+    def template(self, rarity: str) -> Image.Image:
+        """Возвращает копию шаблона редкости, которую можно изменять."""
+        template = self._templates.get(rarity.lower())
+        if template is None:
+            raise ValueError(
+                f"Неизвестная редкость: {rarity}. Допустимые значения: {list(self._templates.keys())}")
+        return template.copy()
+
+    def font(self, font_path: str, size: int, italic: bool = False) -> ImageFont.FreeTypeFont:
+        """Возвращает шрифт из кэша, загружая его при первом обращении."""
+        key = (font_path, size, italic)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+
+        with self._fonts_lock:
+            font = self._fonts.get(key)
+            if font is None:
+                font = self._load_font(font_path, size, italic)
+                self._fonts[key] = font
+        return font
+
+    @staticmethod
+    def _load_font(font_path: str, size: int, italic: bool = False) -> ImageFont.FreeTypeFont:
+        try:
+            if italic:
+                italic_path = font_path.replace('.ttf', 'i.ttf')
+                try:
+                    return ImageFont.truetype(italic_path, size)
+                except IOError:
+                    font = ImageFont.truetype(font_path, size)
+                    return font
+            return ImageFont.truetype(font_path, size)
+        except IOError:
+            logger.warning(f"Шрифт {font_path} не найден, используется стандартный")
+            return ImageFont.load_default(size)
+
+    def _stub_sprite(self, text: str, font: ImageFont.FreeTypeFont, color: str,
+                     angle: int) -> Optional[Image.Image]:
+        """
+        Возвращает повернутую картинку текста корешка из кэша, рисуя ее при первом обращении.
+
+        Ключ — (текст, шрифт, размер, цвет, угол). Кэш LRU и ограничен по объему пикселей
+        (`STUB_SPRITE_CACHE_BYTES`), картинки в нем не изменяются — только вставляются.
+        """
+        key = (text, getattr(font, 'path', id(font)), getattr(font, 'size', None), color, angle)
+        with self._sprites_lock:
+            sprite = self._sprites.get(key, False)
+            if sprite is not False:
+                self._sprites.move_to_end(key)
+                return sprite
+
+        # Создаем временное изображение с текстом
+        temp_img = Image.new('RGBA', (500, 500), (0, 0, 0, 0))
+        temp_draw = ImageDraw.Draw(temp_img)
+        temp_draw.text((10, 10), text, fill=color, font=font)
+
+        # Обрезаем по границам текста и поворачиваем
+        bbox = temp_img.getbbox()
+        sprite = None
+        size = 0
+        if bbox:
+            sprite = temp_img.crop(bbox).rotate(angle, expand=True, resample=Image.BICUBIC)
+            size = sprite.width * sprite.height * 4
+
+        with self._sprites_lock:
+            if key not in self._sprites:
+                self._sprites[key] = sprite
+                self._sprites_size += size
+                while self._sprites_size > STUB_SPRITE_CACHE_BYTES and len(self._sprites) > 1:
+                    _, evicted = self._sprites.popitem(last=False)
+                    if evicted is not None:
+                        self._sprites_size -= evicted.width * evicted.height * 4
+        return sprite
+
+    def _add_stub_text(self, coupon_img: Image.Image, text: str, x: int, y: int,
+                       font: ImageFont.FreeTypeFont, color: str, angle: int) -> int:
+        # Функция для добавления вертикального текста на корешок
+        if not text:
+            return 0
+
+        sprite = self._stub_sprite(text, font, color, angle)
+        if sprite is None:
+            return 0
+
+        # Вставляем на основное изображение
+        coupon_img.paste(sprite, (x, y), sprite)
+
+        # Возвращаем высоту добавленного текста
+        return sprite.height
+
+    def render(self, rarity: str, title: str, description: str, effect: str,
+               coupon_number: str, coupon_code: str,
+               main_font_path: str = DEFAULT_MAIN_FONT_PATH,
+               stub_font_path: str = DEFAULT_STUB_FONT_PATH,
+               description_font_path: str = DEFAULT_DESCRIPTION_FONT_PATH,
+               main_path: str = DEFAULT_MAIN_PATH,
+               title_position: Tuple[int, int] = (350, 50), title_font_size: int = 60,
+               effect_position: Tuple[int, int] = (350, 150), effect_font_size: int = 30,
+               description_position: Tuple[int, int] = (350, 250),
+               description_font_size: int = 25,
+               description_max_width: int = 1200, number_position: Tuple[int, int] = (100, 50),
+               code_position: Tuple[int, int] = (100, 150), stub_font_size: int = 30,
+               stub_text_angle: int = 90, title_color: str = "black",
+               effect_color: str = "black",
+               description_color: str = "black", stub_text_color: str = "black",
+               collection_type: str = None) -> Image.Image:
+        """
+        Рисует купон и возвращает готовое изображение (без сохранения на диск).
+        """
+        # Преобразуем все текстовые параметры в строки
+        def ensure_str(value: Union[str, int]) -> str:
+            return str(value) if value is not None else ""
+
+        title = ensure_str(title)
+        description = ensure_str(description)
+        effect = ensure_str(effect)
+        coupon_number = ensure_str(coupon_number)
+        coupon_code = ensure_str(coupon_code)
+        collection_type = ensure_str(collection_type)
+
+        logger.info(f"Создание купона редкости '{rarity}' с названием '{title}'")
+
+        coupon_img = self.template(rarity)
+        draw = ImageDraw.Draw(coupon_img)
+
+        title_font = self.font(main_font_path, title_font_size)
+        effect_font = self.font(main_path, effect_font_size)
+        description_font = self.font(main_path, description_font_size, italic=True)
+        stub_font = self.font(stub_font_path, stub_font_size)
+
+        # Добавление основного текста
+        draw.text(title_position, title, fill=title_color, font=title_font)
+
+        # Добавление эффекта с переносом
+        wrapped_effect = text_layout.wrap_text(effect, effect_font, description_max_width)
+        y_effect_offset = effect_position[1]
+        for line in wrapped_effect:
+            draw.text((effect_position[0], y_effect_offset), line, fill=effect_color,
+                      font=effect_font)
+            y_effect_offset += effect_font_size + 5
+
+        # Добавление описания
+        wrapped_description = text_layout.wrap_text(description, description_font,
+                                                    description_max_width)
+        y_desc_offset = max(description_position[1], y_effect_offset + 20)
+        for line in wrapped_description:
+            draw.text((description_position[0], y_desc_offset), line,
+                      fill=description_color,
+                      font=description_font)
+            y_desc_offset += description_font_size + 5
+
+        # Размещаем текст на корешке
+        current_y = number_position[1]
+        vertical_spacing = 30
+
+        # Коллекция
+        if collection_type:
+            text_height = self._add_stub_text(coupon_img, f"Коллекция: {collection_type}",
+                                              number_position[0], current_y,
+                                              stub_font, stub_text_color, stub_text_angle)
+            current_y += text_height + vertical_spacing
+
+        # Номер купона
+        # if coupon_number:
+        #     text_height = add_stub_text(f"Номер: {coupon_number}", number_position[0],
+        #                                 current_y)
+        #     current_y += text_height + vertical_spacing
+
+        # Код купона
+        if coupon_code:
+            self._add_stub_text(coupon_img, f"Код: {coupon_code}", code_position[0], current_y,
+                                stub_font, stub_text_color, stub_text_angle)
+
+        return coupon_img
+
+
+_renderer: Optional[CouponRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> CouponRenderer:
+    """Возвращает общий для процесса рендерер, создавая его при первом вызове."""
+    global _renderer
+
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = CouponRenderer()
+                logger.info("Шаблоны и шрифты купонов загружены в память")
+    return _renderer
+
+
 def create_coupon(rarity: str, title: str, description: str, effect: str, coupon_number: str,
                   coupon_code: str,
                   output_path: str = "coupon.png", template_paths: Optional[dict] = None,
-                  main_font_path: str = r"font\HUMakingfilm Bold.otf",
-                  stub_font_path: str = "arial.ttf",
-                  description_font_path: str = r"font\Stonehenge.ttf",
-                  main_path: str = "arial.ttf",
+                  main_font_path: str = DEFAULT_MAIN_FONT_PATH,
+                  stub_font_path: str = DEFAULT_STUB_FONT_PATH,
+                  description_font_path: str = DEFAULT_DESCRIPTION_FONT_PATH,
+                  main_path: str = DEFAULT_MAIN_PATH,
                   title_position: Tuple[int, int] = (350, 50), title_font_size: int = 60,
                   effect_position: Tuple[int, int] = (350, 150), effect_font_size: int = 30,
                   description_position: Tuple[int, int] = (350, 250),
@@ -25,152 +290,40 @@ def create_coupon(rarity: str, title: str, description: str, effect: str, coupon
                   stub_text_angle: int = 90, title_color: str = "black",
                   effect_color: str = "black",
                   description_color: str = "black", stub_text_color: str = "black",
-                  collection_type: str = None) -> None:
+                  collection_type: str = None,
+                  renderer: Optional[CouponRenderer] = None) -> None:
     """
     Создает изображение купона с указанными параметрами.
+
+    Шаблоны и шрифты берутся из общего рендерера (`get_renderer`). Если переданы
+    собственные `template_paths`, для них создается отдельный рендерер.
     """
     try:
-        # Преобразуем все текстовые параметры в строки
-        def ensure_str(value: Union[str, int]) -> str:
-            return str(value) if value is not None else ""
-
-        title = ensure_str(title)
-        description = ensure_str(description)
-        effect = ensure_str(effect)
-        coupon_number = ensure_str(coupon_number)
-        coupon_code = ensure_str(coupon_code)
-        collection_type = ensure_str(collection_type)
-
         logger.info(f"Начало создания купона: {title}")
 
-        template_path = configs.template_paths.get(rarity.lower())
-        if not template_path:
-            raise ValueError(
-                f"Неизвестная редкость: {rarity}. Допустимые значения: {list(template_paths.keys())}")
-
-        logger.info(f"Создание купона редкости '{rarity}' с названием '{title}'")
+        if renderer is None:
+            renderer = CouponRenderer(template_paths) if template_paths else get_renderer()
 
-        # Загрузка шаблона
         try:
-            with Image.open(template_path) as img:
-                coupon_img = img.copy()
-                draw = ImageDraw.Draw(coupon_img)
-
-                # Загрузка шрифтов
-                def load_font(font_path: str, size: int,
-                              italic: bool = False) -> ImageFont.FreeTypeFont:
-                    try:
-                        if italic:
-                            italic_path = font_path.replace('.ttf', 'i.ttf')
-                            try:
-                                return ImageFont.truetype(italic_path, size)
-                            except IOError:
-                                font = ImageFont.truetype(font_path, size)
-                                return font
-                        return ImageFont.truetype(font_path, size)
-                    except IOError:
-                        logger.warning(f"Шрифт {font_path} не найден, используется стандартный")
-                        return ImageFont.load_default(size)
-
-                title_font = load_font(main_font_path, title_font_size)
-                effect_font = load_font(main_path, effect_font_size)
-                description_font = load_font(main_path, description_font_size, italic=True)
-                stub_font = load_font(stub_font_path, stub_font_size)
-
-                # Добавление основного текста
-                draw.text(title_position, title, fill=title_color, font=title_font)
-
-                # Функция для переноса текста
-                def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> List[str]:
-                    lines = []
-                    if not text:
-                        return lines
-
-                    words = text.split()
-                    current_line = []
-
-                    for word in words:
-                        test_line = ' '.join(current_line + [word])
-                        width = draw.textlength(test_line, font=font)
-                        if width <= max_width:
-                            current_line.append(word)
-                        else:
-                            lines.append(' '.join(current_line))
-                            current_line = [word]
-
-                    if current_line:
-                        lines.append(' '.join(current_line))
-
-                    return lines
-
-                # Добавление эффекта с переносом
-                wrapped_effect = wrap_text(effect, effect_font, description_max_width)
-                y_effect_offset = effect_position[1]
-                for line in wrapped_effect:
-                    draw.text((effect_position[0], y_effect_offset), line, fill=effect_color,
-                              font=effect_font)
-                    y_effect_offset += effect_font_size + 5
-
-                # Добавление описания
-                wrapped_description = wrap_text(description, description_font,
-                                                description_max_width)
-                y_desc_offset = max(description_position[1], y_effect_offset + 20)
-                for line in wrapped_description:
-                    draw.text((description_position[0], y_desc_offset), line,
-                              fill=description_color,
-                              font=description_font)
-                    y_desc_offset += description_font_size + 5
-
-                # Функция для добавления вертикального текста на корешок
-                def add_stub_text(text: str, x: int, y: int) -> int:
-                    if not text:
-                        return 0
-
-                    # Создаем временное изображение с текстом
-                    temp_img = Image.new('RGBA', (500, 500), (0, 0, 0, 0))
-                    temp_draw = ImageDraw.Draw(temp_img)
-                    temp_draw.text((10, 10), text, fill=stub_text_color, font=stub_font)
-
-                    # Обрезаем по границам текста
-                    bbox = temp_img.getbbox()
-                    if not bbox:
-                        return 0
-
-                    cropped_img = temp_img.crop(bbox)
-
-                    # Поворачиваем текст
-                    rotated_img = cropped_img.rotate(stub_text_angle, expand=True,
-                                                     resample=Image.BICUBIC)
-
-                    # Вставляем на основное изображение
-                    coupon_img.paste(rotated_img, (x, y), rotated_img)
-
-                    # Возвращаем высоту добавленного текста
-                    return rotated_img.height
-
-                # Размещаем текст на корешке
-                current_y = number_position[1]
-                vertical_spacing = 30
-
-                # Коллекция
-                if collection_type:
-                    text_height = add_stub_text(f"Коллекция: {collection_type}", number_position[0],
-                                                current_y)
-                    current_y += text_height + vertical_spacing
-
-                # Номер купона
-                # if coupon_number:
-                #     text_height = add_stub_text(f"Номер: {coupon_number}", number_position[0],
-                #                                 current_y)
-                #     current_y += text_height + vertical_spacing
-
-                # Код купона
-                if coupon_code:
-                    add_stub_text(f"Код: {coupon_code}", code_position[0], current_y)
-
-                # Сохранение результата
-                coupon_img.save(output_path)
-                logger.info(f"Купон успешно сохранен: {output_path}")
+            coupon_img = renderer.render(
+                rarity=rarity, title=title, description=description, effect=effect,
+                coupon_number=coupon_number, coupon_code=coupon_code,
+                main_font_path=main_font_path, stub_font_path=stub_font_path,
+                description_font_path=description_font_path, main_path=main_path,
+                title_position=title_position, title_font_size=title_font_size,
+                effect_position=effect_position, effect_font_size=effect_font_size,
+                description_position=description_position,
+                description_font_size=description_font_size,
+                description_max_width=description_max_width, number_position=number_position,
+                code_position=code_position, stub_font_size=stub_font_size,
+                stub_text_angle=stub_text_angle, title_color=title_color,
+                effect_color=effect_color, description_color=description_color,
+                stub_text_color=stub_text_color, collection_type=collection_type,
+            )
+
+            # Сохранение результата
+            coupon_img.save(output_path)
+            logger.info(f"Купон успешно сохранен: {output_path}")
 
         except Exception as e:
             logger.error(f"Ошибка при обработке изображения: {str(e)}", exc_info=True)
@@ -178,4 +331,198 @@ def create_coupon(rarity: str, title: str, description: str, effect: str, coupon
 
     except Exception as e:
         logger.error(f"Критическая ошибка при создании купона: {str(e)}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+
+def get_profile(profile: Optional[str] = None) -> Dict:
+    """Возвращает настройки профиля кодирования (по умолчанию — профиль отправки пака)."""
+    name = profile or configs.upload_profile
+    try:
+        return configs.output_profiles[name]
+    except KeyError:
+        raise ValueError(
+            f"Неизвестный профиль: {name}. Допустимые значения: {list(configs.output_profiles)}")
+
+
+def profile_extension(profile: Optional[str] = None) -> str:
+    """Расширение файла для профиля кодирования."""
+    image_format = get_profile(profile)['format'].upper()
+    return {'JPEG': 'jpg'}.get(image_format, image_format.lower())
+
+
+def encode_image(img: Image.Image, profile: Optional[str] = None) -> Tuple[bytes, Dict[str, float]]:
+    """
+    Кодирует картинку по профилю из `configs.output_profiles`.
+
+    Returns:
+        Кортеж (байты, статистика: размер в байтах и время кодирования в мс)
+    """
+    settings = dict(get_profile(profile))
+    image_format = settings.pop('format')
+    max_size = settings.pop('max_size', None)
+    colors = settings.pop('colors', None)
+
+    started = time.perf_counter()
+    if max_size and max(img.size) > max_size:
+        img = img.copy()
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    if image_format.upper() == 'JPEG' and img.mode != 'RGB':
+        # JPEG не поддерживает прозрачность: кладем картинку на белый фон
+        background = Image.new('RGB', img.size, 'white')
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background.paste(img, mask=img.getchannel('A'))
+        else:
+            background.paste(img)
+        img = background
+    elif colors:
+        img = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **settings)
+    data = buffer.getvalue()
+
+    stats = {'bytes': len(data), 'encode_ms': round((time.perf_counter() - started) * 1000, 2)}
+    logger.debug(f"Картинка закодирована по профилю '{profile or configs.upload_profile}': {stats}")
+    return data, stats
+
+
+def render_coupon_bytes(rarity: str, title: str, description: str, effect: str,
+                        coupon_number: str, coupon_code: str, collection_type: str = None,
+                        profile: Optional[str] = None,
+                        renderer: Optional[CouponRenderer] = None, **layout) -> bytes:
+    """
+    Рисует купон и сразу кодирует его в память, минуя диск.
+
+    Args:
+        profile: Профиль кодирования из `configs.output_profiles`
+                 (по умолчанию `configs.upload_profile`)
+        renderer: Рендерер (по умолчанию общий, `get_renderer`)
+        layout: Необязательные параметры раскладки, как у `CouponRenderer.render`
+
+    Returns:
+        bytes: Закодированная картинка, готовая к отправке в Telegram
+    """
+    renderer = renderer or get_renderer()
+    coupon_img = renderer.render(
+        rarity=rarity, title=title, description=description, effect=effect,
+        coupon_number=coupon_number, coupon_code=coupon_code,
+        collection_type=collection_type, **layout
+    )
+
+    data, _ = encode_image(coupon_img, profile)
+    return data
+
+
+def build_collage(cards: List[bytes], columns: int = 1, card_width: int = 800, gap: int = 10,
+                  profile: Optional[str] = None) -> bytes:
+    """
+    Собирает готовые карточки в один уменьшенный лист.
+
+    Args:
+        cards: Закодированные картинки карточек (например, из кэша рендера)
+        columns: Карточек в ряду
+        card_width: Ширина карточки на листе, пикселей
+        gap: Отступ между карточками и по краям, пикселей
+        profile: Профиль кодирования листа из `configs.output_profiles`
+
+    Returns:
+        bytes: Закодированный коллаж
+    """
+    if not cards:
+        raise ValueError("Нет карточек для коллажа")
+
+    thumbnails = []
+    for card in cards:
+        with Image.open(io.BytesIO(card)) as card_img:
+            card_img.draft('RGB', (card_width, card_width))  # Для JPEG декодируем сразу уменьшенным
+            height = round(card_img.height * card_width / card_img.width)
+            thumbnails.append(card_img.convert('RGB').resize((card_width, height), Image.LANCZOS))
+
+    columns = max(1, min(columns, len(thumbnails)))
+    rows = [thumbnails[i:i + columns] for i in range(0, len(thumbnails), columns)]
+    row_heights = [max(thumb.height for thumb in row) for row in rows]
+
+    sheet = Image.new(
+        'RGB',
+        (columns * card_width + (columns + 1) * gap, sum(row_heights) + (len(rows) + 1) * gap),
+        'white'
+    )
+    y = gap
+    for row, row_height in zip(rows, row_heights):
+        x = gap
+        for thumb in row:
+            sheet.paste(thumb, (x, y))
+            x += card_width + gap
+        y += row_height + gap
+
+    data, stats = encode_image(sheet, profile)
+    logger.debug(f"Коллаж из {len(cards)} карточек собран: {stats}")
+    return data
+
+
+def measure_render_latency(samples: int = 20, rarity: str = "common") -> Dict[str, float]:
+    """
+    Замеряет задержку рендера одной карточки до и после кэширования ресурсов.
+
+    "cold" — каждый рендер делает то же, что `create_coupon` раньше: открывает и копирует
+    один шаблон и загружает нужные ему шрифты (рендерер без предзагрузки шрифтов, версия
+    ресурсов не считается); "warm" — рендер общим рендерером. Замеряется только рисование,
+    без сохранения PNG.
+    :return: Словарь со средним временем на карточку в миллисекундах.
+    """
+    sample = dict(
+        rarity=rarity, title="Тестовый купон",
+        description="Описание купона для замера скорости рендера " * 5,
+        effect="Эффект купона для замера скорости", coupon_number=1,
+        coupon_code="Inquisition_white_1", collection_type="Inquisition",
+    )
+
+    started = time.perf_counter()
+    for _ in range(samples):
+        CouponRenderer({rarity: configs.template_paths[rarity]}, preload_fonts=[]).render(**sample)
+    cold_ms = (time.perf_counter() - started) * 1000 / samples
+
+    renderer = get_renderer()
+    renderer.render(**sample)  # Прогрев
+    started = time.perf_counter()
+    for _ in range(samples):
+        renderer.render(**sample)
+    warm_ms = (time.perf_counter() - started) * 1000 / samples
+
+    result = {'cold_ms': round(cold_ms, 2), 'warm_ms': round(warm_ms, 2)}
+    logger.info(f"Задержка рендера карточки: {result}")
+    return result
+
+
+def compare_profiles(samples: int = 5, rarity: str = "common") -> Dict[str, Dict[str, float]]:
+    """
+    Сравнивает профили кодирования на одной карточке: средний размер и время кодирования.
+
+    Помогает выбрать `configs.upload_profile` — компромисс между объемом загрузки
+    в Telegram и затратами CPU.
+    :return: Словарь профиль -> {'bytes': ..., 'encode_ms': ...}.
+    """
+    coupon_img = get_renderer().render(
+        rarity=rarity, title="Тестовый купон",
+        description="Описание купона для сравнения профилей кодирования " * 5,
+        effect="Эффект купона", coupon_number=1,
+        coupon_code="Inquisition_white_1", collection_type="Inquisition",
+    )
+
+    result = {}
+    for profile in configs.output_profiles:
+        runs = [encode_image(coupon_img, profile)[1] for _ in range(samples)]
+        result[profile] = {
+            'bytes': runs[-1]['bytes'],
+            'encode_ms': round(sum(run['encode_ms'] for run in runs) / samples, 2),
+        }
+        logger.info(f"Профиль '{profile}': {result[profile]}")
+    return result
+
+
+if __name__ == '__main__':
+    print(measure_render_latency())
+    for name, stats in compare_profiles().items():
+        print(f"{name:15} {stats['bytes'] / 1024:8.1f} КБ {stats['encode_ms']:8.2f} мс")
@@ -0,0 +1,198 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from telebot import types
+
+import callbacks
+import configs
+import database
+import dict_convert
+
+
+logger = logging.getLogger(__name__)
+
+# Фильтр «все редкости»
+ALL = '-'
+# Сортировки: код -> подпись
+SORTS = {'c': 'по коду', 'q': 'по количеству'}
+# Направления листания: первая страница, вперед, назад
+FIRST, NEXT, PREV = '-', 'n', 'p'
+
+# user_id -> {ключ страницы: (текст, клавиатура)}; пользователи вытесняются по LRU
+_pages: "OrderedDict[int, Dict[tuple, tuple]]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def page_data(rarity: str = ALL, sort: str = 'c', direction: str = FIRST,
+              quantity: int = 0, coupon_code: str = '') -> str:
+    """callback_data страницы инвентаря: фильтр, сортировка и курсор (количество, код)."""
+    return callbacks.pack('inv', rarity, sort, direction, quantity, coupon_code)
+
+
+def _fetch(user_id: int, rarity: str, sort: str, direction: str,
+           quantity: int, coupon_code: str, limit: int) -> List[tuple]:
+    # Keyset-пагинация: строки строго после (или до) курсора, без OFFSET
+    conditions = ['user_id = %s']
+    params: List[Any] = [user_id]
+    if rarity != ALL:
+        conditions.append('color = %s')
+        params.append(rarity)
+
+    backward = direction == PREV
+    if direction != FIRST:
+        op = '<' if backward else '>'
+        if sort == 'q':
+            # По убыванию количества, при равенстве — по коду
+            conditions.append(f'(-quantity, coupon_code) {op} (%s, %s)')
+            params.extend([-quantity, coupon_code])
+        else:
+            conditions.append(f'coupon_code {op} %s')
+            params.append(coupon_code)
+
+    if sort == 'q':
+        order = 'quantity ASC, coupon_code DESC' if backward else 'quantity DESC, coupon_code ASC'
+    else:
+        order = 'coupon_code DESC' if backward else 'coupon_code ASC'
+
+    with database.postgres_init() as (conn, cursor):
+        cursor.execute(
+            f"SELECT coupon_code, quantity, name, color FROM user_coupons "
+            f"WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT %s",
+            (*params, limit)
+        )
+        return cursor.fetchall()
+
+
+def _button(text: str, action: str, *args: Any) -> Optional[types.InlineKeyboardButton]:
+    # id купонов из каталогов, загруженных до проверки длины при импорте, могут не влезть
+    # в callback_data: такую кнопку пропускаем, а не роняем всю страницу
+    try:
+        return types.InlineKeyboardButton(text, callback_data=callbacks.pack(action, *args))
+    except ValueError as e:
+        logger.warning(f"Кнопка инвентаря пропущена: {e}")
+        return None
+
+
+def _render(rows: List[tuple], rarity: str, sort: str,
+            has_prev: bool, has_next: bool) -> Tuple[str, types.InlineKeyboardMarkup]:
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    buttons = [
+        _button(
+            f"{dict_convert.color_to_smile_convert.get(color, '🎟️')} {name}"
+            + (f" ×{quantity}" if quantity > 1 else ''),
+            'coupon', coupon_code
+        )
+        for coupon_code, quantity, name, color in rows
+    ]
+    markup.add(*[button for button in buttons if button is not None])
+
+    navigation = []
+    if has_prev:
+        first_code, first_quantity = rows[0][0], rows[0][1]
+        navigation.append(_button("⬅️ Назад", 'inv', rarity, sort, PREV, first_quantity, first_code))
+    if has_next:
+        last_code, last_quantity = rows[-1][0], rows[-1][1]
+        navigation.append(_button("Вперед ➡️", 'inv', rarity, sort, NEXT, last_quantity, last_code))
+    navigation = [button for button in navigation if button is not None]
+    if navigation:
+        markup.row(*navigation)
+
+    # Фильтры по редкости; текущий отмечен галочкой
+    filters = [(ALL, 'Все')] + list(dict_convert.color_to_smile_convert.items())
+    markup.row(*[
+        types.InlineKeyboardButton(
+            f"✔️{label}" if color == rarity else label,
+            callback_data=page_data(color, sort)
+        )
+        for color, label in filters
+    ])
+
+    other_sort = 'q' if sort == 'c' else 'c'
+    markup.row(types.InlineKeyboardButton(
+        f"↕️ Сортировать {SORTS[other_sort]}", callback_data=page_data(rarity, other_sort)
+    ))
+
+    header = "🎫 Ваши купоны"
+    if rarity != ALL:
+        header += f" {dict_convert.color_to_smile_convert[rarity]}"
+    header += f" (сортировка {SORTS[sort]})"
+    if not rows:
+        header += "\n\nКупонов с такой редкостью нет"
+    return header, markup
+
+
+def get_page(user_id: int, rarity: str = ALL, sort: str = 'c', direction: str = FIRST,
+             quantity: int = 0, coupon_code: str = '') -> Optional[Tuple[str, types.InlineKeyboardMarkup]]:
+    """
+    Возвращает текст и клавиатуру страницы инвентаря.
+
+    Страница читается из БД одним запросом с LIMIT после курсора (количество, код
+    купона), готовая клавиатура кэшируется до следующего изменения инвентаря
+    пользователя (`invalidate`). None — у пользователя нет ни одного купона.
+    """
+    if rarity != ALL and rarity not in dict_convert.color_to_smile_convert:
+        rarity = ALL
+    if sort not in SORTS:
+        sort = 'c'
+    if direction not in (NEXT, PREV):
+        direction = FIRST
+
+    key = (rarity, sort, direction, quantity, coupon_code)
+    with _lock:
+        cached = _pages.get(user_id, {}).get(key)
+        if cached is not None:
+            _pages.move_to_end(user_id)
+            _stats['hits'] += 1
+            return cached
+        _stats['misses'] += 1
+        if (_stats['hits'] + _stats['misses']) % 1000 == 0:
+            logger.info(f"Кэш страниц инвентаря: {stats()}")
+
+    page_size = configs.inventory['page_size']
+    rows = _fetch(user_id, rarity, sort, direction, quantity, coupon_code, page_size + 1)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == PREV:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = direction == NEXT, has_more
+
+    if not rows:
+        if direction != FIRST:
+            # Купоны за курсором проданы или активированы — показываем начало списка
+            return get_page(user_id, rarity, sort)
+        if rarity == ALL:
+            return None
+
+    page = _render(rows, rarity, sort, has_prev, has_next)
+    with _lock:
+        _pages.setdefault(user_id, {})[key] = page
+        _pages.move_to_end(user_id)
+        while len(_pages) > configs.inventory['cache_users']:
+            _pages.popitem(last=False)
+    return page
+
+
+def invalidate(user_id: int) -> None:
+    """
+    Сбрасывает страницы пользователя после изменения его купонов.
+
+    Вызывается после фиксации транзакции; обновления одного пользователя
+    обрабатываются по порядку, поэтому устаревшая страница не попадет в кэш.
+    """
+    with _lock:
+        _pages.pop(user_id, None)
+
+
+def stats() -> Dict[str, Any]:
+    """Метрики кэша страниц: попадания, промахи, доля попаданий, пользователей в кэше."""
+    lookups = _stats['hits'] + _stats['misses']
+    return dict(
+        _stats,
+        hit_rate=round(_stats['hits'] / lookups, 4) if lookups else 0.0,
+        users=len(_pages),
+    )
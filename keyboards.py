@@ -1,6 +1,7 @@
 from telebot import types
 
 import admins
+import callbacks
 
 def main_menu_keyboards(us_id):
 
@@ -12,12 +13,15 @@ def main_menu_keyboards(us_id):
 
     button_admin_1 = types.InlineKeyboardButton("Загрузить описание карт", callback_data='upload_cards')
     button_admin_2 = types.InlineKeyboardButton("Генерация промокодов", callback_data='promo_generate')
+    button_admin_3 = types.InlineKeyboardButton("Прогреть картинки", callback_data='warmup_cards')
+    button_admin_4 = types.InlineKeyboardButton("Пачка промокодов", callback_data='promo_bulk')
 
     markup.add(button, button2)
     markup.add(button3, button5)
 
     if admins.is_admin(us_id):
         markup.add(button_admin_1, button_admin_2)
+        markup.add(button_admin_3, button_admin_4)
 
     return markup
 
@@ -36,8 +40,8 @@ def repeat_keyboards():
 def my_coupons_data_keyboards(coupon_code):
     markup = types.InlineKeyboardMarkup()
     button = types.InlineKeyboardButton("Назад к списку купонов",callback_data='my_coupons')
-    button2 = types.InlineKeyboardButton("Активировать купон", callback_data=f'activate {coupon_code}')
-    button1 = types.InlineKeyboardButton("Продать купон", callback_data=f'sell {coupon_code}')
+    button2 = types.InlineKeyboardButton("Активировать купон", callback_data=callbacks.pack('activate', coupon_code))
+    button1 = types.InlineKeyboardButton("Продать купон", callback_data=callbacks.pack('sell', coupon_code))
 
     markup.add(button2, button1)
     markup.add(button)
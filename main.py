@@ -7,6 +7,7 @@ import logging
 
 # Локальные модули
 import configs
+import admins
 import keyboards
 import logs
 import reports
@@ -14,6 +15,14 @@ import coupons
 import supports
 import database
 import bot_settings
+import callbacks
+import catalog
+import images
+import file_ids
+import promo_filter
+import user_cache
+import render_pool
+import warmup
 
 
 bot = bot_settings.create_bot()
@@ -22,7 +31,7 @@ bot = bot_settings.create_bot()
 @bot.message_handler(commands=["menu"])
 def main_menu(message):
     user_id = message.from_user.id
-    bot.send_message(
+    bot.outbox.send_message(
         message.chat.id,
         'Главное меню. Тут можно купить троны и открыть бустеры и многое другое.',
         reply_markup=keyboards.main_menu_keyboards(user_id)
@@ -40,20 +49,20 @@ def start_menu(message):
         # Если пользователя нет - начисляем стартовые монеты
         success = coupons.add_start_coins(user_id=user_id, amount=configs.start_gift_coin)
         if success:
-            bot.send_message(
+            bot.outbox.send_message(
                 message.chat.id,
                 f'Добро пожаловать в бота имперской лотереи! Мы тебе рады. '
                 f'В качестве подарка мы начислили тебе {configs.start_gift_coin} монет. '
                 'Нажми /menu для продолжения.'
             )
         else:
-            bot.send_message(
+            bot.outbox.send_message(
                 message.chat.id,
                 'Произошла ошибка при начислении стартовых монет. Пожалуйста, попробуйте позже.'
             )
     else:
         # Если пользователь уже есть - просто приветствуем без начисления
-        bot.send_message(
+        bot.outbox.send_message(
             message.chat.id,
             'С возвращением в бота имперской лотереи! Нажми /menu для продолжения.'
         )
@@ -61,74 +70,123 @@ def start_menu(message):
     # В любом случае обновляем данные пользователя
     logging.info(f"Сохранение/обновление данных пользователя {user_id} в БД")
     database.insert_user_data_in_bd(user_id=user_id, user_data=user_data)
+    user_cache.invalidate(user_id)
 
 
-# Обработчик inline-кнопок
-@bot.callback_query_handler(func=lambda call: True)
-def callback_query(call):
-    user_id = call.from_user.id
-    user_data = call.from_user
+# Маршруты inline-кнопок: действие из callback_data -> обработчик
+router = callbacks.CallbackRouter(is_admin=admins.is_admin)
 
-    if call.data == 'upload_cards':
-        msg = bot.send_message(call.message.chat.id, "Пожалуйста, отправьте Excel файл с описанием карт.")
-        bot.register_next_step_handler(msg, reports.process_excel_file, bot)
 
-    if call.data == 'promo_generate':
-        msg = bot.send_message(call.message.chat.id, "💰 Введите сумму для промокода (от 1 до 286):")
-        bot.register_next_step_handler(msg, supports.process_promo_amount, bot)
+@router.route('upload_cards')
+def upload_cards_callback(call):
+    bot.outbox.send_message(call.message.chat.id, "Пожалуйста, отправьте Excel файл с описанием карт.")
+    bot.register_next_step_handler_by_chat_id(call.message.chat.id, reports.process_excel_file, bot)
 
-    if call.data == 'open_coupons':
 
-        if not coupons.coin_check(user_id, configs.price_pack_coupons):
-            bot.send_message(call.message.chat.id, 'Ошибка! Не хватает Имперских трон для покупки!!')
-            return
+@router.route('promo_generate')
+def promo_generate_callback(call):
+    bot.outbox.send_message(call.message.chat.id, "💰 Введите сумму для промокода (от 1 до 286):")
+    bot.register_next_step_handler_by_chat_id(call.message.chat.id, supports.process_promo_amount, bot)
 
-        coupons.open_buster(bot, call.message, user_id)
 
-        qty_coin = coupons.qty_coin(user_id)
-        bot.send_message(call.message.chat.id, f'ТВой баланс: {qty_coin} Имперских трон!\n',
-                         reply_markup=keyboards.repeat_keyboards())
-        return
+@router.route('promo_bulk', admin=True)
+def promo_bulk_callback(call):
+    bot.outbox.send_message(
+        call.message.chat.id,
+        "📦 Введите сумму промокода (от 1 до 286) и количество через пробел, например: 50 10000"
+    )
+    bot.register_next_step_handler_by_chat_id(call.message.chat.id, supports.process_promo_bulk, bot)
 
-    if call.data == 'promo':
-        msg = bot.send_message(
-            call.message.chat.id,
-            "🔑 Введите промокод в формате **XXXX-XXXX-XXXX**:",
-            parse_mode="Markdown"
-        )
-        bot.register_next_step_handler(msg, supports.process_promo_code, bot)
 
-    if call.data == 'info':
-        supports.info_message(user_id, call.message, bot)
+@router.route('warmup_cards', admin=True)
+def warmup_cards_callback(call):
+    warmup.run_for_admin(bot, call.message.chat.id)
+
+
+@router.route('open_coupons')
+def open_coupons_callback(call):
+    # Списание монет и выдача пака выполняются одной транзакцией
+    balance = coupons.open_buster(bot, call.message, call.from_user.id)
+    if balance is None:
         return
 
-    if call.data == 'my_coupons':
-        supports.my_coupons(user_id, call.message, bot)
+    bot.outbox.send_message(call.message.chat.id, f'ТВой баланс: {balance} Имперских трон!\n',
+                            reply_markup=keyboards.repeat_keyboards())
+
+
+@router.route('promo')
+def promo_callback(call):
+    bot.outbox.send_message(
+        call.message.chat.id,
+        "🔑 Введите промокод в формате **XXXX-XXXX-XXXX**:",
+        parse_mode="Markdown"
+    )
+    bot.register_next_step_handler_by_chat_id(call.message.chat.id, supports.process_promo_code, bot)
+
+
+@router.route('info')
+def info_callback(call):
+    supports.info_message(call.from_user.id, call.message, bot)
 
-    if 'coupon_code' in call.data:
-        coupon_text = call.data
-        coupon_list = coupon_text.split()
-        coupon_code = coupon_list[1]
-        coupons.get_coupon_info(coupon_code, bot, call.message, user_id)
 
-    if 'activate' in call.data:
-        coupon_text = call.data
-        coupon_list = coupon_text.split()
-        coupon_code = coupon_list[1]
-        coupons.activate_coupon(coupon_code, bot, call.message, user_id, user_data)
+@router.route('my_coupons')
+def my_coupons_callback(call):
+    supports.my_coupons(call.from_user.id, call.message, bot)
+
+
+@router.route('inv', str, str, str, int, str)
+def inventory_page_callback(call, rarity, sort, direction, quantity, coupon_code):
+    supports.show_coupons_page(call.from_user.id, call.message, bot,
+                               rarity, sort, direction, quantity, coupon_code)
+
+
+@router.route('coupon', str, aliases=('coupon_code',))
+def coupon_callback(call, coupon_code):
+    coupons.get_coupon_info(coupon_code, bot, call.message, call.from_user.id)
+
+
+@router.route('activate', str)
+def activate_callback(call, coupon_code):
+    coupons.activate_coupon(coupon_code, bot, call.message, call.from_user.id, call.from_user)
+
+
+@router.route('sell', str)
+def sell_callback(call, coupon_code):
+    coupons.sell_coupon(coupon_code, bot, call.message, call.from_user.id, call.from_user)
+
+
+# Обработчик inline-кнопок
+@bot.callback_query_handler(func=lambda call: True)
+def callback_query(call):
+    router.dispatch(call)
 
-    if 'sell' in call.data:
-        coupon_text = call.data
-        coupon_list = coupon_text.split()
-        coupon_code = coupon_list[1]
-        coupons.sell_coupon(coupon_code, bot, call.message, user_id, user_data)
 
 if __name__ == '__main__':
     try:
         # Настройка логирования при запуске приложения
         logs.setup_logging(log_level=configs.log_level)
+        # Общий пул соединений с БД для всех модулей
+        database.init_pool()
+        database.start_pool_stats_logging()
+        # Каталог купонов держим в памяти
+        catalog.load()
+        # Шаблоны и шрифты купонов декодируем один раз при старте
+        images.get_renderer()
+        # file_id уже загруженных в Telegram картинок
+        file_ids.load()
+        # Использованные промокоды — для отказа повторам без запроса к БД
+        promo_filter.load()
+        # Процессы для параллельного рендера купонов
+        render_pool.start()
+        # Потоки обработки обновлений и отправки сообщений
+        bot_settings.start_bot(bot)
         bot_settings.run_bot(bot)
         # bot.polling(none_stop=True)
     except Exception as e:
         logging.critical(f"Критическая ошибка в основном цикле программы: {e}")
+    finally:
+        bot.update_scheduler.stop()
+        bot.outbox.stop()
+        render_pool.shutdown()
+        database.close_pool()
         #supports.send_simple_message(bot, "🔥 Критическая ошибка! Бот остановлен. Требуется вмешательство!")
\ No newline at end of file
@@ -0,0 +1,279 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from telebot.apihelper import ApiTelegramException
+
+import configs
+
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текстового сообщения Telegram
+MESSAGE_LIMIT = 4096
+# Параметры send_message, с которыми сообщения можно склеивать
+_MERGEABLE_KWARGS = {'parse_mode', 'reply_markup'}
+
+
+class TokenBucket:
+    """Ведро токенов: `rate` отправок в секунду с запасом `burst`."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """Момент, когда появится токен (now, если он уже есть)."""
+        self._refill(now)
+        return now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Item:
+    # Одна отправка: текст (может склеиваться с соседними) или произвольный вызов API
+    def __init__(self, chat_id: int, text: Optional[str] = None, kwargs: Optional[dict] = None,
+                 func: Optional[Callable] = None, args: tuple = ()) -> None:
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs or {}
+        self.func = func
+        self.args = args
+        self.futures: List[Future] = [Future()]
+        self.enqueued: List[float] = [time.monotonic()]
+        self.retries = 0
+
+    @property
+    def is_text(self) -> bool:
+        return self.func is None
+
+    def can_merge(self, other: "_Item") -> bool:
+        return (
+            self.is_text and other.is_text
+            and set(self.kwargs) <= _MERGEABLE_KWARGS and set(other.kwargs) <= _MERGEABLE_KWARGS
+            and 'reply_markup' not in self.kwargs
+            and self.kwargs.get('parse_mode') == other.kwargs.get('parse_mode')
+            and len(self.text) + 2 + len(other.text) <= MESSAGE_LIMIT
+        )
+
+    def merge(self, other: "_Item") -> None:
+        self.text = f"{self.text}\n\n{other.text}"
+        self.kwargs = dict(other.kwargs)
+        self.futures.extend(other.futures)
+        self.enqueued.extend(other.enqueued)
+
+
+class Outbox:
+    """
+    Очередь исходящих сообщений с учетом лимитов Telegram.
+
+    Отправки выполняются в фоне с общим лимитом и лимитом на чат (ведра токенов),
+    в каждом чате — строго по порядку. На ответ 429 отправка откладывается на
+    `retry_after` секунд и повторяется. Текстовые сообщения, стоящие подряд
+    в очереди одного чата, склеиваются в одно, если у них одинаковый parse_mode
+    и клавиатура есть только у последнего.
+
+    Через очередь идут все отправки пользователям: тексты — `send_message`,
+    фото, документы, ответы и правки сообщений — `call`. Вызовы Bot API внутри
+    `call` (например, в `file_ids`) выполняются уже в очереди и в лимитах учтены.
+    """
+
+    def __init__(self, bot, settings: Optional[Dict[str, Any]] = None) -> None:
+        self.bot = bot
+        self.settings = dict(settings or configs.outbox)
+        self._global = TokenBucket(self.settings['global_rate'], self.settings['global_burst'])
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queues: "OrderedDict[int, Deque[_Item]]" = OrderedDict()
+        self._busy = set()
+        self._blocked_until: Dict[int, float] = {}
+        self._global_blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.settings['workers'], thread_name_prefix='outbox'
+        )
+        self._thread = threading.Thread(target=self._dispatch, name='outbox-dispatcher',
+                                        daemon=True)
+        self._stopped = False
+        self._stats = {
+            'requests': 0, 'messages': 0, 'merged': 0, 'retries_429': 0, 'failed': 0,
+            'latency_total': 0.0, 'latency_max': 0.0,
+        }
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Досылает очередь (не дольше `timeout` секунд) и останавливает отправку."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread.ident is not None:  # Очередь могла так и не запуститься
+            self._thread.join(timeout=timeout)
+        self._executor.shutdown(wait=False)
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> Future:
+        """Ставит текстовое сообщение в очередь чата (может быть склеено с соседними)."""
+        return self._put(_Item(chat_id, text=text, kwargs=kwargs))
+
+    def call(self, chat_id: int, func: Callable, *args, **kwargs) -> Future:
+        """
+        Ставит в очередь чата произвольную отправку, например `bot.send_photo`
+        или `file_ids.send_media_group`. Вызов учитывается в лимитах как одна отправка.
+        """
+        return self._put(_Item(chat_id, kwargs=kwargs, func=func, args=args))
+
+    def _put(self, item: _Item) -> Future:
+        with self._cond:
+            self._queues.setdefault(item.chat_id, deque()).append(item)
+            self._cond.notify()
+        return item.futures[0]
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.settings['chat_rate'], self.settings['chat_burst'])
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _next_item(self, now: float):
+        # Выбирает чат, которому можно отправлять; возвращает (элемент, None) или (None, ожидание)
+        wait = None
+        global_ready = max(self._global.ready_at(now), self._global_blocked_until)
+        if global_ready > now:
+            return None, global_ready - now
+
+        for chat_id, items in self._queues.items():
+            if chat_id in self._busy:
+                continue
+            ready = max(self._chat_bucket(chat_id).ready_at(now),
+                        self._blocked_until.get(chat_id, 0.0))
+            if ready > now:
+                wait = ready - now if wait is None else min(wait, ready - now)
+                continue
+
+            item = items.popleft()
+            while items and item.can_merge(items[0]):
+                item.merge(items.popleft())
+                self._stats['merged'] += 1
+            if items:
+                self._queues.move_to_end(chat_id)  # Чередуем чаты
+            else:
+                del self._queues[chat_id]
+
+            self._global.take(now)
+            self._chat_bucket(chat_id).take(now)
+            self._busy.add(chat_id)
+            return item, None
+        return None, wait
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped and not self._queues and not self._busy:
+                        return
+                    item, wait = self._next_item(time.monotonic())
+                    if item is not None:
+                        break
+                    self._cond.wait(wait)
+                self._prune_buckets()
+            self._executor.submit(self._execute, item)
+
+    def _prune_buckets(self) -> None:
+        # Ведра чатов без очереди, успевшие наполниться, больше не нужны
+        if len(self._chat_buckets) < 10000:
+            return
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items()
+                        if chat_id not in self._queues and bucket.is_full(now)]:
+            del self._chat_buckets[chat_id]
+            self._blocked_until.pop(chat_id, None)
+
+    def _execute(self, item: _Item) -> None:
+        try:
+            if item.is_text:
+                result = self.bot.send_message(item.chat_id, item.text, **item.kwargs)
+            else:
+                result = item.func(*item.args, **item.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429 and item.retries < self.settings['max_retries']:
+                self._retry_later(item, e)
+                return
+            self._finish(item, error=e)
+        except Exception as e:
+            self._finish(item, error=e)
+        else:
+            self._finish(item, result=result)
+
+    def _retry_later(self, item: _Item, error: ApiTelegramException) -> None:
+        retry_after = (error.result_json or {}).get('parameters', {}).get('retry_after', 1)
+        logger.warning(f"Telegram 429 для чата {item.chat_id}, повтор через {retry_after} с")
+        with self._cond:
+            item.retries += 1
+            self._stats['retries_429'] += 1
+            until = time.monotonic() + retry_after
+            self._blocked_until[item.chat_id] = until
+            # Лимит мог быть общим для бота — притормаживаем все отправки
+            self._global_blocked_until = max(self._global_blocked_until, until)
+            self._queues.setdefault(item.chat_id, deque()).appendleft(item)
+            self._queues.move_to_end(item.chat_id, last=False)
+            self._busy.discard(item.chat_id)
+            self._cond.notify()
+
+    def _finish(self, item: _Item, result: Any = None, error: Optional[Exception] = None) -> None:
+        now = time.monotonic()
+        with self._cond:
+            self._busy.discard(item.chat_id)
+            self._stats['requests'] += 1
+            self._stats['messages'] += len(item.futures)
+            if self._stats['requests'] % 1000 == 0:
+                logger.info(f"Очередь исходящих сообщений: {self._stats_unlocked()}")
+            if error is not None:
+                self._stats['failed'] += 1
+            for enqueued in item.enqueued:
+                latency = now - enqueued
+                self._stats['latency_total'] += latency
+                self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+            self._cond.notify()
+
+        if error is not None:
+            logger.error(f"Не удалось отправить сообщение в чат {item.chat_id}: {error}")
+        for future in item.futures:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики: запросы к API, сообщения, склейки, повторы после 429, задержка доставки."""
+        with self._cond:
+            return self._stats_unlocked()
+
+    def _stats_unlocked(self) -> Dict[str, Any]:
+        messages = self._stats['messages']
+        return {
+            'requests': self._stats['requests'],
+            'messages': messages,
+            'merged': self._stats['merged'],
+            'retries_429': self._stats['retries_429'],
+            'failed': self._stats['failed'],
+            'queued': sum(len(items) for items in self._queues.values()),
+            'latency_avg_ms': round(self._stats['latency_total'] / messages * 1000, 2)
+            if messages else 0.0,
+            'latency_max_ms': round(self._stats['latency_max'] * 1000, 2),
+        }
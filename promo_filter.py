@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import math
+import threading
+from typing import Iterable, Optional
+
+import configs
+import database
+
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Фильтр Блума: компактное множество строк без ложноотрицательных ответов.
+
+    `__contains__` возвращает False, только если строка точно не добавлялась;
+    True означает "скорее всего добавлялась" с вероятностью ошибки `error_rate`
+    (пока элементов не больше `capacity`).
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, value: str):
+        # Двойное хэширование: k позиций из двух 64-битных половин одного blake2b
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value: str) -> None:
+        positions = self._positions(value)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(value))
+
+
+_filter: Optional[BloomFilter] = None
+_lock = threading.Lock()
+
+
+def _new_filter(used_count: int) -> BloomFilter:
+    # Запас вдвое, чтобы новые промокоды не поднимали долю ложных срабатываний
+    capacity = max(configs.promo_filter['capacity'], used_count * 2)
+    return BloomFilter(capacity, configs.promo_filter['error_rate'])
+
+
+def load() -> int:
+    """
+    Заполняет фильтр всеми промокодами из promocode_used.
+
+    :return: Количество загруженных промокодов.
+    """
+    global _filter
+
+    try:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute('SELECT count(*) FROM promocode_used')
+            used_count = cursor.fetchone()[0]
+            bloom = _new_filter(used_count)
+
+            cursor.execute('SELECT promocode FROM promocode_used')
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                bloom.update(row[0] for row in rows)
+    except Exception as e:
+        logger.error(f"Не удалось загрузить использованные промокоды, фильтр пуст: {e}")
+        return 0
+
+    with _lock:
+        _filter = bloom
+    logger.info(
+        f"Фильтр промокодов: {bloom.count} кодов, {len(bloom._bits) // 1024} КБ, "
+        f"{bloom.hashes} хэшей"
+    )
+    return bloom.count
+
+
+def _get_filter() -> BloomFilter:
+    global _filter
+
+    if _filter is None:
+        with _lock:
+            if _filter is None:
+                _filter = _new_filter(0)
+    return _filter
+
+
+def maybe_used(promo_code: str) -> bool:
+    """
+    True, если промокод, скорее всего, уже использован (проверка без обращения к БД).
+
+    Ложные срабатывания возможны с вероятностью `configs.promo_filter['error_rate']`,
+    пропусков использованных кодов — нет (для кодов, погашенных после `load`).
+    """
+    return promo_code in _get_filter()
+
+
+def add(promo_code: str) -> None:
+    """Отмечает промокод как использованный."""
+    bloom = _get_filter()
+    bloom.add(promo_code)
+    if bloom.count == bloom.capacity + 1:
+        logger.warning(
+            f"Фильтр промокодов переполнен ({bloom.count} > {bloom.capacity}), "
+            f"ложных срабатываний станет больше до следующей загрузки"
+        )
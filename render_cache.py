@@ -0,0 +1,383 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import configs
+import images
+import render_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Кэш готовых картинок купонов с адресацией по содержимому.
+
+    Картинка купона зависит только от строки каталога, коллекции, редкости, профиля
+    кодирования и версии шаблонов/шрифтов, поэтому ключом служит хэш этих данных: одна и та же карточка
+    рендерится один раз, сколько бы раз ее ни выбивали. Кэш двухуровневый — LRU в памяти
+    и LRU на диске, оба ограничены по объему в байтах. Запись на диск необязательна
+    (`persist`) и выполняется в фоновом потоке, не задерживая отправку картинки.
+    """
+
+    def __init__(self, cache_dir: str, memory_limit: int, disk_limit: int,
+                 persist: bool = True) -> None:
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='render-cache-writer'
+        ) if persist else None
+
+        self._memory: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()  # ключ -> (id, картинка)
+        self._memory_size = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # имя файла -> размер
+        self._disk_size = 0
+        # id купона (как в имени файла) -> ключи его картинок в памяти и на диске
+        self._keys: Dict[str, set] = {}
+        # id купона -> счетчик инвалидаций; запись на диск, поставленная до инвалидации, отменяется
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan_disk()
+
+    def _scan_disk(self) -> None:
+        # Восстанавливаем LRU-порядок файлов на диске по времени последнего доступа
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and '__' in entry.name and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_size += size
+            safe_id, key = name.rsplit('__', 1)
+            self._keys.setdefault(safe_id, set()).add(key)
+
+        logger.info(
+            f"Кэш рендера на диске: {len(self._disk)} файлов, {self._disk_size // 1024} КБ"
+        )
+
+    @staticmethod
+    def key(rarity: str, coupon: Tuple, collection_type: str, profile: Optional[str] = None) -> str:
+        """
+        Ключ кэша: хэш строки каталога, коллекции, редкости, профиля кодирования и версии
+        ресурсов рендера с расширением файла (например, `3f2a...e1.jpg`).
+        """
+        profile = profile or configs.upload_profile
+        payload = '\x1f'.join(
+            [images.get_renderer().version, rarity, str(collection_type), profile,
+             repr(sorted(images.get_profile(profile).items()))]
+            + [str(value) for value in coupon]
+        )
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+        return f"{digest}.{images.profile_extension(profile)}"
+
+    @staticmethod
+    def _safe_id(coupon_id: str) -> str:
+        return re.sub(r'[^\w-]', '_', coupon_id)
+
+    @classmethod
+    def _file_name(cls, coupon_id: str, key: str) -> str:
+        # id купона в имени файла нужен, чтобы инвалидировать записи и после перезапуска
+        return f"{cls._safe_id(coupon_id)}__{key}"
+
+    def _forget(self, safe_id: str, key: str) -> None:
+        # Картинки больше нет ни в памяти, ни на диске — убираем ключ из индекса купона
+        if key in self._memory or f"{safe_id}__{key}" in self._disk:
+            return
+        keys = self._keys.get(safe_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[safe_id]
+
+    def _index_disk(self, safe_id: str, name: str, size: int) -> None:
+        # Файл есть на диске: учитываем его в LRU и лимите, даже если его записал
+        # другой процесс (python warmup.py) после того, как мы просканировали каталог
+        if name in self._disk:
+            self._disk.move_to_end(name)
+            return
+        self._disk[name] = size
+        self._disk_size += size
+        self._keys.setdefault(safe_id, set()).add(name.rsplit('__', 1)[1])
+        self._evict_disk()
+
+    def contains(self, coupon_id: str, key: str) -> bool:
+        """Есть ли картинка в кэше (без чтения файла с диска)."""
+        safe_id = self._safe_id(coupon_id)
+        name = self._file_name(coupon_id, key)
+        with self._lock:
+            if key in self._memory or name in self._disk:
+                return True
+            generation = self._generations.get(safe_id, 0)
+
+        try:
+            size = os.path.getsize(os.path.join(self.cache_dir, name))
+        except OSError:
+            return False
+
+        with self._lock:
+            if self._generations.get(safe_id, 0) != generation:
+                # Купон инвалидирован, пока мы проверяли файл
+                return False
+            self._index_disk(safe_id, name, size)
+        return True
+
+    def get(self, coupon_id: str, key: str) -> Optional[bytes]:
+        """Возвращает картинку из памяти или с диска, либо None."""
+        safe_id = self._safe_id(coupon_id)
+        name = self._file_name(coupon_id, key)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return entry[1]
+            generation = self._generations.get(safe_id, 0)
+
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, 'rb') as cached_file:
+                data = cached_file.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats['misses'] += 1
+                self._disk_size -= self._disk.pop(name, 0)
+                self._forget(safe_id, key)
+            return None
+
+        with self._lock:
+            self._stats['disk_hits'] += 1
+            if self._generations.get(safe_id, 0) != generation:
+                # Файл инвалидирован, пока мы его читали
+                return data
+            self._index_disk(safe_id, name, len(data))
+            self._put_memory(safe_id, key, data)
+        return data
+
+    def put(self, coupon_id: str, key: str, data: bytes) -> None:
+        """Кладет картинку в память и ставит ее запись на диск в фоновую очередь."""
+        safe_id = self._safe_id(coupon_id)
+        with self._lock:
+            self._put_memory(safe_id, key, data)
+            generation = self._generations.get(safe_id, 0)
+
+        if self._writer is not None:
+            self._writer.submit(self._write_disk, safe_id, key, data, generation)
+
+    def _write_disk(self, safe_id: str, key: str, data: bytes, generation: int) -> None:
+        name = f"{safe_id}__{key}"
+        path = os.path.join(self.cache_dir, name)
+        try:
+            # Пишем во временный файл и переименовываем, чтобы не читать недописанную картинку
+            with open(f"{path}.tmp", 'wb') as cached_file:
+                cached_file.write(data)
+
+            with self._lock:
+                if self._generations.get(safe_id, 0) != generation:
+                    # Купон инвалидирован, пока запись ждала в очереди
+                    os.remove(f"{path}.tmp")
+                    return
+                os.replace(f"{path}.tmp", path)
+                self._disk_size -= self._disk.pop(name, 0)
+                self._index_disk(safe_id, name, len(data))
+        except OSError as e:
+            logger.error(f"Не удалось сохранить картинку {name} в кэш на диске: {e}")
+
+    def _put_memory(self, safe_id: str, key: str, data: bytes) -> None:
+        if len(data) > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old[1])
+        self._memory[key] = (safe_id, data)
+        self._memory_size += len(data)
+        self._keys.setdefault(safe_id, set()).add(key)
+        while self._memory_size > self.memory_limit:
+            evicted_key, (evicted_id, evicted) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self._forget(evicted_id, evicted_key)
+
+    def _evict_disk(self) -> None:
+        while self._disk_size > self.disk_limit and self._disk:
+            name, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self._forget(*name.rsplit('__', 1))
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError as e:
+                logger.warning(f"Не удалось удалить файл кэша {name}: {e}")
+
+    def invalidate(self, coupon_ids: Iterable[str]) -> int:
+        """
+        Удаляет из кэша все картинки указанных купонов (например, измененных при импорте).
+
+        Удаляются записи и в памяти, и на диске (включая файлы, которые записал другой
+        процесс и которых еще нет в индексе); фоновые записи на диск, поставленные
+        до инвалидации, отменяются.
+
+        :return: Количество удаленных картинок.
+        """
+        removed = 0
+        safe_ids = {self._safe_id(coupon_id) for coupon_id in coupon_ids}
+        with self._lock:
+            for safe_id in safe_ids:
+                self._generations[safe_id] = self._generations.get(safe_id, 0) + 1
+                for key in self._keys.pop(safe_id, ()):
+                    removed += 1
+                    entry = self._memory.pop(key, None)
+                    if entry is not None:
+                        self._memory_size -= len(entry[1])
+
+                    name = f"{safe_id}__{key}"
+                    if name not in self._disk:
+                        continue
+                    self._disk_size -= self._disk.pop(name)
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError as e:
+                        logger.warning(f"Не удалось удалить файл кэша {name}: {e}")
+
+            # Файлы купонов, которых нет в индексе
+            for entry in os.scandir(self.cache_dir):
+                if '__' not in entry.name or entry.name.endswith('.tmp'):
+                    continue
+                if entry.name.rsplit('__', 1)[0] in safe_ids and entry.name not in self._disk:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError as e:
+                        logger.warning(f"Не удалось удалить файл кэша {entry.name}: {e}")
+
+        logger.info(f"Инвалидировано картинок в кэше рендера: {removed}")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                self._stats,
+                memory_items=len(self._memory),
+                memory_bytes=self._memory_size,
+                disk_items=len(self._disk),
+                disk_bytes=self._disk_size,
+            )
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> RenderCache:
+    """Возвращает общий для процесса кэш рендера."""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RenderCache(
+                    configs.render_cache['dir'],
+                    memory_limit=configs.render_cache['memory_limit_mb'] * 1024 * 1024,
+                    disk_limit=configs.render_cache['disk_limit_mb'] * 1024 * 1024,
+                    persist=configs.render_cache['persist'],
+                )
+    return _cache
+
+
+def get_or_render(rarity: str, coupon: Tuple, collection_type: str,
+                  profile: Optional[str] = None) -> Tuple[str, bytes]:
+    """
+    Возвращает картинку купона из кэша, при промахе рендерит и кэширует ее.
+
+    Args:
+        rarity: Редкость купона (выбирает шаблон)
+        coupon: Строка каталога (id, number, name, color, effect, description, collection)
+        collection_type: Коллекция, печатаемая на корешке
+        profile: Профиль кодирования (по умолчанию `configs.upload_profile`)
+
+    Returns:
+        Кортеж (ключ кэша, байты картинки)
+    """
+    cache = get_cache()
+    coupon_id, number, name, color, effect, description, collection = coupon
+    key = cache.key(rarity, coupon, collection_type, profile)
+
+    data = cache.get(coupon_id, key)
+    if data is not None:
+        return key, data
+
+    logger.debug(f"Рендер купона {coupon_id} отсутствует в кэше, создаем")
+    data = images.render_coupon_bytes(
+        rarity=rarity,
+        title=name,
+        description=description,
+        effect=effect,
+        coupon_number=number,
+        coupon_code=coupon_id,
+        collection_type=collection_type,
+        profile=profile,
+    )
+
+    cache.put(coupon_id, key, data)
+    return key, data
+
+
+def get_or_render_many(items: List[Tuple[str, Tuple, str]],
+                       profile: Optional[str] = None) -> List[Tuple[str, bytes]]:
+    """
+    То же, что `get_or_render`, но для нескольких купонов сразу.
+
+    Все промахи кэша рендерятся параллельно в пуле процессов (`render_pool`),
+    поэтому пак из пяти новых карточек рисуется примерно за время одной.
+
+    Args:
+        items: Список (редкость, строка каталога, коллекция)
+        profile: Профиль кодирования (по умолчанию `configs.upload_profile`)
+
+    Returns:
+        Список (ключ кэша, байты картинки) в том же порядке
+    """
+    cache = get_cache()
+    results: List[Optional[Tuple[str, bytes]]] = []
+    misses: Dict[str, Tuple[str, Dict]] = {}  # ключ -> (id купона, задание рендера)
+
+    for rarity, coupon, collection_type in items:
+        coupon_id, number, name, color, effect, description, collection = coupon
+        key = cache.key(rarity, coupon, collection_type, profile)
+        data = cache.get(coupon_id, key)
+        results.append((key, data))
+        if data is None and key not in misses:
+            misses[key] = (coupon_id, dict(
+                rarity=rarity,
+                title=name,
+                description=description,
+                effect=effect,
+                coupon_number=number,
+                coupon_code=coupon_id,
+                collection_type=collection_type,
+                profile=profile,
+            ))
+
+    if misses:
+        logger.debug(f"Рендерим {len(misses)} купонов, отсутствующих в кэше")
+        rendered = render_pool.render_many([job for _, job in misses.values()])
+        for (key, (coupon_id, _)), data in zip(misses.items(), rendered):
+            cache.put(coupon_id, key, data)
+            misses[key] = (coupon_id, data)
+
+    return [(key, data if data is not None else misses[key][1]) for key, data in results]
+
+
+def invalidate(coupon_ids: Iterable[str]) -> int:
+    """Удаляет из кэша картинки указанных купонов."""
+    return get_cache().invalidate(coupon_ids)
@@ -0,0 +1,166 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import configs
+import images
+
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    # Каждый процесс один раз декодирует шаблоны и шрифты
+    images.get_renderer()
+
+
+def _render_job(job: Dict[str, Any]) -> bytes:
+    return images.render_coupon_bytes(**job)
+
+
+def _ping(delay: float) -> int:
+    # Пустое задание: заставляет пул создать процесс и выполнить _init_worker.
+    # Пауза не дает уже готовому процессу забрать задания тех, что еще загружают шаблоны
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _mp_context():
+    # Процессы не форкаются из работающего бота: к этому моменту уже запущены потоки
+    # планировщика, очереди отправки и пула БД, и fork мог бы унести в дочерний процесс
+    # захваченную ими блокировку. forkserver порождает процессы из чистого процесса-сервера
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def workers_count() -> int:
+    """Количество процессов пула: из конфига или по числу ядер."""
+    return configs.render_pool['workers'] or os.cpu_count() or 1
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor, _slots
+
+    if not configs.render_pool['enabled']:
+        return None
+
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                workers = workers_count()
+                if _slots is None:
+                    _slots = threading.BoundedSemaphore(
+                        workers * configs.render_pool['queue_per_worker']
+                    )
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=_mp_context(), initializer=_init_worker
+                )
+                logger.info(f"Пул рендера купонов запущен: {workers} процессов")
+    return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    global _executor
+
+    with _lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def start(timeout: float = 60) -> None:
+    """
+    Запускает процессы пула заранее и ждет, пока они загрузят шаблоны.
+
+    ProcessPoolExecutor создает процессы только под задания, поэтому в каждый
+    отправляется пустое задание: иначе запуск процессов и декодирование шаблонов
+    достались бы первому паку после перезапуска.
+    """
+    executor = _get_executor()
+    if executor is None:
+        return
+
+    workers = workers_count()
+    started = time.monotonic()
+    ready = set()
+    try:
+        # Пока каждый процесс не ответил хотя бы раз — все еще загружают шаблоны
+        while len(ready) < workers:
+            for future in [executor.submit(_ping, 0.05) for _ in range(workers)]:
+                ready.add(future.result(timeout=max(0.0, started + timeout - time.monotonic())))
+    except Exception as e:
+        logger.error(f"Не удалось прогреть пул рендера: {e}")
+        return
+    logger.info(f"Процессы рендера готовы за {time.monotonic() - started:.1f} с")
+
+
+def shutdown() -> None:
+    """Останавливает пул рендера."""
+    global _executor
+
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_many(jobs: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[bytes]:
+    """
+    Рендерит несколько купонов параллельно в пуле процессов.
+
+    Каждое задание — именованные аргументы для `images.render_coupon_bytes`. Очередь пула
+    ограничена: если свободных слотов нет, задание рендерится прямо в текущем потоке.
+    Так же (в текущем потоке) перерисовываются задания, которые не уложились в `timeout`
+    (общий на весь вызов) или упали из-за сбоя процесса-воркера.
+
+    Returns:
+        Байты картинок в порядке заданий
+    """
+    timeout = configs.render_pool['timeout'] if timeout is None else timeout
+    executor = _get_executor()
+
+    futures = []
+    for job in jobs:
+        future = None
+        if executor is not None and _slots.acquire(blocking=False):
+            try:
+                future = executor.submit(_render_job, job)
+                future.add_done_callback(lambda _: _slots.release())
+            except (BrokenProcessPool, RuntimeError) as e:
+                _slots.release()
+                logger.error(f"Пул рендера недоступен: {e}")
+                _reset_executor(executor)
+                executor = None
+        futures.append(future)
+
+    deadline = time.monotonic() + timeout
+    results = []
+    for job, future in zip(jobs, futures):
+        if future is not None:
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                continue
+            except FutureTimeoutError:
+                logger.warning(f"Рендер купона {job.get('coupon_code')} не уложился в {timeout} с")
+                future.cancel()
+            except BrokenProcessPool as e:
+                logger.error(f"Процесс рендера упал: {e}")
+                if executor is not None:
+                    _reset_executor(executor)
+                    executor = None
+            except Exception as e:
+                logger.error(f"Ошибка рендера купона {job.get('coupon_code')} в пуле: {e}")
+
+        # Запасной вариант — рендер в текущем процессе
+        results.append(_render_job(job))
+
+    return results
@@ -1,13 +1,17 @@
 import os
 
+import catalog
 import database
+import render_cache
+import warmup
 
 # Функция для обработки Excel файла
 def process_excel_file(message, bot):
     try:
         # Проверяем, что сообщение содержит документ
         if message.document is None:
-            bot.reply_to(message, "Пожалуйста, отправьте файл в формате Excel.")
+            bot.outbox.call(message.chat.id, bot.reply_to, message,
+                            "Пожалуйста, отправьте файл в формате Excel.")
             return
 
         # Получаем информацию о файле
@@ -21,10 +25,16 @@ def process_excel_file(message, bot):
         with open(save_path, 'wb') as new_file:
             new_file.write(downloaded_file)
 
-        bot.reply_to(message, f"Файл {file_name} успешно загружен. Обрабатываю...")
+        bot.outbox.call(message.chat.id, bot.reply_to, message,
+                        f"Файл {file_name} успешно загружен. Обрабатываю...")
 
         # Парсим Excel и загружаем в базу данных
-        database.parse_and_save_to_db(save_path, message, bot)
+        if database.parse_and_save_to_db(save_path, message, bot):
+            # Перестраиваем каталог в памяти и сбрасываем картинки измененных купонов
+            changed = catalog.load()
+            render_cache.invalidate(changed)
+            # Сразу дорисовываем картинки новых и измененных карточек, чтобы паки не ждали рендер
+            warmup.run_for_admin(bot, message.chat.id)
 
     except Exception as e:
-        bot.reply_to(message, f"Произошла ошибка: {str(e)}")
\ No newline at end of file
+        bot.outbox.call(message.chat.id, bot.reply_to, message, f"Произошла ошибка: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateScheduler:
+    """
+    Планировщик обработки обновлений: по порядку для пользователя, параллельно между ними.
+
+    У каждого пользователя (ключа) своя очередь задач. Пользователь с задачами,
+    которого сейчас никто не обрабатывает, попадает в общую очередь готовых, и
+    любой свободный поток берет из нее следующего. Поэтому обновления одного
+    пользователя выполняются строго по порядку (двойное нажатие не обгонит первую
+    покупку), а медленный обработчик занимает только один поток и не задерживает
+    остальных пользователей. Общее число ожидающих задач ограничено
+    `workers * queue_size`: при переполнении `submit` либо ждет, либо сразу
+    возвращает False.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = max(1, workers)
+        self.capacity = self.workers * max(1, queue_size)
+        self._pending: Dict[Hashable, Deque[tuple]] = {}  # ключ -> задачи по порядку
+        self._ready: Deque[Hashable] = deque()  # ключи с задачами, которые никто не обрабатывает
+        self._active = set()  # ключи, задачу которых сейчас выполняет поток
+        self._queued = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'update-worker-{index}', daemon=True)
+            for index in range(self.workers)
+        ]
+        self._stats = {
+            'submitted': 0, 'rejected': 0, 'processed': 0, 'errors': 0,
+            'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0,
+        }
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Планировщик обновлений запущен: {self.workers} потоков")
+
+    def stop(self) -> None:
+        """Дорабатывает уже поставленные задачи и останавливает потоки."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            if thread.ident is not None:  # Планировщик мог так и не запуститься
+                thread.join(timeout=5)
+
+    def submit(self, key: Hashable, task: Callable[[], Any], block: bool = True) -> bool:
+        """
+        Ставит задачу в очередь ключа (обычно user_id).
+
+        :return: False, если очередь заполнена и `block` выключен.
+        """
+        with self._cond:
+            while self._queued >= self.capacity:
+                if not block:
+                    self._stats['rejected'] += 1
+                    return False
+                self._cond.wait()
+
+            tasks = self._pending.get(key)
+            if tasks is None:
+                # Новый пользователь без задач: сразу готов к обработке
+                tasks = self._pending[key] = deque()
+                self._ready.append(key)
+            tasks.append((time.monotonic(), task))
+            self._queued += 1
+            self._stats['submitted'] += 1
+            self._cond.notify_all()
+        return True
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready:
+                    if self._stopped:
+                        return
+                    self._cond.wait()
+                key = self._ready.popleft()
+                self._active.add(key)
+                queued_at, task = self._pending[key].popleft()
+                self._queued -= 1
+                self._cond.notify_all()  # Освободилось место в очереди
+
+            started = time.monotonic()
+            failed = False
+            try:
+                task()
+            except Exception as e:
+                failed = True
+                logger.error(f"Ошибка обработки обновления (ключ {key}): {e}", exc_info=True)
+            finished = time.monotonic()
+
+            with self._cond:
+                self._active.discard(key)
+                if self._pending[key]:
+                    # Следующее обновление пользователя — в конец общей очереди
+                    self._ready.append(key)
+                    self._cond.notify()
+                else:
+                    del self._pending[key]
+
+                wait = started - queued_at
+                self._stats['processed'] += 1
+                self._stats['errors'] += failed
+                self._stats['wait_total'] += wait
+                self._stats['wait_max'] = max(self._stats['wait_max'], wait)
+                self._stats['run_total'] += finished - started
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Метрики: задачи в очереди, пользователи в ожидании и в работе, самая длинная
+        очередь пользователя, среднее и максимальное ожидание и среднее время
+        обработки (мс), счетчики задач.
+        """
+        with self._cond:
+            processed = self._stats['processed']
+            return {
+                'submitted': self._stats['submitted'],
+                'rejected': self._stats['rejected'],
+                'processed': processed,
+                'errors': self._stats['errors'],
+                'queue_total': self._queued,
+                'queue_max_user': max((len(tasks) for tasks in self._pending.values()), default=0),
+                'users_ready': len(self._ready),
+                'users_active': len(self._active),
+                'wait_avg_ms': round(self._stats['wait_total'] / processed * 1000, 2)
+                if processed else 0.0,
+                'wait_max_ms': round(self._stats['wait_max'] * 1000, 2),
+                'run_avg_ms': round(self._stats['run_total'] / processed * 1000, 2)
+                if processed else 0.0,
+            }
+
+    def start_stats_logging(self, interval: float) -> Optional[threading.Thread]:
+        """Периодически пишет метрики в лог в фоновом потоке (interval=0 — выключено)."""
+        if interval <= 0:
+            return None
+
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                logger.info(f"Планировщик обновлений: {self.stats()}")
+
+        thread = threading.Thread(target=loop, name='update-scheduler-stats', daemon=True)
+        thread.start()
+        return thread
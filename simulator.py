@@ -0,0 +1,249 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import configs
+import dict_convert
+import generators
+
+
+logger = logging.getLogger(__name__)
+
+# Размер порции паков, которую воркер генерирует за один вызов sampler.sample
+CHUNK_PACKS = 200_000
+# Предел паков в одном прогоне сбора коллекции (защита от нулевых весов)
+COMPLETION_MAX_PACKS = 10_000_000
+
+
+def _simulate_packs(packs: int, qty_coupons: int, pity: bool, seed: int) -> Dict[str, Any]:
+    # Считает статистику по `packs` пакам одного воркера
+    sampler = generators.PackSampler(seed=seed)
+    prices = np.array([
+        configs.color_prices[dict_convert.color_convert[rarity]] for rarity in sampler.rarities
+    ], dtype=np.int64)
+
+    rarity_counts = np.zeros(len(sampler.rarities), dtype=np.int64)
+    last_card_counts = np.zeros(len(sampler.rarities), dtype=np.int64)
+    pity_triggered = 0
+    coins = 0
+    coins_sq = 0.0
+
+    done = 0
+    while done < packs:
+        size = min(CHUNK_PACKS, packs - done)
+        rarities, _ = sampler.sample(size, qty_coupons, pity=pity)
+        rarity_counts += np.bincount(rarities.ravel(), minlength=len(sampler.rarities))
+        last_card_counts += np.bincount(rarities[:, -1], minlength=len(sampler.rarities))
+        pity_triggered += int((rarities[:, :-1] == sampler.common).all(axis=1).sum())
+
+        pack_coins = prices[rarities].sum(axis=1)
+        coins += int(pack_coins.sum())
+        coins_sq += float((pack_coins.astype(float) ** 2).sum())
+        done += size
+
+    return {
+        'packs': packs,
+        'rarity_counts': rarity_counts.tolist(),
+        'last_card_counts': last_card_counts.tolist(),
+        'pity_triggered': pity_triggered,
+        'coins': coins,
+        'coins_sq': coins_sq,
+    }
+
+
+def _simulate_completion(trials: int, qty_coupons: int, seed: int) -> List[Optional[int]]:
+    """
+    Сколько паков нужно, чтобы собрать все карточки одной коллекции.
+
+    Коллекция карточки выбирается равновероятно из `configs.collection_type_list`,
+    как в `coupons.open_buster`; собирается коллекция с индексом 0.
+    """
+    sampler = generators.PackSampler(seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    collections = len(configs.collection_type_list)
+    # Смещение номеров каждой редкости в общем списке карточек коллекции
+    offsets = np.concatenate(([0], np.cumsum(sampler.qty)[:-1]))
+    cards_total = int(sampler.qty.sum())
+    batch = 1_000
+
+    results = []
+    for _ in range(trials):
+        seen = np.zeros(cards_total, dtype=bool)
+        missing = cards_total
+        opened = 0
+        completed_at = None
+        while opened < COMPLETION_MAX_PACKS:
+            rarities, numbers = sampler.sample(batch, qty_coupons)
+            mine = rng.integers(0, collections, size=rarities.shape) == 0
+            cards = offsets[rarities] + numbers - 1
+            # Индекс пака, в котором карточка выпала в первый раз
+            for pack_index, card in zip(np.nonzero(mine)[0], cards[mine]):
+                if not seen[card]:
+                    seen[card] = True
+                    missing -= 1
+                    if missing == 0:
+                        completed_at = opened + int(pack_index) + 1
+                        break
+            if completed_at is not None:
+                break
+            opened += batch
+        results.append(completed_at)
+    return results
+
+
+def _split(total: int, parts: int) -> List[int]:
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts) if base or i < extra]
+
+
+def run_simulation(packs: int = 1_000_000, qty_coupons: int = 5, completion_trials: int = 200,
+                   workers: Optional[int] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Моделирует экономику паков методом Монте-Карло на нескольких процессах.
+
+    Args:
+        packs: Сколько паков открыть (с гарантией последнего купона и без нее — по столько же)
+        qty_coupons: Купонов в паке
+        completion_trials: Сколько раз собрать коллекцию целиком
+        workers: Процессов (по умолчанию — по числу ядер)
+        seed: Начальное значение генератора для воспроизводимости
+
+    Returns:
+        Отчет: наблюдаемые и заданные доли редкостей, эффект гарантии,
+        ожидаемый возврат монет при продаже и число паков до полной коллекции
+    """
+    workers = workers or os.cpu_count() or 1
+    seed = int(time.time()) if seed is None else seed
+    rarities = list(configs.weights)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def run_packs(pity: bool, seed_base: int):
+            jobs = [
+                executor.submit(_simulate_packs, part, qty_coupons, pity, seed_base + i)
+                for i, part in enumerate(_split(packs, workers))
+            ]
+            return jobs
+
+        with_pity = run_packs(True, seed)
+        without_pity = run_packs(False, seed + 10_000)
+        completion = [
+            executor.submit(_simulate_completion, part, qty_coupons, seed + 20_000 + i)
+            for i, part in enumerate(_split(completion_trials, workers))
+        ]
+
+        def merge(jobs) -> Dict[str, Any]:
+            total = {'packs': 0, 'rarity_counts': np.zeros(len(rarities), dtype=np.int64),
+                     'last_card_counts': np.zeros(len(rarities), dtype=np.int64),
+                     'pity_triggered': 0, 'coins': 0, 'coins_sq': 0.0}
+            for job in jobs:
+                part = job.result()
+                for key in ('packs', 'pity_triggered', 'coins', 'coins_sq'):
+                    total[key] += part[key]
+                total['rarity_counts'] += np.array(part['rarity_counts'])
+                total['last_card_counts'] += np.array(part['last_card_counts'])
+            return total
+
+        stats = merge(with_pity)
+        stats_no_pity = merge(without_pity)
+        completion_packs = [value for job in completion for value in job.result()]
+
+    weights_total = sum(configs.weights.values())
+    cards = stats['packs'] * qty_coupons
+
+    def rates(counts: np.ndarray, total: int) -> Dict[str, float]:
+        return {rarity: round(int(count) / total, 8) if total else 0.0
+                for rarity, count in zip(rarities, counts)}
+
+    mean_coins = stats['coins'] / stats['packs']
+    std_coins = max(0.0, stats['coins_sq'] / stats['packs'] - mean_coins ** 2) ** 0.5
+    completed = sorted(value for value in completion_packs if value is not None)
+
+    def percentile(q: float) -> Optional[int]:
+        return int(np.percentile(completed, q)) if completed else None
+
+    report = {
+        'config': {
+            'weights': configs.weights,
+            'qty': configs.qty,
+            'color_prices': configs.color_prices,
+            'price_pack_coupons': configs.price_pack_coupons,
+            'collection_type_list': configs.collection_type_list,
+            'qty_coupons': qty_coupons,
+        },
+        'run': {
+            'packs': stats['packs'],
+            'completion_trials': completion_trials,
+            'workers': workers,
+            'seed': seed,
+            'seconds': round(time.perf_counter() - started, 2),
+        },
+        'rarity_rates': {
+            'configured': {rarity: round(configs.weights[rarity] / weights_total, 8)
+                           for rarity in rarities},
+            'observed': rates(stats['rarity_counts'], cards),
+            'observed_without_pity': rates(stats_no_pity['rarity_counts'],
+                                           stats_no_pity['packs'] * qty_coupons),
+        },
+        'pity': {
+            'triggered_share': round(stats['pity_triggered'] / stats['packs'], 8),
+            'last_card_rates': rates(stats['last_card_counts'], stats['packs']),
+            'last_card_rates_without_pity': rates(stats_no_pity['last_card_counts'],
+                                                  stats_no_pity['packs']),
+        },
+        'economy': {
+            'sell_coins_per_pack_mean': round(mean_coins, 4),
+            'sell_coins_per_pack_std': round(std_coins, 4),
+            'return_ratio': round(mean_coins / configs.price_pack_coupons, 4),
+            'sell_coins_per_pack_mean_without_pity': round(
+                stats_no_pity['coins'] / stats_no_pity['packs'], 4),
+        },
+        'collection_completion': {
+            'cards_in_collection': int(sum(configs.qty.values())),
+            'completed_trials': len(completed),
+            'not_completed_trials': len(completion_packs) - len(completed),
+            'packs_mean': round(sum(completed) / len(completed), 1) if completed else None,
+            'packs_median': percentile(50),
+            'packs_p90': percentile(90),
+            'packs_p99': percentile(99),
+            'coins_mean': round(sum(completed) / len(completed) * configs.price_pack_coupons, 1)
+            if completed else None,
+        },
+    }
+    logger.info(f"Симуляция завершена за {report['run']['seconds']} с")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Монте-Карло симуляция паков: доли редкостей, гарантия, экономика монет"
+    )
+    parser.add_argument('--packs', type=int, default=1_000_000, help="Сколько паков открыть")
+    parser.add_argument('--coupons', type=int, default=5, help="Купонов в паке")
+    parser.add_argument('--completion-trials', type=int, default=200,
+                        help="Сколько раз собрать коллекцию целиком")
+    parser.add_argument('--workers', type=int, default=None, help="Процессов (по умолчанию — все ядра)")
+    parser.add_argument('--seed', type=int, default=None, help="Seed для воспроизводимости")
+    parser.add_argument('--output', default=None, help="Файл для JSON-отчета (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    result = run_simulation(
+        packs=args.packs, qty_coupons=args.coupons, completion_trials=args.completion_trials,
+        workers=args.workers, seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report_file:
+            json.dump(result, report_file, ensure_ascii=False, indent=2)
+        logger.info(f"Отчет сохранен: {args.output}")
+    else:
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        print()
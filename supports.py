@@ -1,28 +1,31 @@
 import json
 import logging
-from typing import Tuple, Dict, Optional
+import os
+from datetime import datetime
+from typing import Tuple, Dict, List, Optional
 
 import telebot
 from telebot import TeleBot, types
 from telebot.types import Message
 
 import database
-import dict_convert
 import generators
+import inventory
 import coupons
 import configs
+import user_cache
 
 
 def process_promo_amount(message: Message, bot: TeleBot):
     try:
         amount = int(message.text)
         if not 1 <= amount <= 286:
-            bot.send_message(message.chat.id, "❌ Сумма должна быть от 1 до 286!")
+            bot.outbox.send_message(message.chat.id, "❌ Сумма должна быть от 1 до 286!")
             return
 
         # Генерируем промокод
         promo_code = generators.generate_promo_code(amount)
-        bot.send_message(
+        bot.outbox.send_message(
             message.chat.id,
             f"🎉 Ваш промокод на **{amount} монет**:\n\n`{promo_code}`\n\n"
             "Используйте его в боте через команду /promo!",
@@ -30,7 +33,73 @@ def process_promo_amount(message: Message, bot: TeleBot):
         )
 
     except ValueError:
-        bot.send_message(message.chat.id, "⚠️ Введите число, например: 100")
+        bot.outbox.send_message(message.chat.id, "⚠️ Введите число, например: 100")
+
+
+def generate_unused_promo_codes(amount: int, count: int) -> List[str]:
+    """
+    Генерирует `count` уникальных промокодов, которых еще нет в promocode_used.
+
+    Совпадения с уже использованными кодами (крайне редкие) заменяются новыми.
+    """
+    codes = generators.generate_promo_codes(amount, count)
+    while True:
+        with database.postgres_init() as (conn, cursor):
+            cursor.execute(
+                'SELECT promocode FROM promocode_used WHERE promocode = ANY(%s)',
+                (codes,)
+            )
+            used = {row[0] for row in cursor.fetchall()}
+        if not used:
+            return codes
+
+        logging.info(f"Заменяем {len(used)} промокодов, совпавших с использованными")
+        codes = [code for code in codes if code not in used]
+        codes += generators.generate_promo_codes(
+            amount, count - len(codes), exclude=used.union(codes)
+        )
+
+
+def process_promo_bulk(message: Message, bot: TeleBot):
+    """Генерирует пачку промокодов для акции и отправляет их файлом."""
+    try:
+        amount, count = (int(value) for value in message.text.split())
+    except (ValueError, AttributeError):
+        bot.outbox.send_message(message.chat.id, "⚠️ Введите сумму и количество через пробел, например: 50 10000")
+        return
+
+    if not 1 <= amount <= 286:
+        bot.outbox.send_message(message.chat.id, "❌ Сумма должна быть от 1 до 286!")
+        return
+    if not 1 <= count <= configs.promo_bulk_max_count:
+        bot.outbox.send_message(
+            message.chat.id, f"❌ Количество должно быть от 1 до {configs.promo_bulk_max_count}!"
+        )
+        return
+
+    try:
+        bot.outbox.send_message(message.chat.id, f"⏳ Генерирую {count} промокодов на {amount} монет...")
+        codes = generate_unused_promo_codes(amount, count)
+
+        os.makedirs('downloads', exist_ok=True)
+        export_path = os.path.join(
+            'downloads', f"promo_{amount}_{count}_{datetime.now():%Y%m%d_%H%M%S}.txt"
+        )
+        with open(export_path, 'w', encoding='utf-8') as export_file:
+            export_file.write('\n'.join(codes))
+
+        def send_export():
+            with open(export_path, 'rb') as export_file:
+                return bot.send_document(
+                    message.chat.id, export_file,
+                    caption=f"🎉 {len(codes)} промокодов на {amount} монет"
+                )
+
+        bot.outbox.call(message.chat.id, send_export)
+        logging.info(f"Сгенерировано {len(codes)} промокодов на {amount} монет: {export_path}")
+    except Exception as e:
+        logging.error(f"Ошибка генерации пачки промокодов: {e}")
+        bot.outbox.send_message(message.chat.id, f"⚠️ Не удалось сгенерировать промокоды: {e}")
 
 
 def process_promo_code(message: Message, bot: TeleBot):
@@ -40,18 +109,18 @@ def process_promo_code(message: Message, bot: TeleBot):
     # Проверяем валидность промокода
     is_valid, amount = generators.validate_promo_code(promo_code)
     if not is_valid:
-        bot.send_message(message.chat.id, "❌ Неверный промокод!")
+        bot.outbox.send_message(message.chat.id, "❌ Неверный промокод!")
         return
 
     # Пытаемся начислить монеты
     success = coupons.add_coins_to_user(user_id, amount, promo_code)
     if success:
-        bot.send_message(
+        bot.outbox.send_message(
             message.chat.id,
             f"🎉 Вам начислено **{amount}** монет!",
             parse_mode="Markdown")
     else:
-        bot.send_message(
+        bot.outbox.send_message(
             message.chat.id,
             "⚠️ Промокод уже использован или произошла ошибка!",
             parse_mode="Markdown")
@@ -74,90 +143,69 @@ def converter_type_user_data(message: types.Message) -> Dict[str, Optional[str]]
     }
 
 def info_message(user_id, message, bot):
-    conn, cursor = database.postgres_init()
-
     try:
-        cursor.execute(
-            f"""SELECT user_data, opened_cases, title FROM user_data WHERE user_id={user_id}"""
-        )
-        user_list = cursor.fetchone()
-        user_data, opened_cases, title = user_list
-        print(type(user_data))
-        # user_data = json.load(user_data)
-
-        cursor.execute(
-            f"""SELECT qty_coins FROM money WHERE user_id={user_id}"""
-        )
-        qty_coins = int(cursor.fetchone()[0])
-    except (Exception, BaseException):
-        bot.send_message(
+        # Профиль и баланс из кэша, при промахе — одним запросом к БД
+        profile = user_cache.get_profile(user_id)
+    except (Exception, BaseException) as e:
+        logging.error(f"Ошибка загрузки профиля пользователя {user_id}: {e}")
+        profile = None
+
+    if profile is None:
+        bot.outbox.send_message(
             message.chat.id,
             'Ошибка загрузки данных, попробуйте позже'
         )
         return
-    finally:
-        conn.close()
-        cursor.close()
 
-    bot.send_message(
+    bot.outbox.send_message(
         message.chat.id,
         'Информация о пользователе:\n'
         '\n'
-        f'Имя: <b>{user_data['full_name']}</b>\n'
-        f'Титул: <b>{title}</b>\n'
-        f'Баланс: <b>{qty_coins}</b>\n'
-        f'Открыто кейсов: <b>{opened_cases}</b> шт.\n',
+        f'Имя: <b>{profile["full_name"]}</b>\n'
+        f'Титул: <b>{profile["title"]}</b>\n'
+        f'Баланс: <b>{profile["balance"]}</b>\n'
+        f'Открыто кейсов: <b>{profile["opened_cases"]}</b> шт.\n',
         parse_mode='html'
     )
 
 
 def my_coupons(user_id, message, bot):
-    conn, cursor = database.postgres_init()
-    coupons_list = []
-
+    """Отправляет первую страницу инвентаря новым сообщением."""
     try:
-        cursor.execute("SELECT * FROM user_coupons WHERE user_id=%s", (user_id,))
-        coupons_list = cursor.fetchall()
+        page = inventory.get_page(user_id)
     except Exception as error:
         logging.error(f'Ошибка при получении списка купонов из БД: {error}')
-        bot.send_message(message.chat.id, "⚠️ Произошла ошибка при загрузке ваших купонов")
+        bot.outbox.send_message(message.chat.id, "⚠️ Произошла ошибка при загрузке ваших купонов")
         return
-    finally:
-        conn.close()
 
-    if not coupons_list:
-        bot.send_message(message.chat.id, "🎫 У вас пока нет купонов")
+    if page is None:
+        bot.outbox.send_message(message.chat.id, "🎫 У вас пока нет купонов")
         return
 
-    # Разбиваем список купонов на части по 50 штук
-    chunk_size = 50
-    coupons_chunks = [coupons_list[i:i + chunk_size]
-                      for i in range(0, len(coupons_list), chunk_size)]
+    header, markup = page
+    bot.outbox.send_message(message.chat.id, header, reply_markup=markup)
 
-    total_chunks = len(coupons_chunks)
 
-    for chunk_num, chunk in enumerate(coupons_chunks, 1):
-        markup = types.InlineKeyboardMarkup(row_width=2)
-        button_list = []
-
-        for coupon in chunk:
-            us_id, coupon_code, quantity, name, color = coupon
-            smile = dict_convert.color_to_smile_convert.get(color, "🎟️")
-            button = types.InlineKeyboardButton(
-                f"{smile} {name}",
-                callback_data=f'coupon_code {coupon_code}'
-            )
-            button_list.append(button)
-
-        markup.add(*button_list)
+def show_coupons_page(user_id, message, bot, rarity, sort, direction, quantity, coupon_code):
+    """Листает инвентарь: перерисовывает то же сообщение с новой страницей."""
+    try:
+        page = inventory.get_page(user_id, rarity, sort, direction, quantity, coupon_code)
+    except Exception as error:
+        logging.error(f'Ошибка при получении страницы купонов из БД: {error}')
+        bot.outbox.send_message(message.chat.id, "⚠️ Произошла ошибка при загрузке ваших купонов")
+        return
 
-        # Формируем текст сообщения
-        if total_chunks > 1:
-            header = f"🎫 Ваши купоны (часть {chunk_num} из {total_chunks})"
-        else:
-            header = "🎫 Ваши купоны"
+    if page is None:
+        header, markup = "🎫 У вас пока нет купонов", None
+    else:
+        header, markup = page
 
-        if chunk_num == 1 and len(coupons_list) > chunk_size:
-            header += "\n\n📋 У вас много купонов! Они разделены на несколько сообщений для удобства."
+    def edit_page():
+        try:
+            bot.edit_message_text(header, message.chat.id, message.message_id, reply_markup=markup)
+        except telebot.apihelper.ApiTelegramException as error:
+            # Повторное нажатие на ту же страницу — сообщение не изменилось
+            if 'message is not modified' not in str(error):
+                raise
 
-        bot.send_message(message.chat.id, header, reply_markup=markup)
\ No newline at end of file
+    bot.outbox.call(message.chat.id, edit_page)
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# configs.py читает config/config.ini из текущего каталога: тесты работают
+# с минимальным конфигом во временном каталоге, а не с настоящим ботом и БД
+TEST_CONFIG = """
+[telegram]
+token = 123456:test
+
+[sql]
+database = test
+user = test
+password = test
+host = localhost
+port = 5432
+"""
+
+
+def pytest_configure(config):
+    directory = tempfile.mkdtemp(prefix='imperial-lottery-tests-')
+    os.makedirs(os.path.join(directory, 'config'))
+    with open(os.path.join(directory, 'config', 'config.ini'), 'w', encoding='utf-8') as config_file:
+        config_file.write(TEST_CONFIG)
+    os.chdir(directory)
@@ -0,0 +1,31 @@
+import requests
+
+import bot_settings
+import configs
+import webhook
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    def remove_webhook(self):
+        self.calls.append('remove_webhook')
+        if self.calls.count('remove_webhook') == 1:
+            raise requests.exceptions.ConnectionError('Bot API недоступен')
+
+    def polling(self, none_stop=False):
+        self.calls.append('polling')
+
+
+def test_polling_starts_when_webhook_and_its_removal_fail(monkeypatch):
+    def serve(bot):
+        raise requests.exceptions.ConnectionError('Bot API недоступен')
+
+    monkeypatch.setitem(configs.webhook, 'enabled', True)
+    monkeypatch.setattr(webhook, 'serve', serve)
+    monkeypatch.setattr(bot_settings.time, 'sleep', lambda delay: None)
+
+    bot = FakeBot()
+    bot_settings.run_bot(bot)
+    assert bot.calls == ['remove_webhook', 'remove_webhook', 'polling']
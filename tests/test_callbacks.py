@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+
+import callbacks
+import database
+
+
+def make_call(data, user_id=5):
+    return SimpleNamespace(data=data, from_user=SimpleNamespace(id=user_id))
+
+
+@pytest.mark.parametrize('action, args', [
+    ('info', ()),
+    ('sell', ('Inquisition_white_12',)),
+    ('inv', ('puple', 'q', 'n', 17, 'Master_gold_3')),
+    ('inv', ('-', 'c', '-', 0, '')),
+])
+def test_pack_parse_round_trip(action, args):
+    assert callbacks.parse(callbacks.pack(action, *args)) == (action, [str(arg) for arg in args])
+
+
+def test_legacy_space_separated_payloads_are_parsed():
+    assert callbacks.parse('sell Inquisition_white_12') == ('sell', ['Inquisition_white_12'])
+    assert callbacks.parse('my_coupons') == ('my_coupons', [])
+    assert callbacks.parse('') == ('', [])
+
+
+def test_pack_enforces_64_byte_limit():
+    # Кириллица — два байта на символ: считаются байты, а не символы
+    assert len(callbacks.pack('c', 'ж' * 30).encode('utf-8')) == 62
+    with pytest.raises(ValueError):
+        callbacks.pack('sell', 'ж' * 30)
+    with pytest.raises(ValueError):
+        callbacks.pack('sell', 'a:b')
+
+
+def test_longest_inventory_payload_fits_for_max_coupon_id():
+    coupon_id = 'я' * (callbacks.COUPON_ID_MAX_BYTES // 2)
+    assert callbacks.pack('inv', 'puple', 'q', 'n', 999_999_999, coupon_id)
+
+
+def test_import_rejects_ids_that_do_not_fit_in_buttons():
+    errors = []
+    rows = [
+        (2, ('1', 'Короткий', 'white', '', '', 'Inquisition')),
+        (3, ('2', 'Длинный', 'white', '', '', 'Инквизиция_легендарная')),
+        (4, ('3', 'С двоеточием', 'white', '', '', 'Inq:uisition')),
+    ]
+    records = database._validate_coupon_rows(rows, set(), errors)
+
+    assert [record[0] for record in records] == ['Inquisition_white_1']
+    assert [row_num for row_num, _ in errors] == [3, 4]
+
+
+def test_router_dispatches_by_action_with_typed_args():
+    router = callbacks.CallbackRouter(is_admin=lambda user_id: user_id == 1)
+    calls = []
+    router.route('inv', str, int)(lambda call, rarity, quantity: calls.append((rarity, quantity)))
+    router.route('coupon', str, aliases=('coupon_code',))(lambda call, code: calls.append(code))
+    router.route('warmup', admin=True)(lambda call: calls.append('warmup'))
+
+    assert router.dispatch(make_call('inv:gold:3'))
+    assert router.dispatch(make_call('coupon_code Master_gold_3'))
+    assert not router.dispatch(make_call('inv:gold:many'))  # Аргумент не приводится к int
+    assert not router.dispatch(make_call('sell:Master_gold_3'))  # Нет такого маршрута
+    assert not router.dispatch(make_call('warmup'))  # Не администратор
+    assert router.dispatch(make_call('warmup', user_id=1))
+
+    assert calls == [('gold', 3), 'Master_gold_3', 'warmup']
+    stats = router.stats()
+    assert stats['routes']['inv']['calls'] == 1
+    assert stats['unknown'] == 1 and stats['rejected'] == 2
+
+
+def test_duplicate_route_is_rejected():
+    router = callbacks.CallbackRouter()
+    router.route('info')(lambda call: None)
+    with pytest.raises(ValueError):
+        router.route('other', aliases=('info',))(lambda call: None)
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+from telebot.apihelper import ApiTelegramException
+
+import file_ids
+
+
+def api_error(description, error_code=400):
+    return ApiTelegramException('sendPhoto', None, {'error_code': error_code, 'description': description})
+
+
+def sent_photo(file_id):
+    return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id)])
+
+
+class FakeBot:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(photo)
+        if self.error is not None and isinstance(photo, str):
+            raise self.error
+        return sent_photo('new-id')
+
+    def send_media_group(self, chat_id, media, **kwargs):
+        self.sent.append([item.media for item in media])
+        if self.error is not None and any(isinstance(item.media, str) for item in media):
+            raise self.error
+        return [sent_photo(f'new-id-{index}') for index in range(len(media))]
+
+
+@pytest.fixture
+def cached(monkeypatch):
+    forgotten, saved = [], []
+    monkeypatch.setattr(file_ids, 'forget', lambda image_hash: forgotten.append(image_hash))
+    monkeypatch.setattr(file_ids, 'save', lambda image_hash, file_id: saved.append(image_hash))
+    monkeypatch.setattr(file_ids, '_file_ids', {'hash-1': 'old-id-1', 'hash-2': 'old-id-2'})
+    return forgotten, saved
+
+
+@pytest.mark.parametrize('description, rejected', [
+    ('Bad Request: wrong file identifier/HTTP URL specified', True),
+    ('Bad Request: wrong remote file identifier specified: Wrong padding length', True),
+    ('Bad Request: FILE_REFERENCE_EXPIRED', True),
+    ('Bad Request: chat not found', False),
+    ("Bad Request: can't parse entities: Unsupported start tag", False),
+    ('Bad Request: message caption is too long', False),
+])
+def test_only_file_id_errors_are_rejections(description, rejected):
+    assert file_ids._is_rejected_file_id(api_error(description)) is rejected
+
+
+def test_rejected_file_id_is_forgotten_and_photo_reuploaded(cached):
+    forgotten, saved = cached
+    bot = FakeBot(api_error('Bad Request: wrong file identifier/HTTP URL specified'))
+
+    file_ids.send_photo(bot, 1, 'hash-1', b'png')
+    assert bot.sent == ['old-id-1', b'png']
+    assert forgotten == ['hash-1'] and saved == ['hash-1']
+
+
+def test_chat_not_found_keeps_cached_file_ids(cached):
+    forgotten, saved = cached
+    bot = FakeBot(api_error('Bad Request: chat not found'))
+
+    with pytest.raises(ApiTelegramException):
+        file_ids.send_photo(bot, 1, 'hash-1', b'png')
+    with pytest.raises(ApiTelegramException):
+        file_ids.send_media_group(bot, 1, [('hash-1', b'png-1'), ('hash-2', b'png-2')])
+
+    # Ни одной повторной загрузки байтами, file_id остались в кэше
+    assert bot.sent == ['old-id-1', ['old-id-1', 'old-id-2']]
+    assert forgotten == [] and saved == []
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from generators import PackSampler
+
+
+WEIGHTS = {'common': 60, 'uncommon': 30, 'rare': 10}
+# Купонов каждой редкости больше, чем в паке: ограничение qty не вмешивается
+QTY = {'common': 50, 'uncommon': 50, 'rare': 50}
+
+
+def test_same_seed_gives_same_packs():
+    first = PackSampler(WEIGHTS, QTY, seed=7).sample(100)
+    second = PackSampler(WEIGHTS, QTY, seed=7).sample(100)
+
+    assert np.array_equal(first[0], second[0])
+    assert np.array_equal(first[1], second[1])
+
+
+def test_rarity_frequencies_follow_weights():
+    sampler = PackSampler(WEIGHTS, QTY, seed=1)
+    rarities, _ = sampler.sample(40_000, pity=False)
+
+    counts = np.bincount(rarities.ravel(), minlength=len(sampler.rarities))
+    observed = counts / counts.sum()
+    expected = np.array([WEIGHTS[rarity] for rarity in sampler.rarities]) / sum(WEIGHTS.values())
+    assert observed == pytest.approx(expected, abs=0.01)
+
+
+def test_pity_makes_last_coupon_non_common_after_all_commons():
+    weights = {'common': 99, 'rare': 1}
+    qty = {'common': 50, 'rare': 50}
+    sampler = PackSampler(weights, qty, seed=3)
+    common = sampler.rarities.index('common')
+
+    rarities, _ = sampler.sample(5_000, qty_coupons=5, pity=True)
+    assert not (rarities == common).all(axis=1).any()
+
+    # Без гарантии такие паки при этих весах встречаются постоянно
+    rarities, _ = sampler.sample(5_000, qty_coupons=5, pity=False)
+    assert (rarities == common).all(axis=1).any()
+
+
+def test_pack_never_exceeds_qty_and_numbers_are_in_range():
+    qty = {'common': 2, 'uncommon': 2, 'rare': 5}
+    sampler = PackSampler(WEIGHTS, qty, seed=11)
+    rarities, numbers = sampler.sample(2_000, qty_coupons=5)
+
+    limits = np.array([qty[rarity] for rarity in sampler.rarities])
+    for row in rarities:
+        assert (np.bincount(row, minlength=len(limits)) <= limits).all()
+    assert (numbers >= 1).all()
+    assert (numbers <= limits[rarities]).all()
+
+
+def test_pack_larger_than_qty_is_rejected():
+    sampler = PackSampler(WEIGHTS, {'common': 1, 'uncommon': 1, 'rare': 1}, seed=0)
+    with pytest.raises(ValueError):
+        sampler.sample(1, qty_coupons=5)
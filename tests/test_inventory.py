@@ -0,0 +1,143 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+import callbacks
+import configs
+import database
+import inventory
+
+
+COUPONS = [
+    # (код, количество, название, редкость) — есть равные количества для проверки курсора
+    ('a_white_1', 3, 'Альфа', 'white'),
+    ('b_gold_1', 1, 'Бета', 'gold'),
+    ('c_white_2', 3, 'Гамма', 'white'),
+    ('d_blue_1', 5, 'Дельта', 'blue'),
+    ('e_white_3', 1, 'Эпсилон', 'white'),
+    ('f_red_1', 2, 'Зета', 'red'),
+    ('g_white_4', 2, 'Эта', 'white'),
+]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Те же запросы, что и к PostgreSQL, но к SQLite в памяти (плейсхолдеры %s -> ?)
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE user_coupons (user_id INTEGER, coupon_code TEXT, quantity INTEGER, name TEXT, color TEXT)")
+    conn.executemany("INSERT INTO user_coupons VALUES (1, ?, ?, ?, ?)", COUPONS)
+    queries = []
+
+    class Cursor:
+        def __init__(self):
+            self._cursor = conn.cursor()
+
+        def execute(self, sql, params=()):
+            queries.append(sql)
+            self._cursor.execute(sql.replace('%s', '?'), params)
+
+        def fetchall(self):
+            return self._cursor.fetchall()
+
+    @contextlib.contextmanager
+    def postgres_init():
+        yield conn, Cursor()
+
+    monkeypatch.setattr(database, 'postgres_init', postgres_init)
+    monkeypatch.setitem(configs.inventory, 'page_size', 3)
+    inventory._pages.clear()
+    yield conn, queries
+    inventory._pages.clear()
+    conn.close()
+
+
+def page_codes(page):
+    _, markup = page
+    return [
+        callbacks.parse(button.callback_data)[1][0]
+        for row in markup.keyboard for button in row
+        if callbacks.parse(button.callback_data)[0] == 'coupon'
+    ]
+
+
+def navigation(page):
+    # Курсоры кнопок «Назад»/«Вперед»: направление -> аргументы get_page
+    _, markup = page
+    result = {}
+    for row in markup.keyboard:
+        for button in row:
+            action, args = callbacks.parse(button.callback_data)
+            if action == 'inv' and args[2] in (inventory.NEXT, inventory.PREV):
+                rarity, sort, direction, quantity, code = args
+                result[direction] = (rarity, sort, direction, int(quantity), code)
+    return result
+
+
+def walk(user_id, rarity, sort):
+    # Листает вперед до последней страницы, затем назад до первой
+    page = inventory.get_page(user_id, rarity, sort)
+    assert inventory.PREV not in navigation(page)
+    forward = [page_codes(page)]
+    while inventory.NEXT in navigation(page):
+        page = inventory.get_page(user_id, *navigation(page)[inventory.NEXT])
+        forward.append(page_codes(page))
+    backward = [page_codes(page)]
+    while inventory.PREV in navigation(page):
+        page = inventory.get_page(user_id, *navigation(page)[inventory.PREV])
+        backward.append(page_codes(page))
+    return forward, backward[::-1]
+
+
+@pytest.mark.parametrize('rarity, sort, expected', [
+    (inventory.ALL, 'c', [['a_white_1', 'b_gold_1', 'c_white_2'],
+                          ['d_blue_1', 'e_white_3', 'f_red_1'],
+                          ['g_white_4']]),
+    (inventory.ALL, 'q', [['d_blue_1', 'a_white_1', 'c_white_2'],
+                          ['f_red_1', 'g_white_4', 'b_gold_1'],
+                          ['e_white_3']]),
+    ('white', 'c', [['a_white_1', 'c_white_2', 'e_white_3'],
+                    ['g_white_4']]),
+    ('white', 'q', [['a_white_1', 'c_white_2', 'g_white_4'],
+                    ['e_white_3']]),
+])
+def test_keyset_pages_forward_and_back(db, rarity, sort, expected):
+    forward, backward = walk(1, rarity, sort)
+    assert forward == expected
+    assert backward == expected
+
+
+def test_exact_page_has_no_next_button(db):
+    conn, _ = db
+    conn.execute("DELETE FROM user_coupons WHERE coupon_code = 'g_white_4'")
+    forward, _ = walk(1, inventory.ALL, 'c')
+    assert [len(codes) for codes in forward] == [3, 3]
+
+
+def test_user_without_coupons_gets_none(db):
+    assert inventory.get_page(2) is None
+    assert page_codes(inventory.get_page(1, 'puple')) == []
+
+
+def test_cached_page_skips_sql_until_invalidated(db):
+    _, queries = db
+    inventory.get_page(1)
+    inventory.get_page(1)
+    assert len(queries) == 1
+
+    inventory.invalidate(1)
+    inventory.get_page(1)
+    assert len(queries) == 2
+
+
+def test_cursor_past_the_end_falls_back_to_first_page(db):
+    conn, _ = db
+    first = inventory.get_page(1)
+    second = inventory.get_page(1, *navigation(first)[inventory.NEXT])
+    cursor = navigation(second)[inventory.NEXT]
+
+    conn.execute("DELETE FROM user_coupons WHERE coupon_code > 'f'")
+    inventory.invalidate(1)
+    page = inventory.get_page(1, *cursor)
+    assert page_codes(page) == ['a_white_1', 'b_gold_1', 'c_white_2']
+    assert inventory.PREV not in navigation(page)
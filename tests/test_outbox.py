@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+from telebot.apihelper import ApiTelegramException
+
+from outbox import Outbox, TokenBucket, _Item
+
+
+SETTINGS = {
+    'global_rate': 1000, 'global_burst': 1000, 'chat_rate': 1000, 'chat_burst': 1000,
+    'max_retries': 3, 'workers': 2,
+}
+
+
+def test_bucket_starts_full_and_refills_at_rate():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+
+    for _ in range(3):
+        assert bucket.ready_at(now) == now
+        bucket.take(now)
+    # Пустое ведро: следующий токен через 1 / rate секунд
+    assert bucket.ready_at(now) == pytest.approx(now + 0.5)
+    assert bucket.ready_at(now + 0.5) == now + 0.5
+
+
+def test_bucket_never_exceeds_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated
+
+    bucket.take(now)
+    assert bucket.is_full(now + 100)
+    assert bucket.tokens == 2
+
+
+def test_plain_texts_merge_in_order():
+    first = _Item(1, text="первое")
+    second = _Item(1, text="второе", kwargs={'reply_markup': 'keyboard'})
+
+    assert first.can_merge(second)
+    first.merge(second)
+    assert first.text == "первое\n\nвторое"
+    assert first.kwargs == {'reply_markup': 'keyboard'}
+    assert len(first.futures) == 2
+
+
+@pytest.mark.parametrize('first, second', [
+    # Клавиатура у первого сообщения потерялась бы
+    (_Item(1, text="a", kwargs={'reply_markup': 'keyboard'}), _Item(1, text="b")),
+    # Разная разметка
+    (_Item(1, text="a", kwargs={'parse_mode': 'HTML'}), _Item(1, text="b")),
+    # Параметры, которые нельзя объединить
+    (_Item(1, text="a"), _Item(1, text="b", kwargs={'reply_to_message_id': 5})),
+    # Произвольный вызов API
+    (_Item(1, text="a"), _Item(1, func=print)),
+    # Слишком длинный результат
+    (_Item(1, text="a" * 3000), _Item(1, text="b" * 1095)),
+])
+def test_items_that_must_not_merge(first, second):
+    assert not first.can_merge(second)
+
+
+class FakeBot:
+    def __init__(self, fail_first_with_429=False):
+        self.sent = []
+        self.fail = fail_first_with_429
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **kwargs):
+        with self.lock:
+            if self.fail:
+                self.fail = False
+                raise ApiTelegramException('sendMessage', None, {
+                    'error_code': 429, 'description': 'Too Many Requests',
+                    'parameters': {'retry_after': 0.01},
+                })
+            self.sent.append((chat_id, text))
+        return len(self.sent)
+
+
+def test_outbox_keeps_chat_order_and_merges_queued_texts():
+    bot = FakeBot()
+    box = Outbox(bot, SETTINGS)
+    futures = [box.send_message(1, "раз"), box.send_message(2, "другой чат"),
+               box.send_message(1, "два")]
+    box.start()
+    box.stop()
+
+    assert [f.result(timeout=1) for f in futures]
+    assert (1, "раз\n\nдва") in bot.sent
+    assert (2, "другой чат") in bot.sent
+    assert box.stats()['merged'] == 1
+
+
+def test_outbox_retries_after_429():
+    bot = FakeBot(fail_first_with_429=True)
+    box = Outbox(bot, SETTINGS)
+    future = box.send_message(1, "после паузы")
+    box.start()
+
+    assert future.result(timeout=2)
+    box.stop()
+    assert bot.sent == [(1, "после паузы")]
+    assert box.stats()['retries_429'] == 1
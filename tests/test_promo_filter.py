@@ -0,0 +1,30 @@
+from promo_filter import BloomFilter
+
+
+def test_added_values_are_always_found():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    codes = [f"CODE-{i:04d}-{i * 7 % 10_000:04d}" for i in range(10_000)]
+    bloom.update(codes)
+
+    assert all(code in bloom for code in codes)
+    assert bloom.count == len(codes)
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    bloom.update(f"used-{i}" for i in range(10_000))
+
+    false_positives = sum(f"unused-{i}" in bloom for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+
+def test_empty_filter_contains_nothing():
+    bloom = BloomFilter(capacity=100, error_rate=0.001)
+    assert "ABCD-EFGH-IJKL" not in bloom
+
+
+def test_tiny_capacity_is_clamped():
+    bloom = BloomFilter(capacity=0, error_rate=0.5)
+    bloom.add("x")
+    assert "x" in bloom
+    assert bloom.size >= 8 and bloom.hashes >= 1
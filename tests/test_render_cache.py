@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+import images
+import render_cache
+
+
+@pytest.fixture(autouse=True)
+def renderer(monkeypatch):
+    # Ключ кэша зависит только от версии ресурсов: сами шаблоны тестам не нужны
+    monkeypatch.setattr(images, 'get_renderer', lambda: SimpleNamespace(version='test'))
+
+
+def make_cache(directory, **kwargs):
+    kwargs.setdefault('memory_limit', 1024 * 1024)
+    kwargs.setdefault('disk_limit', 1024 * 1024)
+    return render_cache.RenderCache(str(directory), **kwargs)
+
+
+def flush(cache):
+    # Дожидаемся фоновых записей на диск: поток записи один, задания идут по порядку
+    cache._writer.submit(lambda: None).result()
+
+
+def test_file_written_by_another_process_is_indexed(tmp_path):
+    cache = make_cache(tmp_path)
+    other = make_cache(tmp_path)  # Например, python warmup.py, запущенный рядом с ботом
+    other.put('Inq_white_1', 'a.png', b'x' * 100)
+    flush(other)
+
+    assert cache.stats()['disk_items'] == 0
+    assert cache.contains('Inq_white_1', 'a.png')
+    assert cache.stats()['disk_bytes'] == 100
+
+    assert cache.get('Inq_white_2', 'b.png') is None
+    other.put('Inq_white_2', 'b.png', b'y' * 50)
+    flush(other)
+    assert cache.get('Inq_white_2', 'b.png') == b'y' * 50
+    # Картинка с диска попала в память: второе чтение не трогает файл
+    assert cache.get('Inq_white_2', 'b.png') == b'y' * 50
+    assert cache.stats()['memory_hits'] == 1
+    assert cache.stats()['disk_items'] == 2
+
+
+def test_foreign_files_count_against_disk_limit(tmp_path):
+    cache = make_cache(tmp_path, disk_limit=250)
+    other = make_cache(tmp_path, disk_limit=10 ** 6)
+    for index in range(3):
+        other.put(f'Inq_white_{index}', f'{index}.png', b'z' * 100)
+    flush(other)
+
+    for index in range(3):
+        cache.contains(f'Inq_white_{index}', f'{index}.png')
+    assert cache.stats()['disk_bytes'] <= 250
+    assert not (tmp_path / 'Inq_white_0__0.png').exists()
+
+
+def test_invalidate_removes_files_missing_from_index(tmp_path):
+    cache = make_cache(tmp_path)
+    other = make_cache(tmp_path)
+    other.put('Inq_white_1', 'a.png', b'x' * 10)
+    flush(other)
+
+    assert cache.invalidate(['Inq_white_1']) == 1
+    assert not cache.contains('Inq_white_1', 'a.png')
+
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from scheduler import UpdateScheduler
+
+
+def test_updates_of_one_user_run_in_order():
+    scheduler = UpdateScheduler(workers=4, queue_size=100)
+    scheduler.start()
+    done = []
+    for i in range(50):
+        scheduler.submit(1, lambda i=i: done.append(i))
+    scheduler.stop()
+
+    assert done == list(range(50))
+    assert scheduler.stats()['processed'] == 50
+
+
+def test_slow_user_does_not_block_other_users():
+    scheduler = UpdateScheduler(workers=2, queue_size=10)
+    scheduler.start()
+    release = threading.Event()
+    fast_done = threading.Event()
+
+    scheduler.submit(0, release.wait)
+    scheduler.submit(0, lambda: None)
+    # При шардировании по user_id % workers пользователь 2 ждал бы пользователя 0
+    scheduler.submit(2, fast_done.set)
+
+    assert fast_done.wait(timeout=2)
+    release.set()
+    scheduler.stop()
+
+
+def test_full_queue_rejects_without_blocking():
+    scheduler = UpdateScheduler(workers=1, queue_size=2)
+    assert scheduler.submit(1, lambda: None, block=False)
+    assert scheduler.submit(2, lambda: None, block=False)
+    assert not scheduler.submit(3, lambda: None, block=False)
+    assert scheduler.stats()['rejected'] == 1
+
+    scheduler.start()
+    scheduler.stop()
+    assert scheduler.stats()['processed'] == 2
+
+
+def test_failing_task_is_counted_and_next_task_runs():
+    scheduler = UpdateScheduler(workers=1, queue_size=10)
+    scheduler.start()
+    done = []
+
+    def fail():
+        raise RuntimeError("ошибка обработчика")
+
+    scheduler.submit(1, fail)
+    scheduler.submit(1, lambda: done.append(time.monotonic()))
+    scheduler.stop()
+
+    assert done
+    assert scheduler.stats()['errors'] == 1
@@ -0,0 +1,48 @@
+import gc
+
+import pytest
+from PIL import ImageFont
+
+import text_layout
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    text_layout.clear()
+    yield
+    text_layout.clear()
+
+
+def make_font():
+    return ImageFont.load_default(size=20)
+
+
+def test_lines_fit_max_width_and_keep_all_words():
+    font = make_font()
+    text = 'Купон дает право на одно желание императора в течение недели'
+    lines = text_layout.wrap_text(text, font, 150)
+
+    assert ' '.join(lines) == text
+    assert len(lines) > 1
+    assert all(font.getlength(line) <= 150 for line in lines if ' ' in line)
+
+
+def test_repeated_layout_is_served_from_cache():
+    font = make_font()
+    first = text_layout.wrap_text('один два три', font, 100)
+    assert text_layout.wrap_text('один два три', font, 100) is first
+
+    info = text_layout.cache_info()
+    assert info['layout_hits'] == 1 and info['layout_misses'] == 1
+
+
+def test_caches_of_dropped_fonts_are_released():
+    font = make_font()
+    text_layout.wrap_text('один два три', font, 100)
+    assert text_layout.cache_info()['fonts'] == 1
+
+    # Рендерер на один вызов (замер, сравнение профилей) больше не держит шрифт
+    del font
+    gc.collect()
+    info = text_layout.cache_info()
+    assert info['fonts'] == 0 and info['words'] == 0 and info['layout_size'] == 0
@@ -0,0 +1,53 @@
+import pytest
+
+import user_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    user_cache._profiles.clear()
+    user_cache._loading.clear()
+    yield
+    user_cache._profiles.clear()
+
+
+def test_profile_is_cached_after_load(monkeypatch):
+    loads = []
+
+    def load(user_id):
+        loads.append(user_id)
+        return {'full_name': 'Гость', 'balance': 10, 'title': None, 'opened_cases': 0}
+
+    monkeypatch.setattr(user_cache, '_load_profile', load)
+    assert user_cache.get_balance(1) == 10
+    assert user_cache.get_balance(1) == 10
+    assert loads == [1]
+
+
+@pytest.mark.parametrize('change', [
+    lambda: user_cache.update(1, balance=5),
+    lambda: user_cache.invalidate(1),
+])
+def test_change_during_load_keeps_stale_profile_out_of_cache(monkeypatch, change):
+    balances = iter([10, 5])
+
+    def load(user_id):
+        balance = next(balances)
+        if balance == 10:
+            change()  # Списание зафиксировано, пока профиль читался из БД
+        return {'full_name': 'Гость', 'balance': balance, 'title': None, 'opened_cases': 0}
+
+    monkeypatch.setattr(user_cache, '_load_profile', load)
+    assert user_cache.get_balance(1) == 10
+    assert user_cache.get_balance(1) == 5
+    assert not user_cache._loading
+
+
+def test_failed_load_clears_loading_marker(monkeypatch):
+    def load(user_id):
+        raise RuntimeError("БД недоступна")
+
+    monkeypatch.setattr(user_cache, '_load_profile', load)
+    with pytest.raises(RuntimeError):
+        user_cache.get_profile(1)
+    assert not user_cache._loading
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+import catalog
+import configs
+import images
+import render_cache
+import render_pool
+import warmup
+
+
+ROWS = [
+    catalog.CouponRow(f'Inq_white_{number}', number, 'Купон', 'white', '', '',
+                      configs.collection_type_list[0])
+    for number in range(1, 6)
+]
+
+
+def make_cache(directory):
+    return render_cache.RenderCache(str(directory), memory_limit=1024 * 1024, disk_limit=1024 * 1024)
+
+
+def flush(cache):
+    # Дожидаемся фоновых записей на диск: поток записи один, задания идут по порядку
+    cache._writer.submit(lambda: None).result()
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    jobs_rendered = []
+
+    def render_many(jobs, timeout=None):
+        jobs_rendered.extend(job['coupon_code'] for job in jobs)
+        return [job['coupon_code'].encode() for job in jobs]
+
+    # Ключ кэша зависит только от версии ресурсов: сами шаблоны тестам не нужны
+    monkeypatch.setattr(images, 'get_renderer', lambda: SimpleNamespace(version='test'))
+    monkeypatch.setattr(catalog, 'rows', lambda: ROWS)
+    monkeypatch.setattr(render_pool, 'render_many', render_many)
+    return jobs_rendered
+
+
+def test_second_warmup_over_populated_directory_renders_nothing(tmp_path, monkeypatch, rendered):
+    monkeypatch.setattr(render_cache, '_cache', make_cache(tmp_path))
+    first = warmup.warmup_catalog(profiles=['png'])
+    flush(render_cache._cache)
+    assert first['rendered'] == 5 and len(rendered) == 5
+
+    # Перезапуск бота с тем же каталогом кэша
+    rendered.clear()
+    monkeypatch.setattr(render_cache, '_cache', make_cache(tmp_path))
+    second = warmup.warmup_catalog(profiles=['png'])
+    assert rendered == []
+    assert second['rendered'] == 0 and second['skipped'] == 5
+
+
+def test_warmup_skips_cards_rendered_by_cli_while_bot_runs(tmp_path, monkeypatch, rendered):
+    bot_cache = make_cache(tmp_path)
+
+    # python warmup.py в отдельном процессе, пока бот уже работает со своим кэшем
+    monkeypatch.setattr(render_cache, '_cache', make_cache(tmp_path))
+    warmup.warmup_catalog(profiles=['png'])
+    flush(render_cache._cache)
+
+    rendered.clear()
+    monkeypatch.setattr(render_cache, '_cache', bot_cache)
+    summary = warmup.warmup_catalog(profiles=['png'])
+    assert rendered == []
+    assert summary['skipped'] == 5
+    assert bot_cache.stats()['disk_items'] == 5
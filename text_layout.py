@@ -0,0 +1,127 @@
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from PIL import ImageFont
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько готовых раскладок (текст, ширина) держать в памяти на один шрифт
+LAYOUT_CACHE_SIZE = 4096
+# Сколько ширин слов держать на один шрифт, после чего кэш шрифта сбрасывается
+WORD_CACHE_SIZE = 20000
+
+
+class _FontCache:
+    """Кэши одного шрифта: ширины слов и готовые раскладки (LRU)."""
+
+    def __init__(self) -> None:
+        self.widths: Dict[str, float] = {}
+        self.layouts: "OrderedDict[Tuple[str, int], Tuple[str, ...]]" = OrderedDict()
+
+
+# Шрифт -> его кэши. Ключи слабые: шрифты рендереров, созданных на один вызов
+# (замеры, сравнение профилей), уходят из кэша вместе с самими шрифтами
+_fonts: "weakref.WeakKeyDictionary[ImageFont.FreeTypeFont, _FontCache]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_stats = {'layout_hits': 0, 'layout_misses': 0}
+
+
+def _font_cache(font: ImageFont.FreeTypeFont) -> _FontCache:
+    cache = _fonts.get(font)
+    if cache is None:
+        with _lock:
+            cache = _fonts.setdefault(font, _FontCache())
+    return cache
+
+
+def word_width(font: ImageFont.FreeTypeFont, word: str) -> float:
+    """Ширина слова в пикселях; каждое слово измеряется шрифтом один раз."""
+    widths = _font_cache(font).widths
+    width = widths.get(word)
+    if width is None:
+        if len(widths) >= WORD_CACHE_SIZE:
+            widths.clear()
+        width = font.getlength(word)
+        widths[word] = width
+    return width
+
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> Tuple[str, ...]:
+    """
+    Разбивает текст на строки не шире `max_width` пикселей.
+
+    Ширина строки набирается по ходу из ширин слов и пробела, поэтому перенос
+    линейный по числу слов, а не пересчитывает всю строку на каждом слове.
+    Готовые раскладки кэшируются по (текст, шрифт, ширина): описания карточек
+    повторяются, и при повторном рендере текст вообще не измеряется.
+    Слово шире `max_width` занимает отдельную строку целиком.
+
+    Returns:
+        Кортеж строк (пустой для пустого текста)
+    """
+    cache = _font_cache(font)
+    key = (text, max_width)
+    with _lock:
+        lines = cache.layouts.get(key)
+        if lines is not None:
+            cache.layouts.move_to_end(key)
+            _stats['layout_hits'] += 1
+            return lines
+        _stats['layout_misses'] += 1
+
+    lines = _wrap(text, font, max_width)
+    with _lock:
+        cache.layouts[key] = lines
+        if len(cache.layouts) > LAYOUT_CACHE_SIZE:
+            cache.layouts.popitem(last=False)
+    return lines
+
+
+def _wrap(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> Tuple[str, ...]:
+    if not text:
+        return ()
+
+    space = word_width(font, ' ')
+    lines = []
+    current_line = []
+    current_width = 0.0
+
+    for word in text.split():
+        width = word_width(font, word)
+        line_width = current_width + space + width if current_line else width
+        if line_width <= max_width or not current_line:
+            current_line.append(word)
+            current_width = line_width
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+            current_width = width
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return tuple(lines)
+
+
+def cache_info() -> Dict[str, int]:
+    """Статистика кэшей раскладки: попадания/промахи раскладок и число измеренных слов."""
+    with _lock:
+        caches = list(_fonts.values())
+        return {
+            'layout_hits': _stats['layout_hits'],
+            'layout_misses': _stats['layout_misses'],
+            'layout_size': sum(len(cache.layouts) for cache in caches),
+            'fonts': len(caches),
+            'words': sum(len(cache.widths) for cache in caches),
+        }
+
+
+def clear() -> None:
+    """Сбрасывает все кэши (например, после замены шрифтов)."""
+    with _lock:
+        _fonts.clear()
+        _stats['layout_hits'] = _stats['layout_misses'] = 0
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import configs
+import database
+
+
+logger = logging.getLogger(__name__)
+
+# Поля профиля, которые хранит кэш
+PROFILE_FIELDS = ('full_name', 'balance', 'title', 'opened_cases')
+
+# user_id -> (время истечения, профиль)
+_profiles: "OrderedDict[int, tuple]" = OrderedDict()
+# user_id -> [число идущих загрузок из БД, были ли изменения во время загрузки]
+_loading: Dict[int, list] = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+
+def _load_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    # Профиль и баланс одним запросом
+    with database.postgres_init() as (conn, cursor):
+        cursor.execute(
+            """
+            SELECT u.user_data ->> 'full_name', m.qty_coins, u.title, u.opened_cases
+            FROM user_data u
+            LEFT JOIN money m ON m.user_id = u.user_id
+            WHERE u.user_id = %s
+            """,
+            (user_id,)
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+    full_name, balance, title, opened_cases = row
+    return {
+        'full_name': full_name,
+        'balance': int(balance or 0),
+        'title': title,
+        'opened_cases': int(opened_cases or 0),
+    }
+
+
+def _log_stats_every(count: int = 1000) -> None:
+    lookups = _stats['hits'] + _stats['misses']
+    if lookups % count == 0:
+        logger.info(f"Кэш профилей пользователей: {stats()}")
+
+
+def get_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает профиль пользователя (имя, баланс, титул, открытые кейсы).
+
+    Профиль берется из памяти, а при промахе или истечении TTL загружается
+    из БД одним запросом. Если во время загрузки профиль изменили (`update`,
+    `invalidate`), прочитанные данные могут быть устаревшими — в кэш они не попадают.
+    None — пользователя нет в БД.
+    """
+    now = time.monotonic()
+    with _lock:
+        cached = _profiles.get(user_id)
+        if cached is not None and cached[0] > now:
+            _profiles.move_to_end(user_id)
+            _stats['hits'] += 1
+            _log_stats_every()
+            return dict(cached[1])
+        _stats['misses'] += 1
+        _log_stats_every()
+        _loading.setdefault(user_id, [0, False])[0] += 1
+
+    profile = None
+    try:
+        profile = _load_profile(user_id)
+    finally:
+        with _lock:
+            loading = _loading[user_id]
+            loading[0] -= 1
+            changed = loading[1]
+            if not loading[0]:
+                del _loading[user_id]
+            if profile is not None and not changed:
+                _put(user_id, profile)
+    return profile
+
+
+def get_balance(user_id: int) -> Optional[int]:
+    """Баланс пользователя из кэша профиля."""
+    profile = get_profile(user_id)
+    return profile['balance'] if profile else None
+
+
+def _put(user_id: int, profile: Dict[str, Any]) -> None:
+    # Вызывается под _lock
+    _profiles[user_id] = (time.monotonic() + configs.user_cache['ttl'], profile)
+    _profiles.move_to_end(user_id)
+    while len(_profiles) > configs.user_cache['max_size']:
+        _profiles.popitem(last=False)
+
+
+def _mark_changed(user_id: int) -> None:
+    # Вызывается под _lock: идущая сейчас загрузка профиля не должна попасть в кэш
+    loading = _loading.get(user_id)
+    if loading is not None:
+        loading[1] = True
+
+
+def update(user_id: int, **fields: Any) -> None:
+    """
+    Записывает в кэш новые значения, только что сохраненные в БД (write-through).
+
+    Обновляется только уже закэшированный профиль: неполную запись не создаем,
+    при следующем чтении профиль целиком загрузится из БД.
+    """
+    unknown = set(fields) - set(PROFILE_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля профиля: {unknown}")
+
+    with _lock:
+        _mark_changed(user_id)
+        cached = _profiles.get(user_id)
+        if cached is None:
+            return
+        profile = dict(cached[1], **fields)
+        _profiles[user_id] = (time.monotonic() + configs.user_cache['ttl'], profile)
+        _stats['writes'] += 1
+
+
+def invalidate(user_id: int) -> None:
+    """Удаляет профиль из кэша (например, после изменения данных в обход coupons.py)."""
+    with _lock:
+        _mark_changed(user_id)
+        _profiles.pop(user_id, None)
+
+
+def stats() -> Dict[str, Any]:
+    """Метрики кэша: попадания, промахи, доля попаданий, записи и размер."""
+    lookups = _stats['hits'] + _stats['misses']
+    return dict(
+        _stats,
+        hit_rate=round(_stats['hits'] / lookups, 4) if lookups else 0.0,
+        size=len(_profiles),
+    )
@@ -0,0 +1,188 @@
+import argparse
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import catalog
+import configs
+import database
+import dict_convert
+import render_cache
+import render_pool
+
+
+logger = logging.getLogger(__name__)
+
+# Одновременно идет не больше одного прогрева
+_running = threading.Lock()
+
+
+def catalog_items() -> List[Tuple[str, catalog.CouponRow, str]]:
+    """
+    Все карточки, которые может выдать пак: строки каталога из коллекций
+    `configs.collection_type_list` с их редкостью и коллекцией для корешка.
+    """
+    items = []
+    for row in catalog.rows():
+        rarity = dict_convert.color_to_rarity_convert.get(row.color)
+        if rarity is None or row.collection not in configs.collection_type_list:
+            continue
+        items.append((rarity, row, row.collection))
+    return items
+
+
+def default_profiles() -> List[str]:
+    """Профили, в которых бот отдает карточки: для паков и превью в инвентаре."""
+    return list(dict.fromkeys([configs.upload_profile, configs.preview_profile]))
+
+
+def warmup_catalog(progress: Optional[Callable[[int, int], None]] = None,
+                   batch_size: Optional[int] = None,
+                   profiles: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Заранее рендерит все карточки каталога в кэш рендера во всех нужных профилях.
+
+    Карточки, которые уже есть в кэше, пропускаются, поэтому прерванный прогрев
+    можно просто запустить снова — он продолжит с того места, где остановился.
+    Рендер идет пачками через пул процессов (`render_pool`).
+
+    Args:
+        progress: Функция (сделано, всего), вызывается после каждой пачки
+        batch_size: Размер пачки (по умолчанию — емкость очереди пула рендера)
+        profiles: Профили кодирования (по умолчанию `default_profiles()`)
+
+    Returns:
+        Сводка: всего картинок (карточки × профили), отрендерено, пропущено, ошибок,
+        секунд, байт
+    """
+    cache = render_cache.get_cache()
+    items = catalog_items()
+    profiles = profiles or default_profiles()
+    total = len(items) * len(profiles)
+    batch_size = batch_size or render_pool.workers_count() * configs.render_pool['queue_per_worker']
+
+    pending = {
+        profile: [item for item in items
+                  if not cache.contains(item[1].id, cache.key(*item, profile=profile))]
+        for profile in profiles
+    }
+    summary = {
+        'total': total,
+        'rendered': 0,
+        'skipped': total - sum(len(batch) for batch in pending.values()),
+        'failed': 0,
+        'seconds': 0.0,
+        'bytes': 0,
+    }
+    logger.info(
+        f"Прогрев кэша рендера ({', '.join(profiles)}): "
+        f"{total - summary['skipped']} из {total} картинок нужно отрендерить"
+    )
+
+    started = time.perf_counter()
+    done = summary['skipped']
+    if progress:
+        progress(done, total)
+
+    for profile, profile_items in pending.items():
+        for start in range(0, len(profile_items), batch_size):
+            batch = profile_items[start:start + batch_size]
+            try:
+                rendered = render_cache.get_or_render_many(batch, profile=profile)
+            except Exception as e:
+                # Пачка упала целиком — добиваем ее по одной карточке, чтобы найти виноватую
+                logger.error(f"Ошибка рендера пачки при прогреве ({profile}): {e}")
+                rendered = []
+                for item in batch:
+                    try:
+                        rendered.append(render_cache.get_or_render(*item, profile=profile))
+                    except Exception as item_error:
+                        summary['failed'] += 1
+                        logger.error(f"Не удалось отрендерить купон {item[1].id} ({profile}): "
+                                     f"{item_error}")
+
+            summary['rendered'] += len(rendered)
+            summary['bytes'] += sum(len(data) for _, data in rendered)
+            done += len(batch)
+            if progress:
+                progress(done, total)
+
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    logger.info(f"Прогрев кэша рендера завершен: {summary}")
+    return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    return (
+        f"🖼 Прогрев картинок завершен\n"
+        f"Всего картинок: {summary['total']}\n"
+        f"Отрендерено: {summary['rendered']}, уже были в кэше: {summary['skipped']}, "
+        f"ошибок: {summary['failed']}\n"
+        f"Время: {summary['seconds']} с, объем: {summary['bytes'] / 1024 / 1024:.1f} МБ"
+    )
+
+
+def run_for_admin(bot, chat_id: int) -> bool:
+    """
+    Запускает прогрев в фоновом потоке и показывает прогресс в одном сообщении.
+
+    :return: False, если прогрев уже идет.
+    """
+    if not _running.acquire(blocking=False):
+        bot.outbox.send_message(chat_id, "⏳ Прогрев картинок уже выполняется")
+        return False
+
+    def worker() -> None:
+        try:
+            # Отдельным вызовом, а не текстом: сообщение со статусом не должно склеиться с соседними
+            status = bot.outbox.call(
+                chat_id, bot.send_message, chat_id, "🖼 Прогрев картинок купонов: подготовка..."
+            ).result(timeout=60)
+            last_update = [0.0]
+
+            def progress(done: int, total: int) -> None:
+                # Редактируем сообщение не чаще раза в 3 секунды, чтобы не упереться в лимиты
+                now = time.monotonic()
+                if done < total and now - last_update[0] < 3:
+                    return
+                last_update[0] = now
+                bot.outbox.call(
+                    chat_id, bot.edit_message_text,
+                    f"🖼 Прогрев картинок купонов: {done}/{total}", chat_id, status.message_id
+                )
+
+            summary = warmup_catalog(progress=progress)
+            bot.outbox.send_message(chat_id, format_summary(summary))
+        except Exception as e:
+            logger.error(f"Ошибка прогрева кэша рендера: {e}", exc_info=True)
+            bot.outbox.send_message(chat_id, f"⚠️ Прогрев картинок прерван: {e}")
+        finally:
+            _running.release()
+
+    threading.Thread(target=worker, name='render-warmup', daemon=True).start()
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Прогрев кэша картинок купонов по всему каталогу")
+    parser.add_argument('--batch', type=int, default=None, help="Размер пачки рендера")
+    parser.add_argument('--profiles', nargs='+', default=None,
+                        help="Профили кодирования (по умолчанию — для паков и превью)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    def print_progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total}", end='', flush=True)
+
+    database.init_pool()
+    try:
+        catalog.load()
+        result = warmup_catalog(progress=print_progress, batch_size=args.batch,
+                                profiles=args.profiles)
+        print()
+        print(format_summary(result))
+    finally:
+        render_pool.shutdown()
+        database.close_pool()
@@ -0,0 +1,75 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+import configs
+
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает secret_token, заданный в setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def _make_handler(bot, path: str, secret_token: str):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            if self.path != path:
+                self._reply(404)
+                return
+            if secret_token and self.headers.get(SECRET_HEADER) != secret_token:
+                logger.warning(f"Запрос к webhook с неверным токеном от {self.client_address[0]}")
+                self._reply(403)
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                update = types.Update.de_json(json.loads(self.rfile.read(length)))
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Некорректное обновление в webhook: {e}")
+                self._reply(400)
+                return
+
+            # Очередь пользователя заполнена — просим Telegram повторить позже
+            self._reply(200 if bot.submit_update(update, block=False) else 503)
+
+        def _reply(self, status: int) -> None:
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(f"webhook: {format % args}")
+
+    return WebhookHandler
+
+
+def serve(bot) -> None:
+    """
+    Регистрирует webhook в Telegram и принимает обновления локальным HTTP-сервером.
+
+    Сервер слушает `configs.webhook['host']:['port']` по HTTP; HTTPS для Telegram
+    обеспечивает обратный прокси (например, nginx), проксирующий на этот порт.
+    Обновления ставятся в планировщик бота (`bot.submit_update`); если очередь
+    пользователя заполнена, Telegram получает 503 и повторит доставку позже.
+    Блокирует поток до остановки сервера.
+    """
+    settings = configs.webhook
+    server = ThreadingHTTPServer(
+        (settings['host'], settings['port']),
+        _make_handler(bot, settings['path'], settings['secret_token'])
+    )
+    try:
+        bot.remove_webhook()
+        bot.set_webhook(
+            url=settings['url'].rstrip('/') + settings['path'],
+            secret_token=settings['secret_token'] or None,
+            max_connections=configs.scheduler['workers'],
+        )
+        logger.info(f"Webhook запущен на {settings['host']}:{settings['port']}{settings['path']}")
+        server.serve_forever()
+    finally:
+        server.server_close()
+        logger.info(f"Webhook остановлен, планировщик: {bot.update_scheduler.stats()}")